@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+AMD (answering machine detection) dari audio beberapa detik pertama setelah CONFIRMED.
+
+Fitur dihitung vektor (NumPy) per frame 20 ms:
+  - energi (dBFS) -> deteksi suara dengan ambang relatif terhadap noise floor
+  - segmen suara ("kata"): diam awal, panjang sapaan pertama, jumlah segmen
+  - beep: energi spektrum terkonsentrasi di satu bin (nada murni) beberapa frame berturut-turut
+
+Aturan (mirip AMD Asterisk):
+  manusia : sapaan pendek ("Halo?") lalu diam
+  mesin   : diam awal lama, sapaan panjang, banyak kata, atau ada beep
+
+Pemakaian streaming: AmdDetector.feed(samples, rate) dipanggil berulang sampai
+mengembalikan AmdResult; finish() memaksa keputusan di akhir jendela. Statistik
+per frame (energi, beep) hanya dihitung untuk frame baru; tiap feed cukup meringkas
+array per frame yang sudah ada.
+"""
+import struct
+
+import numpy as np
+
+HUMAN = "human"
+MACHINE = "machine"
+UNKNOWN = "unknown"
+
+FRAME_MS = 20
+MIN_SPEECH_DB = -45.0         # ambang minimum suara (dBFS)
+NOISE_MARGIN_DB = 12.0        # suara = noise floor + margin
+MIN_WORD_MS = 100             # segmen lebih pendek dianggap klik/noise
+MAX_GAP_MS = 200              # jeda lebih pendek digabung ke segmen yang sama
+
+INITIAL_SILENCE_SEC = 2.5     # tidak ada suara selama ini -> mesin
+GREETING_MAX_SEC = 1.5        # sapaan lebih panjang -> mesin
+AFTER_GREETING_SILENCE_SEC = 0.8   # sapaan pendek + diam selama ini -> manusia
+MAX_WORDS = 3                 # jumlah segmen >= ini -> mesin
+BEEP_MIN_MS = 80
+BEEP_PEAK_RATIO = 0.8         # porsi energi 300-3000 Hz di bin puncak (+-1 bin)
+
+
+class AmdResult:
+    __slots__ = ("label", "reason", "decided_sec", "features")
+
+    def __init__(self, label, reason, decided_sec, features):
+        self.label = label
+        self.reason = reason
+        self.decided_sec = decided_sec
+        self.features = features
+
+    def to_dict(self):
+        return {"label": self.label, "reason": self.reason,
+                "decided_sec": round(self.decided_sec, 2), "features": self.features}
+
+
+def frames(samples, rate):
+    """int16 mono -> matriks float32 (n_frame, frame_len)."""
+    n = rate * FRAME_MS // 1000
+    k = len(samples) // n
+    return np.asarray(samples[:k * n], dtype=np.float32).reshape(k, n) / 32768.0
+
+
+def speech_segments(db):
+    """Mask suara -> array (start, end) frame setelah gabung jeda pendek & buang klik."""
+    floor = np.percentile(db, 10) if len(db) else MIN_SPEECH_DB
+    thresh = max(floor + NOISE_MARGIN_DB, MIN_SPEECH_DB)
+    mask = db > thresh
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    # gabung segmen yang jedanya < MAX_GAP_MS
+    keep = (starts[1:] - ends[:-1]) * FRAME_MS >= MAX_GAP_MS
+    starts = starts[np.concatenate(([True], keep))]
+    ends = ends[np.concatenate((keep, [True]))]
+    seg = np.stack((starts, ends), axis=1)
+    return seg[(seg[:, 1] - seg[:, 0]) * FRAME_MS >= MIN_WORD_MS]
+
+
+def beep_frames(fr, rate, prev_peak=None):
+    """
+    Frame yang energinya terkonsentrasi pada satu frekuensi (nada beep).
+    Return (mask, bin puncak per frame); prev_peak = bin puncak frame sebelum fr (streaming).
+    """
+    if len(fr) == 0:
+        return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64)
+    spec = np.abs(np.fft.rfft(fr * np.hanning(fr.shape[1]), axis=1)) ** 2
+    freqs = np.fft.rfftfreq(fr.shape[1], 1.0 / rate)
+    band = spec[:, (freqs >= 300) & (freqs <= 3000)]
+    total = band.sum(axis=1) + 1e-12
+    peak = band.argmax(axis=1)
+    rows = np.arange(len(band))
+    # puncak +-1 bin (kebocoran window)
+    around = band[rows, peak] + band[rows, np.maximum(peak - 1, 0)] + band[rows, np.minimum(peak + 1, band.shape[1] - 1)]
+    # nada beep stabil: frekuensi puncak sama (+-1 bin) dengan frame sebelumnya
+    if prev_peak is None:
+        stable = np.concatenate(([False], np.abs(np.diff(peak)) <= 1))
+    else:
+        stable = np.abs(np.diff(np.concatenate(([prev_peak], peak)))) <= 1
+    return (around / total >= BEEP_PEAK_RATIO) & stable, peak
+
+
+def _longest_run(mask):
+    if not mask.any():
+        return 0
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return int((np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)).max())
+
+
+def frame_stats(fr, rate, prev_peak=None):
+    """Statistik per frame: (dBFS, mask beep, bin puncak). Tiap frame dihitung sekali."""
+    rms = np.sqrt(np.mean(fr * fr, axis=1)) if len(fr) else np.zeros(0)
+    db = 20.0 * np.log10(rms + 1e-9)
+    beep, peak = beep_frames(fr, rate, prev_peak)
+    return db, beep & (db > MIN_SPEECH_DB), peak
+
+
+def features(samples, rate):
+    db, beep, _ = frame_stats(frames(samples, rate), rate)
+    return summarize(db, beep)
+
+
+def summarize(db, beep):
+    """Fitur keputusan dari array per frame (dBFS, mask beep)."""
+    seg = speech_segments(db)
+    sec = FRAME_MS / 1000.0
+    total = len(db) * sec
+    f = {
+        "duration_sec": total,
+        "words": int(len(seg)),
+        "initial_silence_sec": float(seg[0, 0] * sec) if len(seg) else total,
+        "greeting_sec": float((seg[0, 1] - seg[0, 0]) * sec) if len(seg) else 0.0,
+        "after_greeting_silence_sec": 0.0,
+        "speech_ratio": float((seg[:, 1] - seg[:, 0]).sum() * sec / total) if len(seg) and total else 0.0,
+        "beep_ms": _longest_run(beep) * FRAME_MS,
+    }
+    if len(seg):
+        nxt = seg[1, 0] if len(seg) > 1 else len(db)
+        f["after_greeting_silence_sec"] = float((nxt - seg[0, 1]) * sec)
+    return f
+
+
+def decide(f, final=False):
+    """Return (label, reason) atau None jika belum bisa diputuskan."""
+    if f["beep_ms"] >= BEEP_MIN_MS:
+        return MACHINE, "beep"
+    if f["initial_silence_sec"] >= INITIAL_SILENCE_SEC:
+        return MACHINE, "initial_silence"
+    if f["words"] == 0:
+        return (UNKNOWN, "no_speech") if final else None
+    if f["greeting_sec"] > GREETING_MAX_SEC:
+        return MACHINE, "long_greeting"
+    if f["words"] >= MAX_WORDS:
+        return MACHINE, "max_words"
+    if f["after_greeting_silence_sec"] >= AFTER_GREETING_SILENCE_SEC:
+        return HUMAN, "short_greeting"
+    return (UNKNOWN, "not_sure") if final else None
+
+
+def classify(samples, rate):
+    """Klasifikasi satu potongan audio utuh (mis. fixture WAV)."""
+    f = features(samples, rate)
+    label, reason = decide(f, final=True)
+    return AmdResult(label, reason, f["duration_sec"], f)
+
+
+class AmdDetector:
+    """Keputusan streaming: statistik frame baru ditambahkan, keputusan dinilai ulang setiap feed()."""
+
+    def __init__(self, max_sec=3.5):
+        self.max_sec = max_sec
+        self.rest = np.zeros(0, dtype=np.int16)   # sisa sampel < 1 frame (atau rate belum diketahui)
+        self.db = np.zeros(0)
+        self.beep = np.zeros(0, dtype=bool)
+        self.peak = None                          # bin puncak frame terakhir (stabilitas beep)
+        self.n = 0
+        self.rate = None
+
+    def _consume(self):
+        step = self.rate * FRAME_MS // 1000
+        k = len(self.rest) // step
+        if not k:
+            return
+        db, beep, peak = frame_stats(frames(self.rest[:k * step], self.rate), self.rate, self.peak)
+        self.rest = self.rest[k * step:]
+        self.db = np.concatenate((self.db, db))
+        self.beep = np.concatenate((self.beep, beep))
+        self.peak = int(peak[-1])
+
+    def feed(self, samples, rate):
+        if len(samples):
+            self.rest = np.concatenate((self.rest, np.asarray(samples, dtype=np.int16)))
+            self.n += len(samples)
+        self.rate = rate
+        if not rate or not self.n:
+            return None
+        self._consume()
+        f = summarize(self.db, self.beep)
+        final = f["duration_sec"] >= self.max_sec
+        d = decide(f, final=final)
+        return AmdResult(d[0], d[1], f["duration_sec"], f) if d else None
+
+    def finish(self):
+        if not self.n or not self.rate:
+            return AmdResult(UNKNOWN, "no_audio", 0.0, {})
+        self._consume()
+        f = summarize(self.db, self.beep)
+        label, reason = decide(f, final=True)
+        return AmdResult(label, reason, f["duration_sec"], f)
+
+
+class WavTail:
+    """
+    Baca WAV PCM16 yang masih ditulis (recorder pjsua): header size belum final,
+    jadi data dibaca langsung setelah chunk "data".
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rate = None
+        self.offset = None
+
+    def _parse_header(self, f):
+        head = f.read(4096)
+        if len(head) < 44 or head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+            return False
+        pos = 12
+        while pos + 8 <= len(head):
+            cid, size = head[pos:pos + 4], struct.unpack("<I", head[pos + 4:pos + 8])[0]
+            if cid == b"fmt ":
+                self.rate = struct.unpack("<I", head[pos + 12:pos + 16])[0]
+            elif cid == b"data":
+                self.offset = pos + 8
+                return self.rate is not None
+            pos += 8 + size
+        return False
+
+    def read(self):
+        """Return sampel int16 baru sejak read() terakhir (array kosong jika belum ada)."""
+        try:
+            with open(self.path, "rb") as f:
+                if self.offset is None and not self._parse_header(f):
+                    return np.zeros(0, dtype=np.int16)
+                f.seek(self.offset)
+                data = f.read()
+        except OSError:
+            return np.zeros(0, dtype=np.int16)
+        usable = len(data) - (len(data) % 2)
+        self.offset += usable
+        return np.frombuffer(data[:usable], dtype="<i2")
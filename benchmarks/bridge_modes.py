@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark mode bridge: agent_first vs peer_first.
+
+Default: server_linux2 dijalankan dua kali dengan pjsua simulasi (PJSUA_BACKEND=sim,
+lewat sim_load.py), sekali per BRIDGE_MODE, sehingga yang diukur adalah jalur
+bridge_agent_with_peer / bridge_peer_first yang sebenarnya. Hasil dari statistik
+bridge server (/api/log): detik agent tersambung tanpa lawan bicara per bridge
+(dikonversi ke detik simulasi, dibagi time_scale) dan leg agent yang tidak jadi di-bridge.
+
+--model: model Monte Carlo terpisah (bukan kode server) dengan distribusi hasil
+nasabah sendiri; berguna untuk eksplorasi parameter, outputnya diberi label "model".
+
+  python benchmarks/bridge_modes.py --rows 300
+  python benchmarks/bridge_modes.py --rows 300 --sim '{"answer_prob": 0.2}' --json
+  python benchmarks/bridge_modes.py --model --calls 50000 --answer-rate 0.2
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path[0] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+from benchmarks import sim_load  # noqa: E402
+from sip_outcome import CallOutcome  # noqa: E402
+
+MODES = ("agent_first", "peer_first")
+
+
+def run_sim(mode, args):
+    """Satu run server (pjsua_sim) dengan BRIDGE_MODE=mode."""
+    os.environ["BRIDGE_MODE"] = mode
+    res = sim_load.run(argparse.Namespace(rows=args.rows, shards=0, agents=args.agents, cps=1000.0,
+                                          time_scale=args.time_scale, gap=0.0, sim=args.sim, seed=args.seed,
+                                          timeout=args.timeout))
+    b = res.get("bridge") or {}
+    scale = res["sim"]["time_scale"]
+    idle = b.get("idle_sec_per_bridge")
+    return {
+        "mode": mode,
+        "source": "pjsua_sim",
+        "rows": res["processed"],
+        "bridged": b.get("bridged"),
+        "agent_legs": b.get("agent_legs"),
+        "agent_legs_unbridged": (b["agent_legs"] - b["bridged"]) if b else None,
+        "agent_idle_sec_per_bridge": round(idle / scale, 2) if idle is not None else None,
+        "rows_per_sec": res["rows_per_sec"],
+        "timed_out": res["timed_out"],
+    }
+
+
+def sample_peer(rng, args):
+    """Return (outcome, detik sampai jawab / final response)."""
+    r = rng.random()
+    if r < args.answer_rate:
+        # waktu jawab nasabah: lognormal, median ~ args.answer_median
+        t = rng.lognormvariate(0, 0.5) * args.answer_median
+        if t < args.ring_timeout:
+            return CallOutcome.ANSWERED, t
+        return CallOutcome.NO_ANSWER, args.ring_timeout
+    r -= args.answer_rate
+    if r < args.fast_fail_rate:
+        # sibuk / invalid / tidak aktif: final response cepat
+        return rng.choice((CallOutcome.BUSY, CallOutcome.INVALID, CallOutcome.UNAVAILABLE)), rng.uniform(1, 6)
+    return CallOutcome.NO_ANSWER, args.ring_timeout
+
+
+def simulate(mode, args, seed):
+    rng = random.Random(seed)
+    connected = 0
+    agent_idle = 0.0
+    agent_rings = 0
+    customer_wait = 0.0
+    abandoned = 0
+    wall = 0.0
+    for _ in range(args.calls):
+        outcome, t_peer = sample_peer(rng, args)
+        t_agent = rng.uniform(*args.agent_answer)
+        patience = rng.expovariate(1.0 / args.patience)
+        if mode == "agent_first":
+            # agent ditelepon dulu, lalu mendengar ringback selama nasabah dipanggil
+            agent_rings += 1
+            agent_idle += t_peer
+            wall += t_agent + t_peer
+            if outcome == CallOutcome.ANSWERED:
+                connected += 1
+        else:
+            wall += t_peer
+            if outcome != CallOutcome.ANSWERED:
+                continue
+            # nasabah menjawab -> agent dipanggil; nasabah menunggu t_agent
+            agent_rings += 1
+            wall += t_agent
+            if patience < t_agent or t_agent > args.agent_timeout:
+                abandoned += 1
+                continue
+            connected += 1
+            customer_wait += t_agent
+    return {
+        "mode": mode,
+        "source": "model",
+        "calls": args.calls,
+        "connected": connected,
+        "abandoned": abandoned,
+        "agent_rings": agent_rings,
+        "agent_idle_sec_per_connected": round(agent_idle / connected, 2) if connected else None,
+        "customer_wait_sec_per_connected": round(customer_wait / connected, 2) if connected else None,
+        "wall_sec_per_connected": round(wall / connected, 2) if connected else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="agent idle per panggilan terhubung: agent_first vs peer_first")
+    ap.add_argument("--rows", type=int, default=200, help="row per mode (run pjsua_sim)")
+    ap.add_argument("--agents", type=int, default=2)
+    ap.add_argument("--time-scale", type=float, default=0.01, help="pengali durasi simulasi")
+    ap.add_argument("--sim", help="konfigurasi PJSUA_SIM tambahan (JSON)")
+    ap.add_argument("--timeout", type=float, default=600.0)
+    ap.add_argument("--model", action="store_true", help="model Monte Carlo, bukan server (opsi di bawah)")
+    ap.add_argument("--calls", type=int, default=20000)
+    ap.add_argument("--answer-rate", type=float, default=0.3)
+    ap.add_argument("--fast-fail-rate", type=float, default=0.25)
+    ap.add_argument("--answer-median", type=float, default=12.0)
+    ap.add_argument("--ring-timeout", type=float, default=45.0)
+    ap.add_argument("--agent-answer", type=float, nargs=2, default=(1.0, 3.0), metavar=("MIN", "MAX"))
+    ap.add_argument("--agent-timeout", type=float, default=15.0)
+    ap.add_argument("--patience", type=float, default=10.0, help="rata-rata detik nasabah mau menunggu agent")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    if args.model:
+        results = [simulate(mode, args, args.seed) for mode in MODES]
+        cols = ("mode", "connected", "abandoned", "agent_rings", "agent_idle_sec_per_connected",
+                "customer_wait_sec_per_connected", "wall_sec_per_connected")
+    else:
+        results = [run_sim(mode, args) for mode in MODES]
+        cols = ("mode", "rows", "bridged", "agent_legs", "agent_legs_unbridged", "agent_idle_sec_per_bridge",
+                "rows_per_sec")
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"[{results[0]['source']}]")
+    print("  ".join(f"{c:>14}" if i else f"{c:<12}" for i, c in enumerate(cols)))
+    for r in results:
+        print("  ".join(f"{str(r[c]):>14}" if i else f"{r[c]:<12}" for i, c in enumerate(cols)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark agregasi CDR (cdr_stats.py) atas satu hari CDR sintetis.
+
+  python benchmarks/cdr_stats.py                      # 3 juta leg, direktori sementara
+  python benchmarks/cdr_stats.py --legs 5000000 --json
+
+Query pertama memindai semua bucket jam; query kedua memakai cache bucket yang
+sudah tutup dan hanya memindai jam yang masih berjalan.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cdr_store import DTYPE, append_columns  # noqa: E402
+from cdr_stats import CdrStats, GROUP_BY  # noqa: E402
+
+
+def generate(root, legs, day_start, seed=1, writers=4):
+    rng = np.random.default_rng(seed)
+    arr = np.zeros(legs, dtype=DTYPE)
+    arr["ts"] = np.sort(day_start + rng.uniform(0, 86400, legs))
+    arr["row_id"] = rng.integers(1, legs // 2, legs)
+    prefixes = np.array([b"+62811", b"+62812", b"+62813", b"+62821", b"+62852", b"+62857", b"+62878", b"+6221"])
+    arr["number"] = np.char.add(prefixes[rng.integers(0, len(prefixes), legs)],
+                                np.char.zfill(rng.integers(0, 10 ** 8, legs).astype("S8"), 8))
+    arr["phase"] = np.array([b"agent", b"peer", b"ec"])[rng.choice(3, legs, p=(0.3, 0.6, 0.1))]
+    arr["agent"] = np.char.add(b"10", np.char.zfill(rng.integers(0, 200, legs).astype("S3"), 3))
+    arr["trunk"] = np.array([b"infin8-7060", b"infin8-6070", b"backup"])[rng.integers(0, 3, legs)]
+    answered = rng.random(legs) < 0.3
+    arr["outcome"] = np.where(answered, b"answered", np.array([b"no_answer", b"busy"])[rng.integers(0, 2, legs)])
+    arr["code"] = np.where(answered, 200, 480)
+    arr["ring_sec"] = np.where(answered, rng.lognormal(2.3, 0.5, legs), 45.0)
+    arr["answer_sec"] = np.where(answered, arr["ring_sec"], np.nan)
+    arr["bridge_sec"] = np.where(answered & (rng.random(legs) < 0.9), arr["ring_sec"] + 0.2, np.nan)
+    arr["setup_sec"] = rng.uniform(0.5, 3, legs)
+    arr["duration_sec"] = np.where(answered, rng.exponential(90, legs), np.nan)
+    day = time.strftime("%Y%m%d", time.localtime(day_start))
+    for w, part in enumerate(np.array_split(arr, writers)):
+        d = os.path.join(root, day, f"bench-{w}")
+        os.makedirs(d, exist_ok=True)
+        append_columns(d, part)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="waktu agregasi /api/stats atas CDR memmap")
+    ap.add_argument("--legs", type=int, default=3_000_000)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+    lt = time.localtime()
+    day_start = time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday, 0, 0, 0, 0, 0, -1)) - 86400   # kemarin
+    results = {"legs": args.legs}
+    with tempfile.TemporaryDirectory() as root:
+        generate(root, args.legs, day_start)
+        # "now" = jam 18:30 hari itu: 18 bucket tutup, sisanya masih berjalan
+        now = day_start + 18.5 * 3600
+        for by in GROUP_BY:
+            stats = CdrStats(root)
+            cold = stats.query(day_start, day_start + 86400, by=by, now=now)
+            warm = stats.query(day_start, day_start + 86400, by=by, now=now)
+            results[by] = {"groups": len(cold["groups"]), "cold_ms": cold["elapsed_ms"],
+                           "warm_ms": warm["elapsed_ms"], "cached_buckets": warm["cached_buckets"],
+                           "answer_rate": cold["total"]["answer_rate"]}
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for k, v in results.items():
+            print(f"{k:8s} {v}")
+
+
+if __name__ == "__main__":
+    main()
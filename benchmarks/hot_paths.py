@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark jalur panas server_linux2 (tanpa PJSIP / trunk: pjsua_sim).
+
+  publish_event    throughput event/detik dengan 1 / 4 / 16 thread bersaing
+  events_poll      latensi GET /events dengan 2000 event di buffer dan 50 poller
+  push_data        ingestion POST /push-data 100k row (normalisasi + antrian)
+  broadcast        biaya broadcast_to_clients: client cepat, lambat, mati
+  api_log          latensi GET /api/log (status_snapshot) dengan antrian terisi
+
+Hasil JSON (--out) bisa dibandingkan antar versi:
+
+  python benchmarks/hot_paths.py --out bench-before.json
+  python benchmarks/hot_paths.py --compare bench-before.json --out bench-after.json
+  python benchmarks/hot_paths.py --only publish_event,api_log --quick
+
+Konvensi nama metrik untuk --compare: akhiran _per_sec = makin besar makin baik,
+akhiran _ms / _us = makin kecil makin baik (max_* diabaikan karena terlalu berisik);
+lainnya hanya informasi.
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path[0] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# pjsua simulasi: server_linux2 bisa di-import tanpa binding native; benchmark memicu callback sendiri
+os.environ["PJSUA_BACKEND"] = "sim"
+
+
+def pct(vals, q):
+    vals = sorted(vals)
+    return vals[min(len(vals) - 1, int(q * len(vals)))] if vals else None
+
+
+def lat_summary(samples_sec, unit="ms"):
+    k = 1000.0 if unit == "ms" else 1e6
+    return {f"p50_{unit}": round(pct(samples_sec, 0.5) * k, 3), f"p99_{unit}": round(pct(samples_sec, 0.99) * k, 3),
+            f"max_{unit}": round(max(samples_sec) * k, 3), "samples": len(samples_sec)}
+
+
+def reset(srv):
+    srv.call_queue.clear()
+    with srv.event_lock:
+        srv.events_buf.clear()
+    srv.connected_clients.clear()
+
+
+# ===========================================================
+#                       Benchmark
+# ===========================================================
+def bench_publish_event(srv, quick):
+    out = {}
+    per_thread = 5000 if quick else 20000
+    for n in (1, 4, 16):
+        reset(srv)
+        barrier = threading.Barrier(n + 1)
+
+        def pub():
+            barrier.wait()
+            for i in range(per_thread):
+                srv.publish_event({"type": "bench", "payload": {"i": i}}, also_broadcast=False)
+        ts = [threading.Thread(target=pub) for _ in range(n)]
+        for t in ts:
+            t.start()
+        barrier.wait()
+        t0 = time.perf_counter()
+        for t in ts:
+            t.join()
+        dt = time.perf_counter() - t0
+        out[f"threads_{n}"] = {"events_per_sec": round(n * per_thread / dt), "events": n * per_thread}
+    return out
+
+
+def bench_events_poll(srv, quick):
+    reset(srv)
+    for i in range(srv.EVENT_MAX):
+        srv.publish_event({"type": "bench", "payload": {"i": i, "phone": "+6281234567890"}}, also_broadcast=False)
+    pollers = 50
+    polls = 10 if quick else 40
+    samples = [[] for _ in range(pollers)]
+    barrier = threading.Barrier(pollers)
+
+    def poller(k):
+        client = srv.app.test_client()
+        barrier.wait()
+        since = 0
+        for j in range(polls):
+            # separuh poller baru tersambung (since=0, seluruh buffer), sisanya mengikuti
+            q = 0 if (k + j) % 2 == 0 else since
+            t0 = time.perf_counter()
+            r = client.get(f"/events?since={q}")
+            samples[k].append(time.perf_counter() - t0)
+            since = r.get_json()["last_id"]
+    ts = [threading.Thread(target=poller, args=(k,)) for k in range(pollers)]
+    t0 = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    wall = time.perf_counter() - t0
+    flat = [x for s in samples for x in s]
+    return dict(lat_summary(flat), buffered=len(srv.events_buf), pollers=pollers,
+                polls_per_sec=round(len(flat) / wall, 1))
+
+
+def bench_push_data(srv, quick):
+    reset(srv)
+    n = 20000 if quick else 100000
+    rows = [{"nama_nasabah": f"Nasabah {i}", "phone": f"0812{i:08d}", "ec_phone_1": f"+62 857-{i:08d}",
+             "total_tagihan": 1000 + i} for i in range(n)]
+    body = json.dumps({"user": {"num_sip": "1001", "pas_sip": "x"}, "data": rows})
+    client = srv.app.test_client()
+    t0 = time.perf_counter()
+    r = client.post("/push-data", data=body, content_type="application/json")
+    dt = time.perf_counter() - t0
+    res = r.get_json()
+    queued = srv.call_queue.qsize()
+    reset(srv)
+    return {"rows": n, "enqueued": res.get("enqueued"), "queued": queued, "total_ms": round(dt * 1000, 1),
+            "rows_per_sec": round(n / dt)}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    delay = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.delay:
+            time.sleep(self.delay)
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(delay):
+    handler = type("H", (_Handler,), {"delay": delay})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+
+
+def _dead_url():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()       # port ditutup -> connection refused
+    return f"http://127.0.0.1:{port}"
+
+
+def bench_broadcast(srv, quick):
+    reps = 10 if quick else 30
+    fast = [_serve(0.0) for _ in range(3)]
+    slow = _serve(0.2)
+    payload = {"user": {"username": "worker"}, "data": [], "progress": {"phase": "bench", "detail": "x"}}
+    out = {}
+
+    def measure(clients, n=reps):
+        samples = []
+        for _ in range(n):
+            srv.connected_clients.clear()
+            srv.connected_clients.update(clients)
+            t0 = time.perf_counter()
+            srv.broadcast_to_clients("/receive-info", payload)
+            samples.append(time.perf_counter() - t0)
+        return lat_summary(samples)
+
+    out["fast_3"] = measure([u for _, u in fast])
+    out["fast_3_slow_1"] = measure([u for _, u in fast] + [slow[1]], n=max(3, reps // 5))
+    out["fast_3_dead_1"] = measure([u for _, u in fast] + [_dead_url()])
+    srv.connected_clients.clear()
+    srv.connected_clients.update([u for _, u in fast] + [_dead_url()])
+    srv.broadcast_to_clients("/receive-info", payload)
+    out["dead_pruned"] = len(srv.connected_clients) == len(fast)
+    for httpd, _ in fast + [slow]:
+        httpd.shutdown()
+    srv.connected_clients.clear()
+    return out
+
+
+def bench_api_log(srv, quick):
+    reset(srv)
+    for i in range(500):
+        srv.call_queue.put({"_row_id": i, "phone": f"+62812{i:08d}", "_sip_user": "1001"})
+    client = srv.app.test_client()
+    samples = []
+    for _ in range(200 if quick else 1000):
+        t0 = time.perf_counter()
+        client.get("/api/log")
+        samples.append(time.perf_counter() - t0)
+    reset(srv)
+    return lat_summary(samples)
+
+
+BENCHES = {
+    "publish_event": bench_publish_event,
+    "events_poll": bench_events_poll,
+    "push_data": bench_push_data,
+    "broadcast": bench_broadcast,
+    "api_log": bench_api_log,
+}
+
+
+# ===========================================================
+#                  Hasil & perbandingan
+# ===========================================================
+def meta():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=sys.path[0], timeout=5).stdout.strip() or None
+    except Exception:
+        rev = None
+    return {"git": rev, "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def flatten(d, prefix=""):
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(flatten(v, key + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = v
+    return out
+
+
+def compare(old, new, threshold):
+    """Baris perbandingan + daftar regresi (lebih buruk dari threshold)."""
+    a, b = flatten(old["results"]), flatten(new["results"])
+    lines, regressions = [], []
+    for key in sorted(set(a) & set(b)):
+        if key.rsplit(".", 1)[-1].startswith("max_"):
+            continue
+        if key.endswith("_per_sec"):
+            better = 1
+        elif key.endswith(("_ms", "_us")):
+            better = -1
+        else:
+            continue
+        if not a[key]:
+            continue
+        change = (b[key] - a[key]) / a[key]
+        worse = change * better < -threshold
+        lines.append(f"{key:40s} {a[key]:>12} -> {b[key]:>12}  {change:+.1%}{'  REGRESI' if worse else ''}")
+        if worse:
+            regressions.append(key)
+    return lines, regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="microbenchmark jalur panas dialer")
+    ap.add_argument("--only", help="daftar benchmark dipisah koma: " + ",".join(BENCHES))
+    ap.add_argument("--quick", action="store_true", help="ukuran kecil (cek cepat / CI)")
+    ap.add_argument("--out", help="tulis hasil JSON ke file")
+    ap.add_argument("--compare", help="hasil JSON versi sebelumnya")
+    ap.add_argument("--threshold", type=float, default=0.10, help="batas regresi (0.10 = 10%%)")
+    args = ap.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHES)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="hotpath-") as tmp:
+        os.environ.setdefault("CDR_DIR", os.path.join(tmp, "cdr"))
+        os.environ.setdefault("PJSIP_LOG_FILE", "")
+        os.environ.setdefault("CALLING_WINDOW", "0")
+        import server_linux2 as srv
+        try:
+            for name in names:
+                t0 = time.perf_counter()
+                results[name] = BENCHES[name](srv, args.quick)
+                print(f"[bench] {name}: {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+        finally:
+            if srv.cdr_writer is not None:
+                srv.cdr_writer.close()      # flush sebelum direktori sementara dihapus
+    doc = {"meta": dict(meta(), quick=args.quick), "results": results}
+    text = json.dumps(doc, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        if old["meta"].get("quick") != args.quick:
+            print("[bench] peringatan: ukuran (--quick) berbeda dengan hasil pembanding", file=sys.stderr)
+        lines, regressions = compare(old, doc, args.threshold)
+        print("\n".join(lines), file=sys.stderr)
+        if regressions:
+            print(f"[bench] {len(regressions)} metrik regresi > {args.threshold:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
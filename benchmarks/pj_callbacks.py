@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Benchmark latensi callback PJSIP (_CallCb.on_state / on_media_state) dengan banyak leg hidup.
+
+Setiap leg melewati CALLING -> 180 -> early media -> CONFIRMED -> DISCONNECTED; callback
+dipicu dari beberapa thread "PJSIP" sekaligus, semua leg hidup bersamaan. Yang diukur
+adalah waktu di dalam callback (yang menahan thread PJSIP), bukan waktu proses consumer.
+
+  python benchmarks/pj_callbacks.py                     # 500 leg, antrian ke consumer
+  python benchmarks/pj_callbacks.py --inline            # perbandingan: proses langsung di callback
+  python benchmarks/pj_callbacks.py --slow-ms 2 --json  # consumer lambat (CDR / broadcast tersendat)
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# root repo menggantikan direktori benchmarks di sys.path (nama skrip bisa sama dengan modul repo)
+sys.path[0] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# pjsua simulasi: server_linux2 bisa di-import tanpa binding native; benchmark memicu callback sendiri
+os.environ["PJSUA_BACKEND"] = "sim"
+
+import pjsua_sim as pj  # noqa: E402
+
+
+class _Info:
+    __slots__ = ("state", "state_text", "last_code", "last_reason", "sip_call_id", "media_state")
+
+
+class FakeCall:
+    """Objek call minimal: info() mengembalikan state terakhir yang di-set benchmark."""
+
+    def __init__(self, call_id):
+        self.info_obj = _Info()
+        self.info_obj.sip_call_id = call_id
+        self.info_obj.last_reason = ""
+        self.info_obj.media_state = pj.MediaState.NULL
+
+    def set(self, state, code, reason=""):
+        i = self.info_obj
+        i.state, i.state_text, i.last_code, i.last_reason = state, str(state), code, reason
+
+    def info(self):
+        return self.info_obj
+
+    def hangup(self):
+        pass
+
+
+STEPS = (
+    ("state", pj.CallState.CALLING, 0),
+    ("state", pj.CallState.EARLY, 180),
+    ("media", pj.MediaState.ACTIVE, 0),
+    ("state", pj.CallState.CONFIRMED, 200),
+    ("state", pj.CallState.DISCONNECTED, 200),
+)
+
+
+def percentile(sorted_vals, q):
+    if not sorted_vals:
+        return None
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+
+def run(srv, legs, threads, inline, slow_ms):
+    from call_session import CallSession
+    sip = srv.sip
+    if inline:
+        # perilaku lama: seluruh pemrosesan jalan di thread callback
+        sip.callbacks.put = lambda fn, *args: fn(*args)
+    if slow_ms:
+        orig = srv.leg_finished
+
+        def slow_leg_finished(cb):
+            time.sleep(slow_ms / 1000.0)
+            orig(cb)
+        srv.leg_finished = slow_leg_finished
+
+    cbs = []
+    for i in range(legs):
+        sess = CallSession("peer", f"+628120000{i:04d}", row_id=i + 1, agent="1001")
+        sip.calls.add(sess)
+        cb = srv._CallCb(threading.Event(), threading.Event(), threading.Event(), session=sess)
+        cb.call = FakeCall(f"bench-{i}")
+        sess.call = cb.call
+        cbs.append(cb)
+
+    samples = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads)
+
+    def pjsip_thread(k):
+        mine = cbs[k::threads]
+        out = samples[k]
+        barrier.wait()
+        for kind, value, code in STEPS:
+            # semua leg thread ini maju satu langkah -> semua leg hidup bersamaan
+            for cb in mine:
+                if kind == "state":
+                    cb.call.set(value, code)
+                    t0 = time.perf_counter_ns()
+                    cb.on_state()
+                else:
+                    cb.call.info_obj.media_state = value
+                    t0 = time.perf_counter_ns()
+                    cb.on_media_state()
+                out.append(time.perf_counter_ns() - t0)
+
+    lag_before = sip.callbacks.max_lag
+    started = time.perf_counter()
+    ts = [threading.Thread(target=pjsip_thread, args=(k,), name=f"pjsip-{k}") for k in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    fired = time.perf_counter() - started
+    sip.callbacks.wait_idle(timeout=120)
+    drained = time.perf_counter() - started
+
+    vals = sorted(v / 1000.0 for s in samples for v in s)
+    done = sum(cb.disconnected_event.is_set() for cb in cbs)
+    return {
+        "mode": "inline" if inline else "queued",
+        "legs": legs, "threads": threads, "slow_ms": slow_ms,
+        "callbacks": len(vals),
+        "callback_us": {"p50": round(percentile(vals, 0.50), 2), "p99": round(percentile(vals, 0.99), 2),
+                        "p999": round(percentile(vals, 0.999), 2), "max": round(vals[-1], 2),
+                        "mean": round(sum(vals) / len(vals), 2)},
+        "fire_sec": round(fired, 3),
+        "drain_sec": round(drained, 3),
+        "consumer_max_lag_ms": None if inline else round(max(sip.callbacks.max_lag, lag_before) * 1000, 2),
+        "legs_finished": done,
+        "active_after": sip.calls.snapshot_counts().get("active"),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="latensi callback PJSIP dengan banyak leg hidup")
+    ap.add_argument("--legs", type=int, default=500)
+    ap.add_argument("--threads", type=int, default=4, help="thread yang memicu callback (thread PJSIP)")
+    ap.add_argument("--inline", action="store_true", help="proses di callback (perilaku sebelum antrian)")
+    ap.add_argument("--slow-ms", type=float, default=0.0, help="tambahan waktu proses per leg selesai")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="pjcb-") as tmp:
+        os.environ.setdefault("CDR_DIR", os.path.join(tmp, "cdr"))
+        os.environ.setdefault("PJSIP_LOG_FILE", "")
+        os.environ.setdefault("CALLING_WINDOW", "0")
+        import server_linux2 as srv
+        try:
+            result = run(srv, args.legs, args.threads, args.inline, args.slow_ms)
+        finally:
+            if srv.cdr_writer is not None:
+                srv.cdr_writer.close()      # flush sebelum direktori sementara dihapus
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for k, v in result.items():
+            print(f"{k:20s} {v}")
+
+
+if __name__ == "__main__":
+    main()
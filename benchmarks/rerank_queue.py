@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark urut ulang antrian (best_time.py + dial_queue.py).
+
+Histori sintetis: setiap nomor punya jam favorit (peluang jawab tinggi di jam itu),
+lalu antrian N row diurutkan ulang untuk jam tertentu.
+
+  python benchmarks/rerank_queue.py
+  python benchmarks/rerank_queue.py --rows 500000 --history 200000 --json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from best_time import BestTimeModel, HOURS  # noqa: E402
+from dial_queue import DialQueue  # noqa: E402
+
+
+def build(args):
+    rng = np.random.default_rng(args.seed)
+    numbers = [f"+6281{i:09d}" for i in range(args.rows)]
+    favorite = rng.integers(8, 20, size=args.rows)
+    model = BestTimeModel()
+    t0 = time.perf_counter()
+    for i in range(args.history):
+        for _ in range(args.attempts):
+            h = int(rng.integers(8, 20))
+            p = 0.6 if h == favorite[i] else 0.1
+            model.record(numbers[i], rng.random() < p, hour=h)
+    record_sec = time.perf_counter() - t0
+    q = DialQueue()
+    for i in rng.permutation(args.rows):
+        q.put({"phone": numbers[i], "_row_id": int(i)})
+    return model, q, favorite, record_sec
+
+
+def main():
+    ap = argparse.ArgumentParser(description="waktu rerank antrian dengan model jam terbaik")
+    ap.add_argument("--rows", type=int, default=500_000)
+    ap.add_argument("--history", type=int, default=100_000, help="jumlah nomor yang punya histori")
+    ap.add_argument("--attempts", type=int, default=4, help="percobaan per nomor berhistori")
+    ap.add_argument("--hour", type=int, default=10)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+    args.history = min(args.history, args.rows)
+    assert 0 <= args.hour < HOURS
+
+    model, q, favorite, record_sec = build(args)
+    times = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        model.rerank(q, hour=args.hour)
+        times.append((time.perf_counter() - t0) * 1000)
+    head = [r["_row_id"] for r in q.snapshot()[:max(1, args.rows // 20)]]
+    hist_head = [i for i in head if i < args.history]
+    result = {
+        "rows": args.rows,
+        "history_numbers": len(model),
+        "record_us": round(record_sec / max(1, args.history * args.attempts) * 1e6, 2),
+        "rerank_ms_min": round(min(times), 1),
+        "rerank_ms_mean": round(sum(times) / len(times), 1),
+        # 5% teratas: porsi nomor berhistori yang jam favoritnya = jam rerank
+        "head_favorite_hit": round(float(np.mean(favorite[hist_head] == args.hour)), 3) if hist_head else None,
+        "base_favorite_rate": round(1 / 12, 3),
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for k, v in result.items():
+            print(f"{k:20s} {v}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Load test alur call_flow_worker penuh dengan pjsua simulasi (pjsua_sim.py), tanpa trunk.
+
+Server dijalankan sebagai subprocess (PJSUA_BACKEND=sim), N row di-push lewat /push-data,
+/api/call memulai worker, lalu /api/log dipantau sampai antrian habis dan worker diam
+(row sibuk yang dijadwalkan ulang tidak ditunggu). Hasil:
+row/detik, distribusi outcome leg dari /metrics, lag consumer callback.
+
+Satu agent hanya dilayani satu shard (satu row sekaligus), jadi --agents menentukan
+paralelisme; CPS trunk server dilonggarkan (--cps) agar yang diukur dialer, bukan limiter.
+
+  python benchmarks/sim_load.py --rows 2000 --shards 4 --agents 8
+  python benchmarks/sim_load.py --rows 500 --sim '{"answer_prob": 0.6}' --time-scale 0.05
+  python benchmarks/sim_load.py --rows 5000 --shards 8 --out sim-load.json
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def free_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def http(base, path, body=None, timeout=30):
+    data = None if body is None else json.dumps(body).encode()
+    req = urllib.request.Request(base + path, data=data, headers={"Content-Type": "application/json"},
+                                 method="GET" if body is None else "POST")
+    with urllib.request.urlopen(req, timeout=timeout) as r:
+        raw = r.read().decode()
+    return json.loads(raw) if r.headers.get_content_type() == "application/json" else raw
+
+
+def wait_up(base, proc, timeout=30):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server keluar (kode {proc.returncode})")
+        try:
+            return http(base, "/api/log", timeout=2)
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server tidak merespons")
+
+
+def parse_metrics(text):
+    """Ambil dialer_legs_total {leg: {outcome: n}} dan sum/count lag callback."""
+    legs = {}
+    lag_sum = lag_count = 0.0
+    for line in text.splitlines():
+        m = re.match(r'dialer_legs_total\{leg="([^"]*)",outcome="([^"]*)"\} (\S+)', line)
+        if m:
+            legs.setdefault(m.group(1), {})[m.group(2)] = int(float(m.group(3)))
+        elif line.startswith("dialer_callback_lag_seconds_sum"):
+            lag_sum += float(line.split()[-1])
+        elif line.startswith("dialer_callback_lag_seconds_count"):
+            lag_count += float(line.split()[-1])
+    return legs, (lag_sum / lag_count * 1000 if lag_count else None)
+
+
+def run(args):
+    with tempfile.TemporaryDirectory(prefix="simload-") as tmp:
+        return _run(args, tmp)
+
+
+def _run(args, tmp):
+    port = free_port()
+    sim = json.loads(args.sim) if args.sim else {}
+    sim.setdefault("time_scale", args.time_scale)
+    if args.seed is not None:
+        sim.setdefault("seed", args.seed)
+    env = dict(os.environ, PJSUA_BACKEND="sim", PJSUA_SIM=json.dumps(sim), DIALER_PORT=str(port),
+               DIALER_SHARDS=str(args.shards), RETRY_GAP_SEC=str(args.gap), CALLING_WINDOW="0",
+               TRUNK_CPS=str(args.cps), TRUNK_BURST=str(max(1, int(args.cps))),
+               CDR_DIR=os.path.join(tmp, "cdr"), PJSIP_LOG_FILE="", PYTHONPATH=ROOT)
+    log_path = os.path.join(tmp, "server.log")
+    log = open(log_path, "w")
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "server_linux2.py")], cwd=tmp, env=env,
+                            stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        wait_up(base, proc)
+        agents = max(1, args.agents or args.shards)
+        for a in range(agents):
+            rows = [{"nama_nasabah": f"Sim {i}", "phone": f"0812{i:08d}", "ec_phone_1": f"0857{i:08d}"}
+                    for i in range(a, args.rows, agents)]
+            http(base, "/push-data", {"user": {"num_sip": str(1001 + a), "pas_sip": "sim"}, "data": rows},
+                 timeout=120)
+        t0 = time.monotonic()
+        http(base, "/api/call", {})
+        processed, peak_active, done, st = 0, 0, False, {}
+        while not done and time.monotonic() - t0 < args.timeout:
+            time.sleep(0.5)
+            st = http(base, "/api/log")
+            processed = st.get("processed", 0)
+            peak_active = max(peak_active, (st.get("calls") or {}).get("active", 0))
+            done = processed > 0 and not st.get("queue_size") and not st.get("in_progress")
+        wall = time.monotonic() - t0
+        legs, lag_ms = parse_metrics(http(base, "/metrics"))
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        log.close()
+    result = {
+        "rows": args.rows, "processed": processed, "shards": args.shards, "agents": agents, "sim": sim,
+        "wall_sec": round(wall, 1), "rows_per_sec": round(processed / wall, 2) if wall else None,
+        "peak_active_legs": peak_active, "callback_lag_mean_ms": None if lag_ms is None else round(lag_ms, 3),
+        "legs": legs, "legs_total": sum(n for by in legs.values() for n in by.values()),
+        "bridge": st.get("bridge"), "timed_out": not done,
+    }
+    if not done:
+        # direktori sementara dihapus setelah run: simpan ekor log server untuk diagnosa
+        with open(log_path, errors="replace") as f:
+            result["server_log_tail"] = f.read().splitlines()[-40:]
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="load test dialer dengan pjsua simulasi")
+    ap.add_argument("--rows", type=int, default=1000)
+    ap.add_argument("--shards", type=int, default=0, help="DIALER_SHARDS (0 = satu proses)")
+    ap.add_argument("--agents", type=int, default=0, help="jumlah agent (default = jumlah shard, min 1)")
+    ap.add_argument("--cps", type=float, default=1000.0, help="TRUNK_CPS server")
+    ap.add_argument("--time-scale", type=float, default=0.01, help="pengali durasi simulasi")
+    ap.add_argument("--gap", type=float, default=0.0, help="RETRY_GAP_SEC server")
+    ap.add_argument("--sim", help="konfigurasi PJSUA_SIM tambahan (JSON)")
+    ap.add_argument("--seed", type=int)
+    ap.add_argument("--timeout", type=float, default=600.0)
+    ap.add_argument("--out", help="tulis hasil JSON ke file")
+    args = ap.parse_args()
+    result = run(args)
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    if result["timed_out"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
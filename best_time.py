@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Model jam terbaik untuk menelepon: hasil panggilan nasabah per nomor per jam (0-23).
+
+  - per nomor: percobaan & jawaban per jam (uint8 jenuh di 255), index dict nomor -> slot
+  - peluang jawab dihitung batch (NumPy) dengan smoothing ke prior global per jam:
+        p[n, h] = (jawab[n, h] + w * prior[h]) / (coba[n, h] + w)
+  - rank(): row dengan jam sekarang paling dekat ke jam terbaiknya didahulukan
+        skor = p[n, sekarang] / max_h p[n, h]   (urutan asal dipakai untuk skor sama)
+"""
+import os
+import threading
+import time
+from itertools import repeat
+from operator import itemgetter
+
+import numpy as np
+
+HOURS = 24
+
+
+class BestTimeModel:
+    def __init__(self, prior_weight=4.0, state_file=None):
+        self.prior_weight = prior_weight
+        self.state_file = state_file
+        self.lock = threading.Lock()
+        self.slots = {}
+        self.att = np.zeros((1024, HOURS), dtype=np.uint8)
+        self.ans = np.zeros((1024, HOURS), dtype=np.uint8)
+        self.global_att = np.zeros(HOURS, dtype=np.int64)
+        self.global_ans = np.zeros(HOURS, dtype=np.int64)
+        self.reranks = 0
+        self.last_rerank_ms = None
+        if state_file:
+            self.load()
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _slot(self, number):
+        idx = self.slots.get(number)
+        if idx is None:
+            idx = len(self.slots)
+            if idx >= len(self.att):
+                pad = np.zeros_like(self.att)
+                self.att = np.concatenate((self.att, pad))
+                self.ans = np.concatenate((self.ans, pad))
+            self.slots[number] = idx
+        return idx
+
+    def record(self, number, answered, hour=None):
+        """Satu percobaan ke nasabah pada jam `hour` (default jam lokal sekarang)."""
+        if not number:
+            return
+        h = time.localtime().tm_hour if hour is None else hour
+        with self.lock:
+            idx = self._slot(number)
+            if self.att[idx, h] < 255:
+                self.att[idx, h] += 1
+                if answered:
+                    self.ans[idx, h] += 1
+            self.global_att[h] += 1
+            if answered:
+                self.global_ans[h] += 1
+
+    def prior(self):
+        """Peluang jawab global per jam (Laplace)."""
+        return (self.global_ans + 1.0) / (self.global_att + 2.0)
+
+    def probabilities(self, idx):
+        """idx: array slot (-1 = nomor belum pernah ditelepon) -> float32[n, 24]."""
+        idx = np.asarray(idx, dtype=np.int64)
+        prior = self.prior().astype(np.float32)
+        w = np.float32(self.prior_weight)
+        known = idx >= 0
+        p = np.broadcast_to(prior, (len(idx), HOURS)).copy()
+        if known.any():
+            k = idx[known]
+            p[known] = (self.ans[k] + w * prior) / (self.att[k] + w)
+        return p
+
+    def rank(self, rows, hour=None, field="phone"):
+        """
+        Return urutan index rows (paling cocok ditelepon sekarang lebih dulu).
+        Nomor tanpa histori semuanya berskor prior yang sama, jadi hanya nomor
+        berhistori yang diurutkan lalu disisipkan sebelum/sesudah blok tanpa histori.
+        """
+        h = time.localtime().tm_hour if hour is None else hour
+        idx = np.fromiter(map(self.slots.get, map(itemgetter(field), rows), repeat(-1)),
+                          dtype=np.int64, count=len(rows))
+        known = np.flatnonzero(idx >= 0)
+        with self.lock:
+            p = self.probabilities(idx[known])
+            prior = self.prior()
+        p_now = p[:, h]
+        score = p_now / np.maximum(p.max(axis=1), 1e-9)
+        # skor sama -> peluang jawab absolut lebih tinggi dulu, lalu urutan asal
+        order = known[np.lexsort((-p_now, -score))]
+        base = prior[h] / prior.max()
+        n_hi = int(np.count_nonzero(score > base))
+        unknown = np.flatnonzero(idx < 0)
+        return np.concatenate((order[:n_hi], unknown, order[n_hi:]))
+
+    def rerank(self, queue, bucket=None, hour=None):
+        """Urutkan ulang satu bucket DialQueue. Return jumlah row yang diurutkan."""
+        t0 = time.perf_counter()
+        rows, mark = queue.snapshot(bucket, with_mark=True)
+        if len(rows) < 2:
+            return len(rows)
+        order = self.rank(rows, hour=hour)
+        if not queue.reorder(list(map(rows.__getitem__, order.tolist())), mark):
+            return 0
+        self.reranks += 1
+        self.last_rerank_ms = round((time.perf_counter() - t0) * 1000, 1)
+        return len(rows)
+
+    def best_hour(self, number):
+        idx = self.slots.get(number, -1)
+        with self.lock:
+            return int(self.probabilities([idx])[0].argmax())
+
+    def snapshot(self):
+        return {"numbers": len(self.slots), "attempts": int(self.global_att.sum()),
+                "answers": int(self.global_ans.sum()), "reranks": self.reranks,
+                "last_rerank_ms": self.last_rerank_ms}
+
+    # ---------------- persistensi ----------------
+    def save(self):
+        if not self.state_file:
+            return
+        with self.lock:
+            n = len(self.slots)
+            data = {"numbers": np.array(list(self.slots), dtype="U20"), "att": self.att[:n].copy(),
+                    "ans": self.ans[:n].copy(), "global_att": self.global_att.copy(),
+                    "global_ans": self.global_ans.copy()}
+        tmp = self.state_file + ".tmp.npz"
+        np.savez(tmp, **data)
+        os.replace(tmp, self.state_file)
+
+    def load(self):
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            d = np.load(self.state_file)
+            numbers = [str(x) for x in d["numbers"]]
+            cap = max(1024, len(numbers) * 2)
+            with self.lock:
+                self.slots = {num: i for i, num in enumerate(numbers)}
+                self.att = np.zeros((cap, HOURS), dtype=np.uint8)
+                self.ans = np.zeros((cap, HOURS), dtype=np.uint8)
+                self.att[:len(numbers)] = d["att"]
+                self.ans[:len(numbers)] = d["ans"]
+                self.global_att = d["global_att"].astype(np.int64)
+                self.global_ans = d["global_ans"].astype(np.int64)
+            print(f"[BEST-TIME] histori {len(numbers)} nomor dimuat dari {self.state_file}")
+        except Exception as e:
+            print(f"[BEST-TIME] gagal memuat {self.state_file}: {e}")
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+CallSession: record ringkas (slotted) untuk setiap leg SIP, plus registry
+live-call yang di-index per session id, SIP Call-ID, row id dan agent.
+
+Dipakai oleh /api/log, hangup per row dan metrics supaya semuanya lookup O(1),
+bukan scan semua leg.
+"""
+import itertools
+import threading
+import time
+from collections import defaultdict
+
+# State leg (mengikuti urutan pjsua CallState)
+NULL = "NULL"
+CALLING = "CALLING"
+EARLY = "EARLY"
+CONNECTING = "CONNECTING"
+CONFIRMED = "CONFIRMED"
+DISCONNECTED = "DISCONNECTED"
+
+_session_seq = itertools.count(1)
+
+
+class CallSession:
+    __slots__ = (
+        "sid", "sip_call_id", "row_id", "leg", "number", "agent", "state",
+        "code", "reason", "t_invite", "t_180", "t_183", "t_media", "t_200", "t_bye",
+        "t_bridge", "t_hangup", "campaign", "peer", "call",
+    )
+
+    def __init__(self, leg, number, row_id=None, agent=None):
+        self.sid = next(_session_seq)
+        self.sip_call_id = None
+        self.row_id = row_id
+        self.leg = leg              # "agent" / "peer" / "ec"
+        self.number = number
+        self.agent = agent
+        self.state = NULL
+        self.code = 0
+        self.reason = ""
+        self.t_invite = None
+        self.t_180 = None
+        self.t_183 = None
+        self.t_media = None         # media aktif pertama kali (sebelum 200 = early media)
+        self.t_200 = None
+        self.t_bye = None
+        self.t_bridge = None        # media di-bridge ke leg pasangan
+        self.t_hangup = None        # hangup diminta dari sisi dialer (None = diputus remote)
+        self.campaign = None        # field "campaign" row (untuk CDR)
+        self.peer = None            # CallSession pasangan bridge
+        self.call = None            # objek pj.Call
+
+    def on_state(self, state, code=0, reason="", now=None):
+        """Catat transisi state + timestamp sesuai SIP code."""
+        now = time.time() if now is None else now
+        self.state = state
+        if code:
+            self.code = code
+        if reason:
+            self.reason = reason
+        if state == CALLING and self.t_invite is None:
+            self.t_invite = now
+        elif state == EARLY:
+            if code == 180 and self.t_180 is None:
+                self.t_180 = now
+            elif code == 183 and self.t_183 is None:
+                self.t_183 = now
+        elif state == CONFIRMED and self.t_200 is None:
+            self.t_200 = now
+        elif state == DISCONNECTED and self.t_bye is None:
+            self.t_bye = now
+
+    def hangup(self):
+        """Putuskan leg dari sisi dialer (waktu permintaan dicatat untuk span teardown)."""
+        if self.t_hangup is None:
+            self.t_hangup = time.time()
+        self.call.hangup()
+
+    def on_media(self, now=None):
+        if self.t_media is None:
+            self.t_media = time.time() if now is None else now
+
+    @property
+    def answered(self):
+        return self.t_200 is not None
+
+    @property
+    def ringing(self):
+        """Sudah ada 180/183 (atau early media) dari tujuan."""
+        return self.t_180 is not None or self.t_183 is not None or self.early_media
+
+    @property
+    def early_media(self):
+        return self.t_media is not None and (self.t_200 is None or self.t_media < self.t_200)
+
+    def ring_sec(self):
+        """Detik dari INVITE sampai 200 OK (atau BYE jika tidak terjawab)."""
+        if self.t_invite is None:
+            return None
+        end = self.t_200 or self.t_bye
+        return None if end is None else end - self.t_invite
+
+    def to_dict(self):
+        return {
+            "sid": self.sid,
+            "sip_call_id": self.sip_call_id,
+            "row_id": self.row_id,
+            "leg": self.leg,
+            "number": self.number,
+            "agent": self.agent,
+            "state": self.state,
+            "code": self.code,
+            "reason": self.reason,
+            "t_invite": self.t_invite,
+            "t_180": self.t_180,
+            "t_183": self.t_183,
+            "t_media": self.t_media,
+            "early_media": self.early_media,
+            "t_200": self.t_200,
+            "t_bye": self.t_bye,
+            "t_bridge": self.t_bridge,
+            "t_hangup": self.t_hangup,
+            "peer_sid": self.peer.sid if self.peer is not None else None,
+        }
+
+
+class CallRegistry:
+    """Index leg yang masih hidup. Semua operasi O(1) (per leg)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.by_sid = {}
+        self.by_call_id = {}
+        self.by_row = defaultdict(set)
+        self.by_agent = defaultdict(set)
+        self.state_counts = defaultdict(int)
+        self.total_started = 0
+        self.total_ended = 0
+
+    def __len__(self):
+        return len(self.by_sid)
+
+    def add(self, sess):
+        with self.lock:
+            self.by_sid[sess.sid] = sess
+            if sess.row_id is not None:
+                self.by_row[sess.row_id].add(sess.sid)
+            if sess.agent:
+                self.by_agent[sess.agent].add(sess.sid)
+            self.state_counts[sess.state] += 1
+            self.total_started += 1
+        return sess
+
+    def set_call_id(self, sess, sip_call_id):
+        if not sip_call_id or sess.sip_call_id == sip_call_id:
+            return
+        with self.lock:
+            if sess.sip_call_id:
+                self.by_call_id.pop(sess.sip_call_id, None)
+            sess.sip_call_id = sip_call_id
+            if sess.sid in self.by_sid:
+                self.by_call_id[sip_call_id] = sess
+
+    def update(self, sess, state, code=0, reason="", now=None):
+        """Transisi state; leg DISCONNECTED otomatis keluar dari registry."""
+        with self.lock:
+            live = sess.sid in self.by_sid
+            if live:
+                self.state_counts[sess.state] -= 1
+            sess.on_state(state, code, reason, now)
+            if live:
+                if state == DISCONNECTED:
+                    self._remove_locked(sess)
+                else:
+                    self.state_counts[state] += 1
+
+    def remove(self, sess):
+        with self.lock:
+            if sess.sid in self.by_sid:
+                self.state_counts[sess.state] -= 1
+                self._remove_locked(sess)
+
+    def _remove_locked(self, sess):
+        self.by_sid.pop(sess.sid, None)
+        if sess.sip_call_id:
+            self.by_call_id.pop(sess.sip_call_id, None)
+        if sess.row_id is not None:
+            sids = self.by_row.get(sess.row_id)
+            if sids is not None:
+                sids.discard(sess.sid)
+                if not sids:
+                    del self.by_row[sess.row_id]
+        if sess.agent:
+            sids = self.by_agent.get(sess.agent)
+            if sids is not None:
+                sids.discard(sess.sid)
+                if not sids:
+                    del self.by_agent[sess.agent]
+        self.total_ended += 1
+
+    # ---------------- lookup ----------------
+    def get(self, sid):
+        return self.by_sid.get(sid)
+
+    def get_by_call_id(self, sip_call_id):
+        return self.by_call_id.get(sip_call_id)
+
+    def for_row(self, row_id):
+        with self.lock:
+            return [self.by_sid[s] for s in self.by_row.get(row_id, ()) if s in self.by_sid]
+
+    def for_agent(self, agent):
+        with self.lock:
+            return [self.by_sid[s] for s in self.by_agent.get(agent, ()) if s in self.by_sid]
+
+    def all(self):
+        with self.lock:
+            return list(self.by_sid.values())
+
+    def snapshot_counts(self):
+        with self.lock:
+            return {
+                "active": len(self.by_sid),
+                "by_state": {k: v for k, v in self.state_counts.items() if v},
+                "started": self.total_started,
+                "ended": self.total_ended,
+            }
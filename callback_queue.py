@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Serah-terima kerja dari callback PJSIP ke satu thread consumer.
+
+Callback PJSIP (on_state / on_media_state) jalan di thread signalling / media PJSIP;
+apa pun yang lambat di sana menunda SIP semua panggilan lain. Callback cukup memanggil
+put(handler, *perubahan_state) -- SimpleQueue.put tidak pernah blok -- dan thread
+consumer menjalankan handler berurutan (registry, event, metrik, CDR, bangunkan worker).
+
+Urutan per antrian dipertahankan (FIFO, satu consumer), jadi transisi satu leg
+diproses sesuai urutan datangnya.
+"""
+import threading
+import time
+from queue import SimpleQueue
+
+_STOP = object()
+
+
+class CallbackQueue:
+    def __init__(self, name="pj-callbacks", on_thread_start=None, on_lag=None):
+        self.name = name
+        self.on_thread_start = on_thread_start  # mis. register thread ke PJLIB
+        self.on_lag = on_lag                    # on_lag(detik antri) per item (metrik)
+        self.q = SimpleQueue()
+        self.handled = 0
+        self.errors = 0
+        self.last_error = None
+        self.max_lag = 0.0
+        self._busy = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def put(self, fn, *args):
+        """Dipanggil dari callback PJSIP: tanpa lock, tanpa I/O."""
+        self.q.put((fn, args, time.perf_counter()))
+
+    def _run(self):
+        if self.on_thread_start is not None:
+            self.on_thread_start()
+        while True:
+            item = self.q.get()
+            if item is _STOP:
+                break
+            self._busy = True
+            fn, args, t_put = item
+            lag = time.perf_counter() - t_put
+            if lag > self.max_lag:
+                self.max_lag = lag
+            if self.on_lag is not None:
+                self.on_lag(lag)
+            try:
+                fn(*args)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = f"{getattr(fn, '__qualname__', fn)}: {e}"
+                print(f"[CALLBACK] {self.last_error}")
+            self.handled += 1
+            self._busy = False
+
+    def wait_idle(self, timeout=None):
+        """Tunggu sampai antrian kosong dan item terakhir selesai (benchmark / shutdown)."""
+        end = None if timeout is None else time.monotonic() + timeout
+        quiet = 0
+        while quiet < 2:
+            quiet = quiet + 1 if self.q.empty() and not self._busy else 0
+            if end is not None and time.monotonic() > end:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def stop(self):
+        self.q.put(_STOP)
+
+    def snapshot(self):
+        return {"pending": self.q.qsize(), "handled": self.handled, "errors": self.errors,
+                "last_error": self.last_error, "max_lag_ms": round(self.max_lag * 1000, 2)}
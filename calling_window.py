@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Jendela jam telepon per zona waktu nasabah (WIB / WITA / WIT).
+
+  - zona row: field eksplisit (mis. row["timezone"] = "WITA") atau prefix kode area
+    nomor telepon tetap; nomor seluler (+628...) tidak geografis -> zona default
+  - CallingWindows: buka/tutup per zona (jam lokal + hari yang diizinkan), hasilnya
+    di-cache sampai batas berikutnya sehingga cek per get() hanya perbandingan angka
+"""
+import time
+
+WIB = "WIB"
+WITA = "WITA"
+WIT = "WIT"
+UTC_OFFSET_HOURS = {WIB: 7, WITA: 8, WIT: 9}
+
+# prefix E.164 (tanpa "+") kode area -> zona; sisanya (Jawa, Sumatra, Kalbar, Kalteng) WIB
+AREA_ZONES = {
+    "6236": WITA, "6237": WITA, "6238": WITA,   # Bali, NTB, NTT
+    "624": WITA,                                 # Sulawesi
+    "6251": WITA, "6254": WITA, "6255": WITA,    # Kalsel, Kaltim, Kaltara
+    "629": WIT,                                  # Maluku, Papua
+}
+_AREA_LENGTHS = sorted({len(p) for p in AREA_ZONES}, reverse=True)
+
+
+def zone_for_number(number, default=WIB):
+    """Zona dari nomor E.164 (kode area telepon tetap), default jika tidak dikenali."""
+    if not number:
+        return default
+    digits = number[1:] if number[:1] == "+" else number
+    if digits.startswith("628"):
+        return default
+    for n in _AREA_LENGTHS:
+        zone = AREA_ZONES.get(digits[:n])
+        if zone:
+            return zone
+    return default
+
+
+def explicit_zone(row, field="timezone"):
+    """Zona dari field eksplisit row (mis. "WITA"), None jika kosong / tidak valid."""
+    explicit = row.get(field)
+    if isinstance(explicit, str) and explicit.strip().upper() in UTC_OFFSET_HOURS:
+        return explicit.strip().upper()
+    return None
+
+
+def zone_for_row(row, field="timezone", phone_field="phone", default=WIB):
+    """Zona row: field eksplisit jika valid, selain itu dari nomor nasabah."""
+    return explicit_zone(row, field) or zone_for_number(row.get(phone_field), default)
+
+
+def _minutes(hhmm):
+    h, m = hhmm.split(":")
+    return int(h) * 60 + int(m)
+
+
+class CallingWindows:
+    def __init__(self, start="08:00", end="20:00", days=(0, 1, 2, 3, 4, 5), offsets=None):
+        self.start = _minutes(start) * 60
+        self.end = _minutes(end) * 60
+        if self.end <= self.start:
+            raise ValueError("jendela harus di hari yang sama (start < end)")
+        self.days = frozenset(days)
+        self.offsets = dict(offsets or UTC_OFFSET_HOURS)
+        self._cache = {}     # zona -> (buka?, epoch batas berikutnya)
+
+    def _compute(self, zone, now):
+        off = self.offsets[zone] * 3600
+        t = now + off
+        day0 = t - t % 86400
+        for d in range(8):
+            base = day0 + d * 86400
+            if time.gmtime(base).tm_wday not in self.days:
+                continue
+            if t < base + self.start:
+                return False, base + self.start - off
+            if t < base + self.end:
+                return True, base + self.end - off
+        return False, float("inf")
+
+    def state(self, zone, now=None):
+        """Return (buka?, epoch perubahan berikutnya)."""
+        now = time.time() if now is None else now
+        st = self._cache.get(zone)
+        if st is None or now >= st[1]:
+            st = self._cache[zone] = self._compute(zone, now)
+        return st
+
+    def is_open(self, zone, now=None):
+        return self.state(zone, now)[0]
+
+    def opens_at(self, zone, now=None):
+        """Epoch jendela zona buka (now jika sedang buka)."""
+        now = time.time() if now is None else now
+        is_open, change = self.state(zone, now)
+        return now if is_open else change
+
+    def local_hour(self, zone, now=None):
+        now = time.time() if now is None else now
+        return time.gmtime(now + self.offsets[zone] * 3600).tm_hour
+
+    def snapshot(self, now=None):
+        now = time.time() if now is None else now
+        out = {}
+        for zone in self.offsets:
+            is_open, change = self.state(zone, now)
+            out[zone] = {"open": is_open, "local_hour": self.local_hour(zone, now),
+                         ("closes_in_sec" if is_open else "opens_in_sec"):
+                             round(change - now) if change != float("inf") else None}
+        return out
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Agregasi CDR (cdr_store.py) untuk /api/stats, seluruhnya vektor NumPy di atas kolom memmap.
+
+Metrik per grup (prefix / trunk / agent / hour / none), hanya leg nasabah & EC:
+  legs, answered, answer_rate, avg_ring_sec (INVITE -> 200 untuk leg terjawab),
+  connected (di-bridge ke agent), connect_rate, attempts_per_connect
+
+Rentang dipecah per bucket (default 1 jam). Parsial bucket yang sudah tutup
+(berakhir sebelum now - grace) dan utuh di dalam rentang di-cache, sehingga
+query berulang hanya memindai bucket yang masih berjalan. ts CDR adalah waktu INVITE
+tetapi record baru ditulis saat BYE, jadi grace harus mencakup ring timeout + durasi
+panggilan terpanjang; kalau tidak, bucket yang sudah di-cache kehilangan leg yang terlambat.
+"""
+import threading
+import time
+
+import numpy as np
+
+from cdr_store import CdrStore
+
+GROUP_BY = ("none", "prefix", "trunk", "agent", "hour")
+AGENT_PHASE = b"agent"          # selain leg agent = leg nasabah / EC
+ANSWERED = b"answered"
+_BY_FIELD = {"prefix": "number", "trunk": "trunk", "agent": "agent"}
+_NSUM = 4       # legs, answered, ring_sum (terjawab), connected
+
+
+def _hash_codes(raw):
+    """Kolom string lebar tetap -> (kode grup int, label). Cepat untuk kardinalitas kecil."""
+    n = len(raw)
+    width = raw.dtype.itemsize
+    words = np.frombuffer(raw.tobytes(), dtype=np.uint64).reshape(n, width // 8) if n else np.zeros((0, 1), np.uint64)
+    h = np.zeros(n, dtype=np.uint64)
+    for j in range(words.shape[1]):
+        h = h * np.uint64(1000003) ^ words[:, j]
+    # kunci unik dari sampel, lalu verifikasi; jika ada yang terlewat pakai unique penuh
+    uniq = np.unique(h[::max(1, n // 50000)])
+    codes = np.searchsorted(uniq, h)
+    codes[codes >= len(uniq)] = 0
+    if n and not (uniq[codes] == h).all():
+        uniq, codes = np.unique(h, return_inverse=True)
+    first = np.full(len(uniq), -1, dtype=np.int64)
+    first[codes[::-1]] = np.arange(n - 1, -1, -1)
+    labels = [raw[i].decode("utf-8", "replace") if i >= 0 else "" for i in first]
+    return codes.astype(np.int64), labels
+
+
+def group_codes(cols, by, prefix_digits=5):
+    """Return (kode int per record, jumlah grup, fungsi kode -> label)."""
+    n = len(cols["ts"])
+    if by == "none":
+        return np.zeros(n, dtype=np.int64), 1, lambda c: "all"
+    if by == "hour":
+        off = time.localtime().tm_gmtoff
+        return ((cols["ts"] + off) // 3600 % 24).astype(np.int64), 24, lambda c: f"{c:02d}"
+    if by == "prefix":
+        width = cols["number"].dtype.itemsize
+        digits = cols["number"].view(np.uint8).reshape(n, width)[:, 1:1 + prefix_digits].astype(np.int64) - 48
+        digits = np.clip(digits, 0, 9)
+        codes = digits @ (10 ** np.arange(prefix_digits - 1, -1, -1, dtype=np.int64))
+        # padatkan ke prefix yang muncul saja (tanpa sort) agar bincount per bucket tetap kecil
+        present = np.flatnonzero(np.bincount(codes, minlength=10 ** prefix_digits))
+        remap = np.zeros(10 ** prefix_digits, dtype=np.int64)
+        remap[present] = np.arange(len(present))
+        return remap[codes], len(present), lambda c: f"{present[c]:0{prefix_digits}d}"
+    codes, labels = _hash_codes(np.ascontiguousarray(cols[by]))
+    return codes, len(labels), labels.__getitem__
+
+
+def metrics(vec):
+    legs, answered, ring_sum, connected = (float(x) for x in vec)
+    return {
+        "legs": int(legs),
+        "answered": int(answered),
+        "answer_rate": round(answered / legs, 4) if legs else None,
+        "avg_ring_sec": round(ring_sum / answered, 2) if answered else None,
+        "connected": int(connected),
+        "connect_rate": round(connected / legs, 4) if legs else None,
+        "attempts_per_connect": round(legs / connected, 2) if connected else None,
+    }
+
+
+class CdrStats:
+    def __init__(self, store, bucket_sec=3600, grace_sec=5.0, prefix_digits=5, cache_max=50000,
+                 max_buckets=24 * 92):
+        self.store = store if isinstance(store, CdrStore) else CdrStore(store)
+        self.bucket_sec = bucket_sec
+        self.grace_sec = grace_sec
+        self.prefix_digits = prefix_digits
+        self.cache_max = cache_max
+        self.max_buckets = max_buckets  # batas rentang per query (from=0 -> ratusan ribu bucket)
+        self.cache = {}         # (by, bucket_start) -> {label: np.float64[_NSUM]}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _aggregate_run(self, by, start, nb, lo, hi):
+        """Pindai record [lo, hi) sekali -> list parsial per bucket mulai `start`."""
+        b = self.bucket_sec
+        fields = ["ts", "outcome", "ring_sec", "bridge_sec"] + ([_BY_FIELD[by]] if by in _BY_FIELD else [])
+        cols = self.store.columns(lo, hi, fields, where=lambda c: c["phase"] != AGENT_PHASE)
+        out = [dict() for _ in range(nb)]
+        if not len(cols["ts"]):
+            return out
+        codes, ngroups, label = group_codes(cols, by, self.prefix_digits)
+        bidx = ((cols["ts"] - start) // b).astype(np.int64)
+        np.clip(bidx, 0, nb - 1, out=bidx)
+        flat = bidx * ngroups + codes
+        size = nb * ngroups
+        answered = cols["outcome"] == ANSWERED
+        ring = np.where(answered, np.nan_to_num(cols["ring_sec"].astype(np.float64)), 0.0)
+        sums = np.stack([
+            np.bincount(flat, minlength=size),
+            np.bincount(flat, weights=answered, minlength=size),
+            np.bincount(flat, weights=ring, minlength=size),
+            np.bincount(flat, weights=~np.isnan(cols["bridge_sec"]), minlength=size),
+        ], axis=1)
+        for f in np.flatnonzero(sums[:, 0]):
+            bi, code = divmod(int(f), ngroups)
+            out[bi][label(code)] = sums[f].astype(np.float64)
+        return out
+
+    def query(self, t0, t1, by="none", now=None):
+        if by not in GROUP_BY:
+            raise ValueError(f"by harus salah satu dari {GROUP_BY}")
+        started = time.perf_counter()
+        now = time.time() if now is None else now
+        b = self.bucket_sec
+        if t1 > t0 and (t1 - int(t0 // b) * b) / b > self.max_buckets:
+            raise ValueError(f"rentang terlalu panjang (maks {self.max_buckets * b // 86400} hari)")
+        buckets = list(range(int(t0 // b) * b, int(t1), b)) if t1 > t0 else []
+        parts = [None] * len(buckets)
+        cacheable = [bs >= t0 and bs + b <= t1 and bs + b <= now - self.grace_sec for bs in buckets]
+        with self.lock:
+            for i, bs in enumerate(buckets):
+                if cacheable[i]:
+                    parts[i] = self.cache.get((by, bs))
+        cached = sum(p is not None for p in parts)
+        # bucket yang belum ada dipindai per rangkaian bersambung (satu baca kolom per rangkaian)
+        i = 0
+        while i < len(buckets):
+            if parts[i] is not None:
+                i += 1
+                continue
+            j = i
+            while j < len(buckets) and parts[j] is None:
+                j += 1
+            lo, hi = max(t0, buckets[i]), min(t1, buckets[j - 1] + b)
+            for k, part in enumerate(self._aggregate_run(by, buckets[i], j - i, lo, hi)):
+                parts[i + k] = part
+                if cacheable[i + k]:
+                    with self.lock:
+                        if len(self.cache) >= self.cache_max:
+                            self.cache.clear()
+                        self.cache[(by, buckets[i + k])] = part
+            i = j
+        self.hits += cached
+        self.misses += len(buckets) - cached
+        total = {}
+        for part in parts:
+            for key, vec in part.items():
+                acc = total.get(key)
+                total[key] = vec.copy() if acc is None else acc + vec
+        overall = sum(total.values()) if total else np.zeros(_NSUM)
+        groups = [dict(key=key, **metrics(vec)) for key, vec in sorted(total.items())]
+        return {
+            "by": by, "from": t0, "to": t1,
+            "total": metrics(overall),
+            "groups": groups if by != "none" else [],
+            "buckets": len(buckets), "cached_buckets": cached,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def snapshot(self):
+        return {"cached_buckets": len(self.cache), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+CDR (call detail record) per leg, disimpan kolumnar append-only.
+
+Layout:
+  <root>/<YYYYMMDD>/<writer>/<kolom>.bin    satu file per kolom, lebar tetap (SCHEMA)
+  <root>/<YYYYMMDD>/<writer>/schema.json
+
+Setiap proses penulis (node / shard) punya direktori sendiri sehingga append tidak
+pernah bersaing. Record ditambahkan lewat deque (tanpa lock, tanpa I/O) dan ditulis
+per batch oleh thread flush; pembaca me-memmap kolom (panjang = minimum semua kolom,
+batch yang setengah tertulis diabaikan). Sebelum append pertama ke satu segmen dan setelah
+flush gagal, semua kolom dipotong ke jumlah record kolom terpendek (repair_segment) supaya
+batch berikutnya tidak bergeser.
+"""
+import csv
+import glob
+import io
+import json
+import os
+import threading
+import time
+import zlib
+from collections import deque
+
+import numpy as np
+
+SCHEMA = [
+    ("ts", "<f8"),              # epoch INVITE (atau saat leg dibuat)
+    ("row_id", "<i8"),
+    ("number", "S16"),
+    ("phase", "S8"),            # leg: agent / peer / ec
+    ("agent", "S16"),
+    ("trunk", "S16"),
+    ("campaign", "S24"),
+    ("code", "<i2"),            # SIP code terakhir
+    ("outcome", "S12"),         # sip_outcome.CallOutcome
+    ("detail", "S16"),          # alasan abandon / AMD / dll
+    ("setup_sec", "<f4"),       # INVITE -> 180/183/early media pertama
+    ("ring_sec", "<f4"),        # INVITE -> 200 OK (atau BYE jika tidak terjawab)
+    ("answer_sec", "<f4"),      # INVITE -> 200 OK (NaN = tidak terjawab)
+    ("bridge_sec", "<f4"),      # INVITE -> media di-bridge (NaN = tidak di-bridge)
+    ("duration_sec", "<f4"),    # 200 OK -> BYE
+]
+DTYPE = np.dtype(SCHEMA)
+COLUMNS = [name for name, _ in SCHEMA]
+NAN = float("nan")
+
+
+def _day_key(day_index):
+    return time.strftime("%Y%m%d", time.gmtime(day_index * 86400))
+
+
+def _local_days(ts):
+    """Index hari lokal (zona server) untuk array epoch."""
+    off = time.localtime(float(ts[0]) if len(ts) else None).tm_gmtoff
+    return ((ts + off) // 86400).astype(np.int64)
+
+
+def _b(value, width):
+    """str -> bytes lebar kolom (UTF-8, dipotong) supaya batch tidak gagal karena satu record."""
+    return str(value).encode("utf-8", "replace")[:width] if value else b""
+
+
+def session_record(sess, trunk=None, outcome="", detail=""):
+    """CallSession -> tuple urut SCHEMA."""
+    t0 = sess.t_invite
+    if t0 is None:
+        t0 = sess.t_bye or time.time()
+
+    def rel(t):
+        return NAN if t is None else t - t0
+
+    first = [t for t in (sess.t_180, sess.t_183, sess.t_media) if t is not None]
+    return (
+        t0, -1 if sess.row_id is None else sess.row_id, _b(sess.number, 16), _b(sess.leg, 8),
+        _b(sess.agent, 16), _b(trunk, 16), _b(sess.campaign, 24), sess.code or 0,
+        _b(outcome, 12), _b(detail, 16),
+        rel(min(first)) if first else NAN,
+        rel(sess.t_200 or sess.t_bye), rel(sess.t_200), rel(sess.t_bridge),
+        NAN if sess.t_200 is None or sess.t_bye is None else sess.t_bye - sess.t_200,
+    )
+
+
+def repair_segment(dirpath):
+    """Potong semua file kolom ke jumlah record kolom terpendek. Return record yang dibuang."""
+    counts = {}
+    for name, dt in SCHEMA:
+        p = os.path.join(dirpath, name + ".bin")
+        counts[name] = os.path.getsize(p) // np.dtype(dt).itemsize if os.path.exists(p) else 0
+    n = min(counts.values())
+    extra = 0
+    for name, dt in SCHEMA:
+        p = os.path.join(dirpath, name + ".bin")
+        if os.path.exists(p) and os.path.getsize(p) != n * np.dtype(dt).itemsize:
+            extra = max(extra, counts[name] - n)
+            os.truncate(p, n * np.dtype(dt).itemsize)
+    return extra
+
+
+def append_columns(dirpath, arr):
+    """Tambahkan array terstruktur (DTYPE) ke file kolom satu direktori writer."""
+    for name in COLUMNS:
+        with open(os.path.join(dirpath, name + ".bin"), "ab") as f:
+            f.write(arr[name].tobytes())
+
+
+class CdrWriter:
+    def __init__(self, root, writer_id="main", flush_sec=1.0, batch=4096):
+        self.root = root
+        self.writer_id = writer_id.replace(os.sep, "_")
+        self.flush_sec = flush_sec
+        self.batch = batch
+        self.pending = deque()
+        self.wake = threading.Event()
+        self.lock = threading.Lock()        # hanya dipegang thread flush / close()
+        self.written = 0
+        self.flushes = 0
+        self.errors = 0
+        self.last_error = None
+        self.repaired = 0
+        self._clean = set()                 # segmen yang sudah dicek sejak start / error terakhir
+        self._thread = threading.Thread(target=self._run, name="cdr-flush", daemon=True)
+        self._thread.start()
+
+    def append(self, record):
+        """Tambah satu record (tuple SCHEMA). Tidak pernah blok / I/O."""
+        self.pending.append(record)
+        if len(self.pending) >= self.batch:
+            self.wake.set()
+
+    def _run(self):
+        while True:
+            self.wake.wait(self.flush_sec)
+            self.wake.clear()
+            self.flush()
+
+    def _segment_dir(self, day_index):
+        d = os.path.join(self.root, _day_key(day_index), self.writer_id)
+        if not os.path.isdir(d):
+            os.makedirs(d, exist_ok=True)
+            with open(os.path.join(d, "schema.json"), "w") as f:
+                json.dump(SCHEMA, f)
+        return d
+
+    def _append_day(self, day, part):
+        d = self._segment_dir(day)
+        if d not in self._clean:
+            dropped = repair_segment(d)
+            if dropped:
+                self.repaired += dropped
+                print(f"[CDR] {d}: {dropped} record setengah tertulis dipotong")
+            self._clean.add(d)
+        try:
+            append_columns(d, part)
+        except Exception:
+            self._clean.discard(d)          # batch berikutnya memotong sisa batch ini dulu
+            raise
+
+    def flush(self):
+        with self.lock:
+            n = len(self.pending)
+            if not n:
+                return 0
+            rows = [self.pending.popleft() for _ in range(n)]
+            try:
+                arr = np.array(rows, dtype=DTYPE)
+            except Exception as e:
+                # record rusak: batch dibuang (tidak akan berhasil jika diulang)
+                self.errors += 1
+                self.last_error = str(e)
+                print(f"[CDR] batch tidak valid ({n} record dibuang): {e}")
+                return n
+            days = _local_days(arr["ts"])
+            uniq = np.unique(days)
+            done = []
+            try:
+                for day in uniq:
+                    part = arr if len(uniq) == 1 else arr[days == day]
+                    self._append_day(int(day), part)
+                    done.append(day)
+                self.written += n
+                self.flushes += 1
+            except Exception as e:
+                # I/O gagal (ENOSPC dll): record hari yang belum tertulis kembali ke antrian
+                self.errors += 1
+                self.last_error = str(e)
+                retry = [r for r, day in zip(rows, days) if day not in done]
+                self.written += n - len(retry)
+                self.pending.extendleft(reversed(retry))
+                print(f"[CDR] flush gagal ({len(retry)} record dicoba lagi): {e}")
+            return n
+
+    def close(self):
+        self.flush()
+
+    def snapshot(self):
+        return {"pending": len(self.pending), "written": self.written, "flushes": self.flushes,
+                "errors": self.errors, "last_error": self.last_error, "repaired": self.repaired}
+
+
+# ===========================================================
+#                       Pembaca
+# ===========================================================
+def open_segment(path):
+    """Memmap semua kolom satu direktori writer -> dict nama -> array (panjang sama)."""
+    sizes = {}
+    for name, dt in SCHEMA:
+        p = os.path.join(path, name + ".bin")
+        sizes[name] = os.path.getsize(p) // np.dtype(dt).itemsize if os.path.exists(p) else 0
+    n = min(sizes.values())
+    cols = {}
+    for name, dt in SCHEMA:
+        if n == 0:
+            cols[name] = np.zeros(0, dtype=dt)
+        else:
+            cols[name] = np.memmap(os.path.join(path, name + ".bin"), dtype=dt, mode="r", shape=(n,))
+    return cols
+
+
+class CdrStore:
+    def __init__(self, root):
+        self.root = root
+
+    def days(self):
+        return sorted(os.path.basename(p) for p in glob.glob(os.path.join(self.root, "[0-9]" * 8)))
+
+    def segments(self, t0=None, t1=None):
+        """Direktori writer untuk hari yang beririsan dengan [t0, t1)."""
+        lo = time.strftime("%Y%m%d", time.localtime(t0)) if t0 is not None else None
+        hi = time.strftime("%Y%m%d", time.localtime(t1)) if t1 is not None else None
+        out = []
+        for day in self.days():
+            if (lo and day < lo) or (hi and day > hi):
+                continue
+            out.extend(sorted(glob.glob(os.path.join(self.root, day, "*", ""))))
+        return out
+
+    def columns(self, t0=None, t1=None, names=None, where=None):
+        """
+        Kolom (NumPy) semua record dengan t0 <= ts < t1, digabung lintas segmen.
+        where(cols) -> mask bool opsional, digabung dengan filter waktu (satu kali salin).
+        """
+        names = list(names or COLUMNS)
+        want = names if "ts" in names else names + ["ts"]
+        parts = {name: [] for name in want}
+        for seg in self.segments(t0, t1):
+            cols = open_segment(seg)
+            ts = cols["ts"]
+            if not len(ts):
+                continue
+            mask = where(cols) if where is not None else None
+            if (t0 is not None and ts.min() < t0) or (t1 is not None and ts.max() >= t1):
+                in_range = np.ones(len(ts), dtype=bool) if mask is None else mask
+                if t0 is not None:
+                    in_range &= ts >= t0
+                if t1 is not None:
+                    in_range &= ts < t1
+                mask = in_range
+            for name in want:
+                parts[name].append(cols[name][mask] if mask is not None else np.asarray(cols[name]))
+        out = {}
+        for name in want:
+            dt = DTYPE[name]
+            out[name] = np.concatenate(parts[name]) if parts[name] else np.zeros(0, dtype=dt)
+        return {name: out[name] for name in names}
+
+    def iter_chunks(self, t0=None, t1=None, names=None, where=None, chunk=8192):
+        """
+        Seperti columns() tetapi per potongan `chunk` record (memori konstan), urut per
+        segmen (hari, writer) lalu urutan tulis.
+        """
+        names = list(names or COLUMNS)
+        for seg in self.segments(t0, t1):
+            cols = open_segment(seg)
+            for i in range(0, len(cols["ts"]), chunk):
+                part = {name: col[i:i + chunk] for name, col in cols.items()}
+                ts = part["ts"]
+                mask = where(part) if where is not None else np.ones(len(ts), dtype=bool)
+                if t0 is not None:
+                    mask &= ts >= t0
+                if t1 is not None:
+                    mask &= ts < t1
+                if mask.any():
+                    yield {name: np.asarray(part[name][mask]) for name in names}
+
+    def count(self, t0=None, t1=None):
+        return len(self.columns(t0, t1, ["ts"])["ts"])
+
+
+# ===========================================================
+#                       Ekspor CSV
+# ===========================================================
+CSV_HEADER = ["time"] + COLUMNS[1:]
+
+
+def _csv_column(name, col, tz_off):
+    if name == "ts":
+        iso = ((col + tz_off) * 1000).astype("datetime64[ms]").astype("datetime64[s]").astype(str)
+        return [t.replace("T", " ") for t in iso.tolist()]
+    if col.dtype.kind == "S":
+        return [v.decode("utf-8", "replace") for v in col.tolist()]
+    if col.dtype.kind == "f":
+        return ["" if v != v else v for v in np.round(col.astype(np.float64), 2).tolist()]
+    return col.tolist()
+
+
+def csv_chunks(store, t0=None, t1=None, where=None, chunk=8192):
+    """Generator teks CSV (header lalu satu potongan per `chunk` record)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(CSV_HEADER)
+    yield buf.getvalue()
+    for cols in store.iter_chunks(t0, t1, where=where, chunk=chunk):
+        tz_off = time.localtime(float(cols["ts"][0])).tm_gmtoff
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(zip(*(_csv_column(name, cols[name], tz_off) for name in COLUMNS)))
+        yield buf.getvalue()
+
+
+def gzip_chunks(chunks, level=6):
+    """Kompres gzip on-the-fly atas generator teks/bytes."""
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for piece in chunks:
+        out = z.compress(piece.encode("utf-8") if isinstance(piece, str) else piece)
+        if out:
+            yield out
+    yield z.flush()
+
+
+if __name__ == "__main__":
+    import sys
+    root = sys.argv[1] if len(sys.argv) > 1 else "cdr"
+    store = CdrStore(root)
+    for seg in store.segments():
+        cols = open_segment(seg)
+        print(f"{os.path.relpath(seg, root)}: {len(cols['ts'])} leg")
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Koordinator cluster dialer: satu antrian bersama untuk banyak node server_linux2.
+
+Node (server_linux2 dengan CLUSTER_COORDINATOR=http://host:7100) me-lease row dari
+sini, mengirim heartbeat berisi row yang masih dipegang + event, dan menerima
+perintah (call/pause/start/stop/hangup) lewat respon heartbeat.
+
+  - row yang dipegang node diperpanjang lease-nya setiap heartbeat
+  - row yang tidak lagi dilaporkan (2 heartbeat berturut-turut) dianggap selesai
+  - node yang berhenti heartbeat -> lease kadaluarsa -> row kembali ke antrian
+
+Client Windows cukup diarahkan ke koordinator: /register-client, /push-data,
+/api/<action>, /api/log dan /events tersedia dengan format yang sama.
+
+Uji lokal:
+  python cluster_coordinator.py                                   # port 7100
+  CLUSTER_COORDINATOR=http://127.0.0.1:7100 DIALER_PORT=7001 NODE_ID=n1 python server_linux2.py
+  CLUSTER_COORDINATOR=http://127.0.0.1:7100 DIALER_PORT=7002 NODE_ID=n2 python server_linux2.py
+"""
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from flask import Flask, jsonify, request as flask_request
+import requests
+
+from phone_norm import normalize_rows
+from retry_scheduler import RetryScheduler, split_callbacks
+from sip_outcome import CallOutcome
+from timer_service import TimerService
+
+# ======================= Konfigurasi =======================
+PORT = int(os.environ.get("COORD_PORT", "7100"))
+LEASE_TIMEOUT_SEC = 15        # lease habis jika node tidak heartbeat selama ini
+NODE_TIMEOUT_SEC = 10         # node dianggap mati (untuk tampilan /api/log)
+REAP_INTERVAL_SEC = 1.0
+PHONE_FIELDS = ("phone", "ec_phone_1", "ec_phone_2")
+RETRY_STATE_FILE = None
+RETRY_STATE_SAVE_SEC = 10     # interval simpan jadwal retry (thread terpisah)
+# ===========================================================
+
+app = Flask(__name__)
+
+connected_clients = set()
+lock = threading.Lock()
+pending = deque()             # row siap di-lease
+leases = {}                   # row_id -> {"node", "row", "expires", "misses"}
+nodes = {}                    # node_id -> {"url", "last_seen", "status"}
+commands = []                 # [(seq, cmd)] perintah untuk node
+cmd_seq = itertools.count(1)
+
+cluster_status = {
+    "running": False,
+    "paused": False,
+    "stopped": False,
+    "queued": 0,
+    "rejected": 0,
+    "requeued": 0,
+    "reassigned": 0,          # row yang dikembalikan karena node mati
+}
+
+# ======= Event Bus (gabungan semua node) =======
+EVENT_MAX = 2000
+events_buf = deque(maxlen=EVENT_MAX)
+event_lock = threading.Lock()
+event_seq = 0
+
+def broadcast_to_clients(path, payload):
+    dead = []
+    for base in list(connected_clients):
+        try:
+            requests.post(f"{base}{path}", json=payload, timeout=2.5)
+        except Exception:
+            dead.append(base)
+    for d in dead:
+        connected_clients.discard(d)
+
+def publish_event(ev: dict, also_broadcast=True, node=None):
+    global event_seq
+    with event_lock:
+        event_seq += 1
+        ev_out = dict(ev)
+        ev_out["event_id"] = event_seq
+        ev_out.setdefault("ts", time.time())
+        if node:
+            ev_out["node"] = node
+        events_buf.append(ev_out)
+    if also_broadcast:
+        try:
+            broadcast_to_clients("/receive-info", ev.get("payload", ev))
+        except Exception:
+            pass
+    return ev_out
+
+def push_command(cmd):
+    with lock:
+        commands.append((next(cmd_seq), cmd))
+        del commands[:-200]
+
+# ======= Retry (jadwal dipegang koordinator, bukan node) =======
+def _enqueue(row):
+    with lock:
+        pending.append(row)
+
+retry_scheduler = RetryScheduler(enqueue=_enqueue, state_file=RETRY_STATE_FILE)
+# row retry yang dimuat dari state file tetap memakai _row_id lama: id baru dimulai setelahnya
+_row_seq = itertools.count(retry_scheduler.max_row_id + 1)
+timers = TimerService()
+timers.call_every(retry_scheduler.wheel.tick_sec, retry_scheduler.poll)
+if RETRY_STATE_FILE:
+    timers.call_every(RETRY_STATE_SAVE_SEC,
+                      lambda: threading.Thread(target=retry_scheduler.save, daemon=True).start())
+
+def _reap():
+    """Kembalikan row dari lease yang kadaluarsa (node mati / hang)."""
+    now = time.monotonic()
+    with lock:
+        expired = [rid for rid, l in leases.items() if l["expires"] <= now]
+        for rid in expired:
+            l = leases.pop(rid)
+            pending.appendleft(l["row"])
+            cluster_status["reassigned"] += 1
+    if expired:
+        print(f"[COORD] {len(expired)} lease kadaluarsa -> dikembalikan ke antrian")
+        publish_event({"type": "cluster", "payload": {"reassigned": len(expired)}}, also_broadcast=False)
+
+timers.call_every(REAP_INTERVAL_SEC, _reap)
+
+# ===========================================================
+#                    API untuk node
+# ===========================================================
+@app.route("/cluster/lease", methods=["POST"])
+def cluster_lease():
+    data = flask_request.json or {}
+    node = data.get("node")
+    n = max(0, int(data.get("max", 1)))
+    out = []
+    with lock:
+        if not node or not cluster_status["running"] or cluster_status["paused"]:
+            return jsonify({"rows": []}), 200
+        exp = time.monotonic() + LEASE_TIMEOUT_SEC
+        while pending and len(out) < n:
+            row = pending.popleft()
+            leases[row["_row_id"]] = {"node": node, "row": row, "expires": exp, "misses": 0}
+            out.append(row)
+    return jsonify({"rows": out}), 200
+
+@app.route("/cluster/heartbeat", methods=["POST"])
+def cluster_heartbeat():
+    data = flask_request.json or {}
+    node = data.get("node")
+    if not node:
+        return jsonify({"status": "error", "message": "node diperlukan"}), 400
+    held = set(data.get("held") or [])
+    now = time.monotonic()
+    with lock:
+        nodes[node] = {"url": data.get("url"), "last_seen": now, "status": data.get("status") or {}}
+        for rid, l in list(leases.items()):
+            if l["node"] != node:
+                continue
+            if rid in held:
+                l["expires"] = now + LEASE_TIMEOUT_SEC
+                l["misses"] = 0
+            else:
+                l["misses"] += 1
+                if l["misses"] >= 2:
+                    del leases[rid]          # selesai diproses node
+        since = int(data.get("cmd_since", 0))
+        cmds = [(seq, c) for seq, c in commands if seq > since]
+    for item in data.get("events") or []:
+        publish_event(item.get("ev", {}), also_broadcast=item.get("also_broadcast", False), node=node)
+    return jsonify({"status": "ok", "commands": cmds}), 200
+
+@app.route("/cluster/retry", methods=["POST"])
+def cluster_retry():
+    data = flask_request.json or {}
+    row = data.get("row") or {}
+    try:
+        outcome = CallOutcome(data.get("outcome", "failed"))
+    except ValueError:
+        # node versi lain / outcome baru: row tetap dijadwalkan ulang, bukan 500 lalu hilang
+        print(f"[CLUSTER] outcome tidak dikenal: {data.get('outcome')!r}, dianggap failed")
+        outcome = CallOutcome.FAILED
+    with lock:
+        leases.pop(row.get("_row_id"), None)
+    when = retry_scheduler.schedule_retry(row, reason=outcome.value)
+    if when is not None:
+        with lock:
+            cluster_status["requeued"] += 1
+    return jsonify({"status": "ok", "when": when}), 200
+
+@app.route("/cluster/requeue", methods=["POST"])
+def cluster_requeue():
+    data = flask_request.json or {}
+    row = data.get("row") or {}
+    with lock:
+        leases.pop(row.get("_row_id"), None)
+        cluster_status["requeued"] += 1
+    retry_scheduler.schedule_at(row, time.time() + float(data.get("delay", 0)), reason=data.get("reason", "retry"))
+    return jsonify({"status": "ok"}), 200
+
+# ===========================================================
+#              API untuk client (sama seperti node)
+# ===========================================================
+@app.route("/register-client", methods=["POST"])
+def register_client():
+    data = flask_request.json or {}
+    ip = data.get("ip")
+    port = data.get("port", 6000)
+    if not ip:
+        return jsonify({"status": "error", "message": "ip diperlukan"}), 400
+    base = f"http://{ip}:{port}"
+    connected_clients.add(base)
+    print(f"✅ Client terdaftar: {base}")
+    return jsonify({"status": "ok", "connected_clients": list(connected_clients)}), 200
+
+@app.route("/push-data", methods=["POST"])
+def push_data():
+    payload = flask_request.json or {}
+    dataset = payload.get("data", [])
+    u = payload.get("user", {}) or {}
+    sip_user = u.get("num_sip")
+    sip_pass = u.get("pas_sip")
+    if not isinstance(dataset, list) or not dataset:
+        return jsonify({"status": "error", "message": "data kosong/invalid"}), 400
+    if not sip_user or not sip_pass:
+        return jsonify({"status": "error", "message": "num_sip/pas_sip kosong"}), 400
+
+    publish_event({"type": "dataset", "payload": payload})
+
+    rows = [dict(row) for row in dataset if isinstance(row, dict)]
+    valid_rows, rejected_rows = normalize_rows(rows, PHONE_FIELDS)
+    valid_rows, bad_callbacks = split_callbacks(valid_rows)
+    for r in bad_callbacks:
+        print(f"[COORD] callback_at tidak valid {r['_invalid_callback_at']!r}: {r.get('nama_nasabah')} ditolak")
+    rejected_rows += bad_callbacks
+    scheduled = 0
+    with lock:
+        for row in valid_rows:
+            row["_row_id"] = next(_row_seq)
+            row["_sip_user"] = sip_user
+            row["_sip_pass"] = sip_pass
+        cluster_status["queued"] += len(valid_rows)
+        cluster_status["rejected"] += len(rejected_rows)
+    for row in valid_rows:
+        if row.get("callback_at"):
+            retry_scheduler.schedule_callback(row, row["callback_at"])
+            scheduled += 1
+            continue
+        _enqueue(row)
+    return jsonify({"status": "ok", "enqueued": len(valid_rows) - scheduled, "scheduled": scheduled,
+                    "rejected": len(rejected_rows), "invalid_callback_at": len(bad_callbacks),
+                    "queue_size": len(pending)}), 200
+
+@app.route("/api/<action>", methods=["POST"])
+def handle_action(action):
+    code = 200
+    with lock:
+        if action == "call":
+            cluster_status.update(running=True, paused=False, stopped=False)
+            msg = "Call dimulai (cluster)"
+        elif action == "pause":
+            cluster_status["paused"] = cluster_status["running"]
+            msg = "Call dipause" if cluster_status["running"] else "Call belum berjalan"
+        elif action == "start":
+            msg = "Call dilanjutkan" if cluster_status["paused"] else "Call belum dipause"
+            cluster_status["paused"] = False
+        elif action == "stop":
+            cluster_status.update(running=False, paused=False, stopped=True)
+            drained = len(pending)
+            pending.clear()
+            msg = f"Call dihentikan (cluster, {drained} row dikosongkan)"
+        else:
+            msg = "Action tidak dikenal"
+            code = 400
+    if action == "stop":
+        retry_scheduler.clear()
+    if code == 200:
+        push_command({"action": action})
+    print(f"[ACTION] {action.upper()} -> {msg}")
+    publish_event({"type": "action", "payload": {"action": action, "message": msg}}, also_broadcast=False)
+    return jsonify({"status": "ok" if code == 200 else "error", "action": action, "message": msg}), code
+
+@app.route("/api/hangup/<int:row_id>", methods=["POST"])
+def hangup_row(row_id):
+    push_command({"hangup_row": row_id})
+    return jsonify({"status": "ok", "row_id": row_id, "hung_up": None}), 200
+
+@app.route("/api/log", methods=["GET"])
+def get_status():
+    now = time.monotonic()
+    with lock:
+        s = dict(cluster_status)
+        s["queue_size"] = len(pending)
+        s["leased"] = len(leases)
+        node_list = [{"node": n, "url": v["url"], "alive": now - v["last_seen"] < NODE_TIMEOUT_SEC,
+                      "last_seen_sec": round(now - v["last_seen"], 1),
+                      "leased": sum(1 for l in leases.values() if l["node"] == n),
+                      "status": v["status"]} for n, v in nodes.items()]
+    live = [n["status"] for n in node_list if n["alive"]]
+    s["processed"] = sum(st.get("processed", 0) for st in live)
+    busy = [st for st in live if st.get("in_progress")]
+    s["in_progress"] = busy[0]["in_progress"] if busy else None
+    s["active_sip_user"] = busy[0].get("active_sip_user") if busy else None
+    s["scheduled"] = len(retry_scheduler)
+    s["nodes"] = node_list
+    return jsonify(s), 200
+
+@app.route("/events", methods=["GET"])
+def get_events():
+    try:
+        since = int(flask_request.args.get("since", "0"))
+    except Exception:
+        since = 0
+    with event_lock:
+        out = [e for e in events_buf if e["event_id"] > since]
+        last_id = events_buf[-1]["event_id"] if events_buf else since
+    return jsonify({"events": out, "last_id": last_id})
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=PORT, debug=False, threaded=True)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Antrian dial: API sama dengan queue.Queue (put / get / get_nowait / task_done / qsize)
+dipakai worker, plus:
+
+  - bucket: row dikelompokkan (mis. per zona waktu, bucket_of(row)); get() hanya
+    mengambil dari bucket yang sedang buka menurut windows (calling_window.CallingWindows),
+    bergiliran antar bucket buka -- tidak ada scan seluruh antrian
+  - snapshot() + reorder() per bucket untuk mengurutkan ulang row yang masih
+    menunggu tanpa menahan worker selama skor dihitung
+"""
+import threading
+import time
+from collections import deque
+from queue import Empty
+
+
+class _Bucket:
+    __slots__ = ("name", "items", "pops", "generation")
+
+    def __init__(self, name):
+        self.name = name
+        self.items = deque()
+        self.pops = 0           # jumlah row diambil; dipakai reorder() untuk tahu row yang sudah keluar
+        self.generation = 0     # naik setiap reorder() / clear()
+
+
+class DialQueue:
+    def __init__(self, bucket_of=None, windows=None):
+        self.bucket_of = bucket_of
+        self.windows = windows
+        self.buckets = {}
+        self.rr = 0
+        self.cond = threading.Condition()
+        self.unfinished = 0
+
+    def _bucket(self, name):
+        b = self.buckets.get(name)
+        if b is None:
+            b = self.buckets[name] = _Bucket(name)
+        return b
+
+    def _is_open(self, name, now):
+        return self.windows is None or name is None or self.windows.is_open(name, now)
+
+    def put(self, item):
+        name = self.bucket_of(item) if self.bucket_of is not None else None
+        with self.cond:
+            self._bucket(name).items.append(item)
+            self.unfinished += 1
+            self.cond.notify()
+
+    def _pick(self, now):
+        names = list(self.buckets)
+        for i in range(len(names)):
+            j = (self.rr + i) % len(names)
+            b = self.buckets[names[j]]
+            if b.items and self._is_open(b.name, now):
+                self.rr = j + 1
+                return b
+        return None
+
+    def _next_open(self, now):
+        """Epoch terdekat sebuah bucket tidak kosong buka (None jika tidak ada)."""
+        if self.windows is None:
+            return None
+        ts = [self.windows.opens_at(b.name, now) for b in self.buckets.values()
+              if b.items and b.name is not None]
+        return min(ts) if ts else None
+
+    def get(self, block=True, timeout=None):
+        with self.cond:
+            end = None if timeout is None else time.monotonic() + timeout
+            while True:
+                now = time.time()
+                b = self._pick(now)
+                if b is not None:
+                    b.pops += 1
+                    return b.items.popleft()
+                if not block:
+                    raise Empty
+                wait = None
+                if end is not None:
+                    wait = end - time.monotonic()
+                    if wait <= 0:
+                        raise Empty
+                nxt = self._next_open(now)
+                if nxt is not None:
+                    until = max(0.05, nxt - now)
+                    wait = until if wait is None else min(wait, until)
+                self.cond.wait(wait)
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def task_done(self):
+        with self.cond:
+            self.unfinished = max(0, self.unfinished - 1)
+
+    def qsize(self):
+        return sum(len(b.items) for b in list(self.buckets.values()))
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def clear(self):
+        """Kosongkan semua bucket (termasuk yang tutup). Return row yang dikeluarkan."""
+        with self.cond:
+            out = []
+            for b in self.buckets.values():
+                out.extend(b.items)
+                b.items.clear()
+                b.generation += 1
+            return out
+
+    def bucket_names(self):
+        with self.cond:
+            return [name for name, b in self.buckets.items() if b.items]
+
+    def buckets_snapshot(self, now=None):
+        """Isi per bucket + kapan buka (laporan status)."""
+        now = time.time() if now is None else now
+        with self.cond:
+            out = []
+            for name, b in self.buckets.items():
+                row = {"bucket": name, "size": len(b.items), "open": self._is_open(name, now)}
+                if not row["open"]:
+                    opens = self.windows.opens_at(name, now)
+                    if opens != float("inf"):
+                        row["opens_at"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(opens))
+                        row["opens_in_sec"] = round(opens - now)
+                out.append(row)
+            return out
+
+    # ---------------- urut ulang ----------------
+    def snapshot(self, bucket=None, with_mark=False):
+        """
+        Salinan isi antrian. Tanpa argumen: semua bucket digabung. with_mark=True
+        (per bucket) juga mengembalikan penanda untuk reorder().
+        """
+        with self.cond:
+            if bucket is None and not with_mark:
+                return [x for b in self.buckets.values() for x in b.items]
+            b = self._bucket(bucket)
+            rows = list(b.items)
+            if with_mark:
+                return rows, (b.name, b.pops, b.generation, rows)
+            return rows
+
+    def reorder(self, ordered, mark):
+        """
+        Terapkan urutan baru (permutasi snapshot(bucket, with_mark=True)). Hanya popleft
+        yang mengambil row, jadi row yang sudah diambil worker sejak snapshot = k row pertama
+        snapshot, dan row yang masuk sesudahnya ada di ekor bucket. Return False jika
+        bucket sudah diurutkan ulang / dikosongkan sejak snapshot (urutan baru dibuang).
+        """
+        name, pops, generation, rows = mark
+        with self.cond:
+            b = self._bucket(name)
+            if generation != b.generation:
+                return False
+            taken = b.pops - pops
+            if taken > len(rows):
+                return False
+            if taken:
+                gone = {id(x) for x in rows[:taken]}
+                ordered = [x for x in ordered if id(x) not in gone]
+            fresh = len(b.items) - (len(rows) - taken)
+            tail = [b.items.pop() for _ in range(fresh)][::-1]
+            b.items = deque(ordered)
+            b.items.extend(tail)
+            b.generation += 1
+            return True
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Mode sharded: satu proses supervisor (HTTP API + antrian) dan N proses dialer.
+
+Setiap shard adalah proses terpisah (multiprocessing "spawn") dengan pj.Lib,
+port transport dan akun SIP sendiri, jadi callback PJSIP di satu shard tidak
+berebut GIL dengan shard lain maupun dengan handler HTTP.
+
+Protokol pipe (tuple, elemen pertama = jenis pesan):
+  supervisor -> shard : ("row", row) | ("action", name) | ("hangup_row", row_id)
+  shard -> supervisor : ("event", ev, also_broadcast) | ("status", dict)
+                        ("retry", row, outcome) | ("requeue", row, delay, reason)
+"""
+import multiprocessing as mp
+import threading
+import time
+import zlib
+
+SHARD_PROCESS_PREFIX = "dialer-shard-"
+RESPAWN_DELAY_SEC = 2.0
+
+
+def is_shard_child():
+    """
+    True jika proses ini adalah shard dialer (bukan supervisor). Nama proses sudah di-set
+    spawn sebelum modul utama di-import ulang di anak, jadi cek saat import pun benar.
+    """
+    return mp.current_process().name.startswith(SHARD_PROCESS_PREFIX)
+
+
+class ShardLink:
+    """Connection + lock; Connection.send tidak thread-safe."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+
+    def send(self, *msg):
+        with self.lock:
+            try:
+                self.conn.send(msg)
+                return True
+            except (OSError, EOFError, ValueError):
+                return False
+
+    def recv(self):
+        return self.conn.recv()
+
+
+class ShardSupervisor:
+    def __init__(self, n, target, on_message, on_exit=None, on_spawn=None):
+        self.n = n
+        self.target = target            # target(idx, conn) dijalankan di proses shard
+        self.on_message = on_message    # on_message(idx, msg) di thread reader supervisor
+        self.on_exit = on_exit          # on_exit(idx, exitcode)
+        self.on_spawn = on_spawn        # on_spawn(idx, restarted) setelah link shard siap
+        self.ctx = mp.get_context("spawn")
+        self.links = [None] * n
+        self.procs = [None] * n
+        self.restarts = [0] * n
+        self._closing = False
+
+    def start(self):
+        for i in range(self.n):
+            self._spawn(i)
+
+    def _spawn(self, idx, restarted=False):
+        parent_conn, child_conn = self.ctx.Pipe()
+        # penanda shard lewat nama proses (bukan os.environ, yang dipakai bersama semua thread)
+        proc = self.ctx.Process(target=self.target, args=(idx, child_conn),
+                                name=f"{SHARD_PROCESS_PREFIX}{idx}", daemon=True)
+        proc.start()
+        child_conn.close()
+        link = ShardLink(parent_conn)
+        self.links[idx] = link
+        self.procs[idx] = proc
+        threading.Thread(target=self._reader, args=(idx, link, proc),
+                         name=f"shard-reader-{idx}", daemon=True).start()
+        print(f"[SHARD] shard {idx} started (pid={proc.pid})")
+        if self.on_spawn:
+            try:
+                self.on_spawn(idx, restarted)
+            except Exception as e:
+                print(f"[SHARD] on_spawn error shard {idx}: {e}")
+
+    def _reader(self, idx, link, proc):
+        while True:
+            try:
+                msg = link.recv()
+            except (EOFError, OSError):
+                break
+            try:
+                self.on_message(idx, msg)
+            except Exception as e:
+                print(f"[SHARD] handler error shard {idx}: {e}")
+        proc.join(timeout=1)
+        if self.on_exit:
+            try:
+                self.on_exit(idx, proc.exitcode)
+            except Exception:
+                pass
+        if self._closing:
+            return
+        print(f"[SHARD] shard {idx} mati (exit={proc.exitcode}), restart dalam {RESPAWN_DELAY_SEC}s")
+        time.sleep(RESPAWN_DELAY_SEC)
+        self.restarts[idx] += 1
+        self._spawn(idx, restarted=True)
+
+    def shard_for(self, key):
+        """Shard tetap per key (mis. user SIP agent) supaya satu agent tidak dipanggil paralel."""
+        return zlib.crc32(str(key).encode("utf-8")) % self.n
+
+    def send(self, idx, *msg):
+        link = self.links[idx]
+        return link.send(*msg) if link else False
+
+    def broadcast(self, *msg):
+        return [self.send(i, *msg) for i in range(self.n)]
+
+    def info(self):
+        return [{"shard": i,
+                 "pid": p.pid if p else None,
+                 "alive": bool(p and p.is_alive()),
+                 "restarts": self.restarts[i]} for i, p in enumerate(self.procs)]
+
+    def close(self):
+        self._closing = True
+        for p in self.procs:
+            if p and p.is_alive():
+                p.terminate()
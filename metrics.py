@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Metrik gaya Prometheus (text exposition format 0.0.4) untuk /metrics.
+
+Jalur panas tanpa lock: setiap thread menulis ke sel miliknya sendiri
+(threading.local), scrape menjumlahkan salinan semua sel. Lock hanya dipakai
+sekali saat sebuah thread pertama kali menyentuh sebuah metrik. Sel milik thread
+yang sudah mati dilipat ke total "retired" saat scrape, jadi jumlah sel tidak
+tumbuh terus walau thread berumur pendek (mis. thread per request) datang dan pergi.
+
+state() menghasilkan dict biasa (bisa di-pickle) sehingga proses shard dapat
+mengirim metriknya ke supervisor; render() menggabungkan beberapa state.
+"""
+import threading
+from bisect import bisect_left
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._cells = []      # [(thread, cell)]
+        self._retired = {}    # total sel dari thread yang sudah mati
+        self._lock = threading.Lock()
+
+    def _cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = {}
+            with self._lock:
+                self._cells.append((threading.current_thread(), cell))
+            self._local.cell = cell
+            return cell
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _copies(self):
+        with self._lock:
+            live = []
+            for thread, cell in self._cells:
+                if thread.is_alive():
+                    live.append((thread, cell))
+                else:
+                    # thread mati tidak akan menulis lagi: aman dilipat tanpa salinan
+                    for key, v in cell.items():
+                        cur = self._retired.get(key)
+                        if cur is None:
+                            self._retired[key] = list(v) if isinstance(v, list) else v
+                        elif isinstance(v, list):
+                            self._retired[key] = [a + b for a, b in zip(cur, v)]
+                        else:
+                            self._retired[key] = cur + v
+            self._cells = live
+            retired = dict(self._retired)
+        return [retired] + [c.copy() for _, c in live]
+
+    def state(self):
+        return {"type": self.kind, "help": self.help, "labelnames": self.labelnames,
+                "samples": self.samples()}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        cell = self._cell()
+        key = self._key(labels)
+        cell[key] = cell.get(key, 0) + amount
+
+    def samples(self):
+        out = {}
+        for cell in self._copies():
+            for key, v in cell.items():
+                out[key] = out.get(key, 0) + v
+        return out
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if value is None or value != value:
+            return
+        cell = self._cell()
+        key = self._key(labels)
+        v = cell.get(key)
+        if v is None:
+            v = cell[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        v[bisect_left(self.buckets, value)] += 1
+        v[-2] += value
+        v[-1] += 1
+
+    def samples(self):
+        out = {}
+        for cell in self._copies():
+            for key, v in cell.items():
+                acc = out.get(key)
+                out[key] = list(v) if acc is None else [a + b for a, b in zip(acc, v)]
+        return out
+
+    def state(self):
+        s = super().state()
+        s["buckets"] = self.buckets
+        return s
+
+
+class Gauge(_Metric):
+    """Nilai diambil saat scrape: fn() -> angka, atau dict {tuple label: angka}."""
+    kind = "gauge"
+
+    def __init__(self, name, help, fn, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def samples(self):
+        try:
+            v = self.fn()
+        except Exception:
+            return {}
+        if v is None:
+            return {}
+        if isinstance(v, dict):
+            return {tuple(str(x) for x in k): float(val) for k, val in v.items()}
+        return {(): float(v)}
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def _add(self, m):
+        self.metrics.append(m)
+        return m
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, buckets, labelnames=()):
+        return self._add(Histogram(name, help, buckets, labelnames))
+
+    def gauge(self, name, help, fn, labelnames=()):
+        return self._add(Gauge(name, help, fn, labelnames))
+
+    def state(self):
+        return {m.name: m.state() for m in self.metrics}
+
+
+# ===========================================================
+#                  Text exposition format
+# ===========================================================
+def _esc(v):
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, key, extra=None):
+    pairs = [f'{n}="{_esc(v)}"' for n, v in zip(names, key)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _num(v):
+    if v == float("inf"):
+        return "+Inf"
+    if isinstance(v, float) and v.is_integer() and abs(v) < 1e15:
+        return str(int(v))
+    return repr(v) if isinstance(v, float) else str(v)
+
+
+def merge(states):
+    """Jumlahkan beberapa state (mis. supervisor + semua shard) per metrik & label."""
+    out = {}
+    for st in states:
+        for name, m in (st or {}).items():
+            acc = out.get(name)
+            if acc is None:
+                out[name] = dict(m, samples={k: (list(v) if isinstance(v, list) else v)
+                                             for k, v in m["samples"].items()})
+                continue
+            for key, v in m["samples"].items():
+                cur = acc["samples"].get(key)
+                if cur is None:
+                    acc["samples"][key] = list(v) if isinstance(v, list) else v
+                elif isinstance(v, list):
+                    acc["samples"][key] = [a + b for a, b in zip(cur, v)]
+                else:
+                    acc["samples"][key] = cur + v
+    return out
+
+
+def render(states):
+    lines = []
+    for name, m in merge(states).items():
+        lines.append(f"# HELP {name} {m['help']}")
+        lines.append(f"# TYPE {name} {m['type']}")
+        names = m["labelnames"]
+        for key, v in sorted(m["samples"].items()):
+            if m["type"] == "histogram":
+                cum = 0
+                for le, c in zip(tuple(m["buckets"]) + (float("inf"),), v[:-2]):
+                    cum += c
+                    le_label = 'le="%s"' % _num(float(le))
+                    lines.append(f"{name}_bucket{_labels(names, key, le_label)} {cum}")
+                lines.append(f"{name}_sum{_labels(names, key)} {_num(float(v[-2]))}")
+                lines.append(f"{name}_count{_labels(names, key)} {v[-1]}")
+            else:
+                lines.append(f"{name}{_labels(names, key)} {_num(v)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Normalisasi & validasi nomor telepon Indonesia ke format E.164 (+62...).
+
+Dipakai di tahap ingestion (/push-data) supaya worker hanya menelepon nomor
+yang sudah valid. Format input yang diterima antara lain:
+  "0812-3456-7890", "+62 812 3456 7890", "62812...", "0062812...", "812..."
+"""
+import re
+from functools import lru_cache
+
+COUNTRY_CODE = "62"
+
+# NSN = national significant number (tanpa 0 / +62 di depan)
+MOBILE_NSN_LEN = (9, 12)     # 812 3456 789 .. 812 3456 78901
+FIXED_NSN_LEN = (8, 11)      # 21 1234 567 .. 361 1234 5678
+
+# Prefix seluler yang dialokasikan (3 digit pertama NSN)
+MOBILE_PREFIXES = frozenset(
+    # Telkomsel
+    ["811", "812", "813", "821", "822", "823", "851", "852", "853"]
+    # Indosat
+    + ["814", "815", "816", "855", "856", "857", "858"]
+    # XL / Axis
+    + ["817", "818", "819", "859", "877", "878", "831", "832", "833", "838"]
+    # Tri
+    + ["895", "896", "897", "898", "899"]
+    # Smartfren
+    + ["881", "882", "883", "884", "885", "886", "887", "888", "889"]
+    # lain-lain (Ceria, satelit)
+    + ["828", "868"]
+)
+
+_STRIP_RE = re.compile(r"[\s\-\.\(\)/]")
+_DIGITS_RE = re.compile(r"^\+?\d+$")
+
+# Format nomor yang dikirim ke trunk
+DIAL_NATIONAL = "national"   # 0812...
+DIAL_E164 = "e164"           # +62812...
+DIAL_INTL = "intl"           # 62812...
+
+
+def normalize_number(raw):
+    """
+    Return nomor dalam format E.164 ("+62812...") atau None jika tidak valid.
+    Hasil di-cache, jadi nomor yang sama (mis. EC yang berulang) tidak diparse ulang.
+    Hanya str/int (dan float bulat dari spreadsheet) yang diterima; tipe lain None.
+    """
+    if isinstance(raw, str):
+        return _normalize(raw)
+    if isinstance(raw, bool):
+        return None
+    if isinstance(raw, int):
+        return _normalize(str(raw))
+    if isinstance(raw, float):
+        # str(8123456789.0) = "8123456789.0" -> titiknya ikut dibuang oleh _STRIP_RE
+        return _normalize(str(int(raw))) if raw.is_integer() else None
+    return None                  # list/dict/None: tidak hashable / bukan nomor
+
+
+@lru_cache(maxsize=200_000)
+def _normalize(raw):
+    s = _STRIP_RE.sub("", raw)
+    if not s or not _DIGITS_RE.match(s):
+        return None
+
+    if s.startswith("+"):
+        s = s[1:]
+        if not s.startswith(COUNTRY_CODE):
+            return None          # nomor luar negeri tidak didukung
+        nsn = s[len(COUNTRY_CODE):]
+    elif s.startswith("00" + COUNTRY_CODE):
+        nsn = s[2 + len(COUNTRY_CODE):]
+    elif s.startswith("0"):
+        nsn = s[1:]
+    elif s.startswith(COUNTRY_CODE) and len(s) > MOBILE_NSN_LEN[0] + 1:
+        nsn = s[len(COUNTRY_CODE):]
+    else:
+        nsn = s                  # tanpa prefix, mis. "8123456789"
+
+    # "+62 0812..." kadang muncul dari input manual
+    if nsn.startswith("0"):
+        nsn = nsn[1:]
+
+    if not nsn or nsn[0] in "01":
+        return None              # 1xx = short code, bukan nomor pelanggan
+
+    if nsn[0] == "8":
+        lo, hi = MOBILE_NSN_LEN
+        if not (lo <= len(nsn) <= hi) or nsn[:3] not in MOBILE_PREFIXES:
+            return None
+    else:
+        lo, hi = FIXED_NSN_LEN
+        if not (lo <= len(nsn) <= hi):
+            return None
+
+    return f"+{COUNTRY_CODE}{nsn}"
+
+
+def normalize_batch(values):
+    """
+    Normalisasi banyak nomor sekaligus.
+    Return list dengan urutan sama; elemen None = tidak valid / kosong.
+    """
+    norm = normalize_number
+    return [norm(v) if v else None for v in values]
+
+
+def normalize_rows(rows, fields):
+    """
+    Normalisasi field nomor pada setiap row (in-place).
+    Nomor tidak valid di-set None dan dicatat di row["_invalid_numbers"].
+    Return (rows_valid, rows_rejected): row ditolak jika tidak ada satupun nomor valid.
+    """
+    valid, rejected = [], []
+    for row in rows:
+        raw_vals = [row.get(f) for f in fields]
+        normed = normalize_batch(raw_vals)
+        invalid = {}
+        for f, raw, n in zip(fields, raw_vals, normed):
+            if raw and n is None:
+                invalid[f] = raw
+            row[f] = n
+        if invalid:
+            row["_invalid_numbers"] = invalid
+        if any(normed):
+            valid.append(row)
+        else:
+            rejected.append(row)
+    return valid, rejected
+
+
+def dial_string(e164, fmt=DIAL_NATIONAL):
+    """Ubah nomor E.164 ke format yang diharapkan trunk SIP."""
+    nsn = e164[1 + len(COUNTRY_CODE):]
+    if fmt == DIAL_E164:
+        return e164
+    if fmt == DIAL_INTL:
+        return f"{COUNTRY_CODE}{nsn}"
+    return f"0{nsn}"
+
+
+def cache_info():
+    return _normalize.cache_info()._asdict()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Pipeline log PJSIP: callback log (thread PJSIP / media / signalling) tidak pernah I/O.
+
+  - write(): filter level + rate limit per modul (token bucket) / sampling 1-dari-N,
+    lalu append ke ring (deque berbatas, tanpa lock)
+  - thread writer: tiap flush_sec kosongkan antrian tulis (deque kedua, berbatas),
+    tulis satu batch ke file yang dirotasi (max_bytes, backups)
+  - tail(): baris terakhir dari ring untuk /debug/pjsip-log
+
+Baris level <= 1 (error) selalu lolos rate limit. Jumlah baris yang dibuang per modul
+dicatat dan dilaporkan sebagai satu baris ringkasan di file.
+"""
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+
+def module_of(line):
+    """Baris PJSIP "HH:MM:SS.mmm  modul.c  pesan" -> "modul.c" (kosong jika format lain)."""
+    parts = line.split(None, 2)
+    return parts[1] if len(parts) > 2 and parts[0][:1].isdigit() else ""
+
+
+class _Bucket:
+    __slots__ = ("rate", "burst", "tokens", "last", "sample", "n", "dropped", "dropped_total")
+
+    def __init__(self, rate, burst, sample):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+        self.sample = sample
+        self.n = 0
+        self.dropped = 0            # belum dilaporkan ke file
+        self.dropped_total = 0
+
+
+class PjsipLog:
+    def __init__(self, path=None, ring=5000, rate=200.0, burst=None, module_rates=None, sample=None,
+                 max_bytes=20 * 1024 * 1024, backups=5, flush_sec=0.5, console=False):
+        self.path = path
+        self.ring = deque(maxlen=ring)
+        self.pending = deque(maxlen=ring * 4)   # belum ditulis writer
+        self.rate = rate                        # baris/detik per modul (None = tanpa batas)
+        self.burst = burst or (rate * 2 if rate else None)
+        self.module_rates = dict(module_rates or {})
+        self.sample = dict(sample or {})        # modul -> simpan 1 dari N baris
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_sec = flush_sec
+        self.console = console
+        self.buckets = {}
+        self.seq = itertools.count(1)
+        self.accepted = 0
+        self.written = 0
+        self.lost = 0                           # antrian tulis penuh (writer tertinggal)
+        self.write_errors = 0
+        self._thread = None
+        if path or console:
+            self._thread = threading.Thread(target=self._run, name="pjsip-log", daemon=True)
+            self._thread.start()
+
+    # ---------------- jalur panas (callback PJSIP) ----------------
+    def _bucket(self, module):
+        b = self.buckets.get(module)
+        if b is None:
+            rate = self.module_rates.get(module, self.rate)
+            burst = rate * 2 if rate and module in self.module_rates else self.burst
+            b = self.buckets.setdefault(module, _Bucket(rate, burst, self.sample.get(module, 1)))
+        return b
+
+    def write(self, level, line, module=None):
+        """Dipanggil dari callback; hanya hitung + append ke deque."""
+        line = line.rstrip()
+        if not line:
+            return False
+        module = module_of(line) if module is None else module
+        if level > 1:
+            b = self._bucket(module)
+            b.n += 1
+            if b.sample > 1 and b.n % b.sample:
+                b.dropped += 1
+                b.dropped_total += 1
+                return False
+            if b.rate:
+                now = time.monotonic()
+                b.tokens = min(b.burst, b.tokens + (now - b.last) * b.rate)
+                b.last = now
+                if b.tokens < 1:
+                    b.dropped += 1
+                    b.dropped_total += 1
+                    return False
+                b.tokens -= 1
+        rec = (next(self.seq), time.time(), level, module, line)
+        self.ring.append(rec)
+        if self.path or self.console:
+            if len(self.pending) == self.pending.maxlen:
+                self.lost += 1
+            self.pending.append(rec)
+        self.accepted += 1
+        return True
+
+    # ---------------- writer ----------------
+    def _run(self):
+        while True:
+            time.sleep(self.flush_sec)
+            try:
+                self.flush()
+            except Exception as e:
+                self.write_errors += 1
+                print(f"[PJSIP-LOG] flush gagal: {e}")
+
+    def _suppressed_lines(self):
+        out = []
+        for module, b in list(self.buckets.items()):
+            if b.dropped:
+                n, b.dropped = b.dropped, 0
+                out.append(f"{time.strftime('%H:%M:%S')} [pjsip-log] {module or '-'}: {n} baris dibuang (rate/sample)")
+        return out
+
+    def flush(self):
+        n = len(self.pending)
+        if not n:
+            return 0
+        rows = [self.pending.popleft() for _ in range(n)]
+        lines = [r[4] for r in rows] + self._suppressed_lines()
+        text = "\n".join(lines) + "\n"
+        if self.console:
+            print(text, end="")
+        if self.path:
+            self._append(text)
+        self.written += n
+        return n
+
+    def _append(self, text):
+        data = text.encode("utf-8", "replace")
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size and size + len(data) > self.max_bytes:
+            self._rotate()
+        with open(self.path, "ab") as f:
+            f.write(data)
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    # ---------------- baca ----------------
+    def tail(self, n=200, module=None, max_level=None, since=0):
+        rows = [r for r in list(self.ring) if r[0] > since
+                and (module is None or r[3] == module) and (max_level is None or r[2] <= max_level)]
+        return [{"seq": r[0], "ts": r[1], "level": r[2], "module": r[3], "line": r[4]} for r in rows[-n:]]
+
+    def snapshot(self):
+        return {
+            "path": self.path, "ring": len(self.ring), "accepted": self.accepted, "written": self.written,
+            "pending": len(self.pending), "lost": self.lost, "write_errors": self.write_errors,
+            "dropped": {m or "-": b.dropped_total for m, b in list(self.buckets.items()) if b.dropped_total},
+            "modules": len(self.buckets),
+        }
+
+
+def tail_file(path, n=200):
+    """n baris terakhir sebuah file log (dibaca dari belakang, untuk file dari proses lain)."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            block = min(end, max(4096, n * 200))
+            f.seek(end - block)
+            data = f.read(block)
+    except OSError:
+        return []
+    return data.decode("utf-8", "replace").splitlines()[-n:]
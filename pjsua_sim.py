@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""
+pjsua tiruan untuk simulasi offline dan load test: tanpa binding native, tanpa trunk.
+
+Subset API pjsua yang dipakai server_linux2 (Lib, Account, Call, CallCallback, CallState,
+MediaState, conf_connect, player / recorder). Setiap leg mengikuti alur acak sesuai
+konfigurasi: CALLING -> 180/183 -> CONFIRMED -> BYE dari remote, atau gagal dengan kode SIP.
+Callback on_state / on_media_state dipanggil dari satu thread scheduler (seperti thread
+PJSIP), bukan thread per call, jadi ribuan leg hidup bersamaan tetap ringan.
+
+  PJSUA_BACKEND=sim python server_linux2.py
+  PJSUA_BACKEND=sim PJSUA_SIM='{"answer_prob": 0.3, "time_scale": 0.1}' python server_linux2.py
+  PJSUA_BACKEND=sim PJSUA_SIM=sim.json python server_linux2.py
+
+Konfigurasi (PJSUA_SIM: JSON atau path file JSON) menimpa DEFAULTS. Durasi bisa berupa
+angka (tetap), [min, max] (uniform) atau {"dist": "lognormal", "median": 8, "sigma": 0.6}
+/ {"dist": "exp", "mean": 5} / {"dist": "normal", "mean": 5, "sd": 1}; null = tidak pernah.
+Kode gagal berupa bobot {"486": 5, "404": 1}. "agent" menimpa nilai untuk leg agent (user
+part <= AGENT_MAX_DIGITS digit), "prefixes" menimpa per awalan nomor yang di-dial
+(prefix terpanjang menang), mis. {"0811": {"answer_prob": 0.6}}.
+"""
+import heapq
+import itertools
+import json
+import math
+import os
+import random
+import struct
+import threading
+import time
+
+AGENT_MAX_DIGITS = 6
+
+DEFAULTS = {
+    "seed": None,
+    "time_scale": 1.0,          # pengali semua durasi (0.1 = 10x lebih cepat; timeout server tidak ikut)
+    "reg_delay": 0.05,          # detik sampai akun terdaftar
+    "reg_status": 200,
+    "pdd": [0.3, 2.0],          # post-dial delay: INVITE -> 180/183 (atau penolakan)
+    "no_ring_prob": 0.05,       # tidak ada respons sama sekali (nomor mati), 408 setelah no_ring_sec
+    "no_ring_sec": 32.0,
+    "reject_prob": 0.10,        # ditolak tanpa ringing
+    "reject_codes": {"486": 4, "404": 2, "503": 1, "484": 1},
+    "early_media_prob": 0.3,    # ringing lewat 183 + early media (RBT operator), bukan 180
+    "answer_prob": 0.40,        # dari leg yang ringing
+    "ring_time": {"dist": "lognormal", "median": 8.0, "sigma": 0.6},
+    "decline_prob": 0.15,       # dari leg ringing yang tidak dijawab: ditolak setelah ring_time
+    "decline_codes": {"603": 2, "486": 1},
+    "no_answer_sec": 60.0,      # sisanya ringing terus, 480 setelah ini (jika belum di-hangup)
+    "talk_time": {"dist": "lognormal", "median": 45.0, "sigma": 0.8},   # CONFIRMED -> BYE remote
+    "machine_prob": 0.0,        # jawaban mesin penjawab (audio rekaman AMD panjang)
+    "follow_hangup": [0.5, 2.0],    # leg yang di-bridge (conf_connect) ikut BYE setelah lawannya putus
+    "agent": {
+        "no_ring_prob": 0.0, "reject_prob": 0.0, "early_media_prob": 0.0, "answer_prob": 1.0,
+        "pdd": 0.1, "ring_time": [1.0, 3.0], "machine_prob": 0.0,
+        "talk_time": [60.0, 120.0],     # agent menutup paling lambat setelah ini
+    },
+    "prefixes": {},
+}
+
+REASONS = {
+    180: "Ringing", 183: "Session Progress", 200: "OK", 404: "Not Found", 408: "Request Timeout",
+    480: "Temporarily Unavailable", 484: "Address Incomplete", 486: "Busy Here",
+    487: "Request Terminated", 503: "Service Unavailable", 603: "Decline",
+}
+
+
+class Error(Exception):
+    pass
+
+
+class CallState:
+    NULL, CALLING, INCOMING, EARLY, CONNECTING, CONFIRMED, DISCONNECTED = range(7)
+
+
+class MediaState:
+    NULL, ACTIVE, LOCAL_HOLD, REMOTE_HOLD, ERROR = range(5)
+
+
+class TransportType:
+    UNSPECIFIED, UDP, TCP, TLS, IPV6 = 0, 1, 2, 3, 128
+
+
+_STATE_TEXT = {CallState.NULL: "NULL", CallState.CALLING: "CALLING", CallState.EARLY: "EARLY",
+               CallState.CONNECTING: "CONNECTING", CallState.CONFIRMED: "CONFIRMED",
+               CallState.DISCONNECTED: "DISCONNCTD"}
+
+
+class _Cfg:
+    """TransportConfig / LogConfig / AccountConfig / AuthCred: cukup menyimpan atribut."""
+
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.__dict__.update(kwargs)
+
+
+class TransportConfig(_Cfg):
+    def __init__(self, port=0, bound_addr="", public_addr=""):
+        super().__init__(port=port, bound_addr=bound_addr, public_addr=public_addr)
+
+
+class LogConfig(_Cfg):
+    def __init__(self, level=5, console_level=5, filename="", callback=None):
+        super().__init__(level=level, console_level=console_level, filename=filename, callback=callback)
+
+
+class AccountConfig(_Cfg):
+    def __init__(self, domain="", username="", password="", display="", registrar="", proxy=""):
+        super().__init__(id="", reg_uri=registrar, proxy=[proxy] if proxy else [], auth_cred=[])
+
+
+class AuthCred(_Cfg):
+    def __init__(self, realm, username, passwd, scheme="Digest", data_type=0):
+        super().__init__(realm=realm, username=username, data=passwd, scheme=scheme)
+
+
+# ===========================================================
+#                 Konfigurasi & distribusi
+# ===========================================================
+def load_config(value=None):
+    """PJSUA_SIM (JSON atau path file) -> dict lengkap (DEFAULTS ditimpa)."""
+    if value is None:
+        value = os.environ.get("PJSUA_SIM", "")
+    value = value.strip()
+    if not value:
+        user = {}
+    elif value.startswith("{"):
+        user = json.loads(value)
+    else:
+        with open(value) as f:
+            user = json.load(f)
+    unknown = set(user) - set(DEFAULTS)
+    for over in [user.get("agent") or {}] + list((user.get("prefixes") or {}).values()):
+        unknown |= set(over) - (set(DEFAULTS) - {"seed", "time_scale", "agent", "prefixes"})
+    if unknown:
+        raise ValueError(f"PJSUA_SIM: kunci tidak dikenal {sorted(unknown)}")
+    cfg = dict(DEFAULTS)
+    cfg.update(user)
+    cfg["agent"] = dict(DEFAULTS["agent"], **(user.get("agent") or {}))
+    return cfg
+
+
+def sample(spec, rnd):
+    """Durasi (detik) dari spec distribusi; None = tidak pernah."""
+    if spec is None:
+        return None
+    if isinstance(spec, (int, float)):
+        return float(spec)
+    if isinstance(spec, (list, tuple)):
+        return rnd.uniform(spec[0], spec[1])
+    dist = spec.get("dist", "fixed")
+    if dist == "lognormal":
+        v = rnd.lognormvariate(math.log(spec["median"]), spec.get("sigma", 0.5))
+    elif dist == "exp":
+        v = rnd.expovariate(1.0 / spec["mean"])
+    elif dist == "normal":
+        v = rnd.gauss(spec["mean"], spec.get("sd", 0.0))
+    elif dist == "uniform":
+        v = rnd.uniform(spec["min"], spec["max"])
+    elif dist == "fixed":
+        v = float(spec["value"])
+    else:
+        raise ValueError(f"PJSUA_SIM: distribusi tidak dikenal {dist!r}")
+    v = max(0.0, v)
+    return min(v, spec["max"]) if "max" in spec and dist != "uniform" else v
+
+
+def pick_code(weights, rnd):
+    codes = list(weights)
+    return int(rnd.choices(codes, weights=[weights[c] for c in codes], k=1)[0])
+
+
+def _user_part(uri):
+    """User part dari URI "sip:0812...@host:port;transport=udp"."""
+    s = uri[4:] if uri.startswith("sip:") else uri
+    return s.split("@", 1)[0]
+
+
+# ===========================================================
+#                 Scheduler (thread "PJSIP")
+# ===========================================================
+class _Scheduler:
+    """Satu thread + heap event berwaktu; semua callback call dipanggil dari sini."""
+
+    def __init__(self):
+        self.heap = []
+        self.seq = itertools.count()
+        self.cond = threading.Condition()
+        self.fired = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name="pjsua-sim", daemon=True)
+        self._thread.start()
+
+    def at(self, delay, fn, *args):
+        with self.cond:
+            heapq.heappush(self.heap, (time.monotonic() + max(0.0, delay), next(self.seq), fn, args))
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.heap or self.heap[0][0] > time.monotonic():
+                    self.cond.wait(self.heap[0][0] - time.monotonic() if self.heap else None)
+                _, _, fn, args = heapq.heappop(self.heap)
+            try:
+                fn(*args)
+            except Exception as e:
+                self.errors += 1
+                print(f"[PJSUA-SIM] callback error: {e}")
+            self.fired += 1
+
+
+# ===========================================================
+#                     Call / Account / Lib
+# ===========================================================
+class CallInfo:
+    __slots__ = ("state", "state_text", "last_code", "last_reason", "media_state", "conf_slot",
+                 "sip_call_id", "remote_uri", "call_time", "total_time")
+
+    def __init__(self, uri, call_id, slot):
+        self.state = CallState.NULL
+        self.state_text = _STATE_TEXT[CallState.NULL]
+        self.last_code = 0
+        self.last_reason = ""
+        self.media_state = MediaState.NULL
+        self.conf_slot = slot
+        self.sip_call_id = call_id
+        self.remote_uri = uri
+        self.call_time = 0
+        self.total_time = 0
+
+
+class CallCallback:
+    def __init__(self, call=None):
+        self.call = call
+
+    def _set_call(self, call):
+        self.call = call
+
+    def on_state(self):
+        pass
+
+    def on_media_state(self):
+        pass
+
+
+class Call:
+    def __init__(self, lib, uri, cb, profile):
+        self._lib = lib
+        self._cb = cb or CallCallback()
+        self._cb._set_call(self)
+        self._info = CallInfo(uri, f"sim-{next(lib._ids)}@pjsua-sim", lib._new_slot())
+        self._profile = profile
+        self._hanging = False
+        self._machine = False
+        self._t_confirmed = None
+
+    def info(self):
+        i = self._info
+        if self._t_confirmed is not None and i.state == CallState.CONFIRMED:
+            i.call_time = int(time.monotonic() - self._t_confirmed)
+        return i
+
+    def is_valid(self):
+        return self._info.state != CallState.DISCONNECTED
+
+    def set_callback(self, cb):
+        self._cb = cb
+        cb._set_call(self)
+
+    def hangup(self, code=603, reason="", hdr_list=None):
+        """Async seperti pjsua: DISCONNECTED (487 sebelum dijawab, 200 sesudahnya) dari thread scheduler."""
+        with self._lib._lock:
+            if self._hanging or self._info.state == CallState.DISCONNECTED:
+                return
+            self._hanging = True
+            code = 200 if self._info.state == CallState.CONFIRMED else 487
+        self._lib._sched.at(0.0, self._step, CallState.DISCONNECTED, code, True)
+
+    def _step(self, state, code, local=False):
+        """Satu transisi terjadwal; diabaikan jika leg sudah di-hangup / putus."""
+        lib = self._lib
+        with lib._lock:
+            i = self._info
+            if i.state == CallState.DISCONNECTED or (self._hanging and not local):
+                return
+            i.state, i.state_text = state, _STATE_TEXT[state]
+            if code:
+                i.last_code = code
+                i.last_reason = "Normal call clearing" if state == CallState.DISCONNECTED and code == 200 \
+                    else REASONS.get(code, "")
+            media = None
+            if state == CallState.CONFIRMED or (state == CallState.EARLY and code == 183):
+                media = MediaState.ACTIVE
+            elif state == CallState.DISCONNECTED:
+                i.media_state = MediaState.NULL
+                lib.active.discard(self)
+                lib._follow(self)
+            if state == CallState.CONFIRMED:
+                self._t_confirmed = time.monotonic()
+            if media is not None:
+                i.media_state = media
+        lib._log(3 if code < 400 else 2, f"Call {i.sip_call_id} state changed to {i.state_text} ({code})")
+        self._cb.on_state()
+        if media is not None:
+            self._cb.on_media_state()
+
+    def _plan(self, rnd, scale):
+        """Jadwalkan seluruh alur leg ini di awal (tiap langkah dicek ulang saat jatuh tempo)."""
+        p = self._profile
+        at = self._lib._sched.at
+        at(0.0, self._step, CallState.CALLING, 0)
+        if rnd.random() < p["no_ring_prob"]:
+            at(p["no_ring_sec"] * scale, self._step, CallState.DISCONNECTED, 408)
+            return
+        t = sample(p["pdd"], rnd) * scale
+        if rnd.random() < p["reject_prob"]:
+            at(t, self._step, CallState.DISCONNECTED, pick_code(p["reject_codes"], rnd))
+            return
+        at(t, self._step, CallState.EARLY, 183 if rnd.random() < p["early_media_prob"] else 180)
+        ring = sample(p["ring_time"], rnd)
+        if rnd.random() < p["answer_prob"] and ring is not None:
+            t += ring * scale
+            self._machine = rnd.random() < p["machine_prob"]
+            at(t, self._step, CallState.CONNECTING, 200)
+            at(t, self._step, CallState.CONFIRMED, 200)
+            talk = sample(p["talk_time"], rnd)
+            if talk is not None:
+                at(t + talk * scale, self._step, CallState.DISCONNECTED, 200)
+            return
+        if rnd.random() < p["decline_prob"] and ring is not None:
+            at(t + ring * scale, self._step, CallState.DISCONNECTED, pick_code(p["decline_codes"], rnd))
+            return
+        at(t + p["no_answer_sec"] * scale, self._step, CallState.DISCONNECTED, 480)
+
+
+class AccountInfo:
+    __slots__ = ("uri", "reg_status", "reg_reason", "online_status")
+
+    def __init__(self, uri, status):
+        self.uri = uri
+        self.reg_status = status
+        self.reg_reason = REASONS.get(status, "")
+        self.online_status = False
+
+
+class Account:
+    def __init__(self, lib, cfg):
+        self._lib = lib
+        self._cfg = cfg
+        self._reg_at = time.monotonic() + lib._cfg["reg_delay"] * lib._cfg["time_scale"]
+        self._deleted = False
+
+    def info(self):
+        status = self._lib._cfg["reg_status"] if time.monotonic() >= self._reg_at else 100
+        return AccountInfo(getattr(self._cfg, "id", ""), status)
+
+    def is_valid(self):
+        return not self._deleted
+
+    def make_call(self, dst_uri, cb=None, hdr_list=None):
+        if self._deleted:
+            raise Error("account deleted")
+        return self._lib._make_call(dst_uri, cb)
+
+    def delete(self):
+        self._deleted = True
+
+
+class Lib:
+    _inst = None
+
+    def __init__(self, config=None):
+        Lib._inst = self
+        self._cfg = load_config() if config is None else config
+        self._rnd = random.Random(self._cfg["seed"])
+        # audio sapaan dibuat sekali (manusia / mesin); conf_connect hanya menulis WAV
+        g = random.Random(self._cfg["seed"])
+        self._greetings = {False: _greeting(False, g), True: _greeting(True, g)}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._slots = itertools.count(1)   # slot 0 = sound device
+        self._sched = None
+        self._log_cfg = None
+        self.active = set()
+        self.by_slot = {}                   # conf_slot -> Call aktif
+        self.conf = set()                   # (src, dst) conf_connect aktif
+        self.players = {}
+        self.recorders = {}                 # id -> [path, slot]
+
+    @staticmethod
+    def instance():
+        return Lib._inst
+
+    def _new_slot(self):
+        return next(self._slots)
+
+    def _log(self, level, msg):
+        cfg = self._log_cfg
+        if cfg is not None and cfg.callback is not None and level <= cfg.level:
+            line = f"{time.strftime('%H:%M:%S')}.{int(time.time() * 1000) % 1000:03d}  pjsua_sim.c  {msg}"
+            cfg.callback(level, line, len(line))
+
+    # ---------------- siklus hidup ----------------
+    def init(self, ua_cfg=None, log_cfg=None, media_cfg=None):
+        self._log_cfg = log_cfg
+        self._sched = _Scheduler()
+        self._log(2, f"pjsua_sim: seed={self._cfg['seed']} time_scale={self._cfg['time_scale']}")
+
+    def create_transport(self, type, cfg=None):
+        return (type, getattr(cfg, "port", 0))
+
+    def start(self, with_thread=True):
+        pass
+
+    def destroy(self):
+        self.hangup_all()
+        Lib._inst = None
+
+    def set_null_snd_dev(self):
+        pass
+
+    def thread_register(self, name):
+        pass
+
+    def handle_events(self, timeout=50):
+        return 0
+
+    # ---------------- akun & call ----------------
+    def create_account(self, acc_config, set_default=True, cb=None):
+        return Account(self, acc_config)
+
+    def _profile(self, user_part):
+        cfg = self._cfg
+        p = dict(cfg)
+        if user_part.isdigit() and len(user_part) <= AGENT_MAX_DIGITS:
+            p.update(cfg["agent"])
+        best = max((k for k in cfg["prefixes"] if user_part.startswith(k)), key=len, default=None)
+        if best is not None:
+            p.update(cfg["prefixes"][best])
+        return p
+
+    def _make_call(self, uri, cb):
+        user_part = _user_part(uri)
+        call = Call(self, uri, cb, self._profile(user_part))
+        with self._lock:
+            self.active.add(call)
+            self.by_slot[call._info.conf_slot] = call
+            call._plan(self._rnd, self._cfg["time_scale"])
+        return call
+
+    def _follow(self, call):
+        """Dipanggil (lock dipegang) saat call putus: lawan bridge-nya menutup setelah follow_hangup."""
+        slot = call._info.conf_slot
+        self.by_slot.pop(slot, None)
+        links = {(a, b) for a, b in self.conf if slot in (a, b)}
+        self.conf -= links
+        for other_slot in {a if b == slot else b for a, b in links}:
+            other = self.by_slot.get(other_slot)
+            if other is not None:
+                delay = sample(other._profile["follow_hangup"], self._rnd)
+                if delay is not None:
+                    self._sched.at(delay * self._cfg["time_scale"], other._step, CallState.DISCONNECTED, 200)
+
+    def hangup_all(self):
+        with self._lock:
+            calls = list(self.active)
+        for call in calls:
+            call.hangup()
+
+    # ---------------- conference bridge ----------------
+    def conf_connect(self, src_slot, dst_slot):
+        with self._lock:
+            self.conf.add((src_slot, dst_slot))
+            call = self.by_slot.get(src_slot)
+        for path, slot in list(self.recorders.values()):
+            if slot == dst_slot and call is not None:
+                _write_wav(path, self._greetings[call._machine])
+
+    def conf_disconnect(self, src_slot, dst_slot):
+        with self._lock:
+            self.conf.discard((src_slot, dst_slot))
+
+    def create_player(self, filename, loop=False):
+        pid = next(self._ids)
+        self.players[pid] = self._new_slot()
+        return pid
+
+    def player_get_slot(self, player_id):
+        return self.players[player_id]
+
+    def player_destroy(self, player_id):
+        self.players.pop(player_id, None)
+
+    def create_recorder(self, filename):
+        rid = next(self._ids)
+        self.recorders[rid] = [filename, self._new_slot()]
+        _write_wav(filename, b"")
+        return rid
+
+    def recorder_get_slot(self, rec_id):
+        return self.recorders[rec_id][1]
+
+    def recorder_destroy(self, rec_id):
+        self.recorders.pop(rec_id, None)
+
+
+# ===========================================================
+#                 Audio rekaman (untuk AMD)
+# ===========================================================
+RATE = 8000
+
+
+def _greeting(machine, rnd):
+    """Diam 0.4 s lalu "Halo?" pendek (manusia) atau sapaan panjang berkata-kata (mesin)."""
+    def seg(sec, amp):
+        n = int(sec * RATE)
+        return struct.pack(f"<{n}h", *(int(rnd.gauss(0, amp)) for _ in range(n)))
+    words = [(0.4, 30), (0.5, 4000), (2.6, 30)] if not machine else \
+        [(0.4, 30)] + [(0.45, 4000), (0.15, 30)] * 6 + [(0.5, 30)]
+    return b"".join(seg(sec, amp) for sec, amp in words)
+
+
+def _write_wav(path, pcm):
+    """WAV PCM16 mono 8 kHz (header + data sekaligus)."""
+    header = struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + len(pcm), b"WAVE", b"fmt ", 16, 1, 1,
+                         RATE, RATE * 2, 2, 16, b"data", len(pcm))
+    with open(path, "wb") as f:
+        f.write(header + pcm)
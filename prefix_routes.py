@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Routing per prefix nomor (longest-prefix match): prefix -> trunk pilihan,
+suffix dial dan pool concurrency (mis. per operator).
+
+Format file JSON:
+  {
+    "pools":  {"telkomsel": 8, "xl": 4},
+    "routes": [
+      {"prefix": "0811", "trunk": "infin8-7060", "pool": "telkomsel"},
+      {"prefix": "0817", "trunk": "infin8-6070", "suffix": "", "pool": "xl"},
+      {"prefix": "*",    "trunk": null}
+    ]
+  }
+
+Prefix boleh ditulis 08xx / 628xx / +628xx (disimpan sebagai digit E.164 tanpa "+").
+Index tidak pernah diubah setelah dibuat; reload membangun index baru lalu
+menukar referensinya, jadi lookup tidak pernah menunggu lock.
+
+Uji kecepatan lookup:
+  python prefix_routes.py routes.json
+"""
+import json
+import os
+import sys
+import time
+
+FLAT_MAX_KEYS = 200_000     # batas ukuran tabel rata (prefix diperluas ke panjang prefix terpanjang)
+
+
+class Route:
+    __slots__ = ("prefix", "trunk", "suffix", "pool")
+
+    def __init__(self, prefix, trunk=None, suffix="", pool=None):
+        self.prefix = prefix
+        self.trunk = trunk
+        self.suffix = suffix or ""
+        self.pool = pool
+
+    def to_dict(self):
+        return {"prefix": self.prefix, "trunk": self.trunk, "suffix": self.suffix, "pool": self.pool}
+
+
+def normalize_prefix(prefix):
+    """'0812' / '62812' / '+62812' -> '62812'; '*' atau '' -> '' (default route)."""
+    p = "".join(ch for ch in str(prefix) if ch.isdigit())
+    if p.startswith("0"):
+        p = "62" + p[1:]
+    return p
+
+
+class PrefixIndex:
+    """
+    Longest-prefix match. Jika muat, semua prefix diperluas ke panjang prefix
+    terpanjang (W digit) sehingga lookup = satu slice + satu dict.get.
+    Jika tidak muat: dict {prefix: Route} dicek dari panjang terpanjang.
+
+    lookup(number) menerima E.164 ('+62812...') atau digit; return Route atau None.
+    """
+    __slots__ = ("_map", "_lengths", "_flat", "_width", "default", "routes", "pools", "lookup")
+
+    def __init__(self, routes=(), pools=None):
+        self.routes = list(routes)
+        self.pools = dict(pools or {})
+        self._map = {}
+        self.default = None
+        for r in self.routes:
+            if r.prefix:
+                self._map[r.prefix] = r
+            else:
+                self.default = r
+        self._lengths = tuple(sorted({len(p) for p in self._map}, reverse=True))
+        self._width = self._lengths[0] if self._lengths else 0
+        self._flat = None
+        if self._width and sum(10 ** (self._width - len(p)) for p in self._map) <= FLAT_MAX_KEYS:
+            flat = {}
+            # prefix pendek dulu supaya prefix yang lebih panjang menimpanya
+            for p in sorted(self._map, key=len):
+                pad = self._width - len(p)
+                if pad == 0:
+                    flat[p] = self._map[p]
+                    continue
+                for i in range(10 ** pad):
+                    flat[p + str(i).zfill(pad)] = self._map[p]
+            self._flat = flat
+        self.lookup = self._fast_lookup() if self._flat is not None else self._lookup_slow
+
+    def __len__(self):
+        return len(self.routes)
+
+    def _fast_lookup(self):
+        # closure: semua yang dibutuhkan jadi variabel lokal (tanpa lookup atribut)
+        get = self._flat.get
+        width, width1, default, slow = self._width, self._width + 1, self.default, self._lookup_slow
+
+        def lookup(number):
+            if number[:1] == "+":
+                return get(number[1:width1], default) if len(number) > width else slow(number)
+            return get(number[:width], default) if len(number) >= width else slow(number)
+        return lookup
+
+    def _lookup_slow(self, number):
+        digits = number[1:] if number[:1] == "+" else number
+        get = self._map.get
+        for n in self._lengths:
+            r = get(digits[:n])
+            if r is not None:
+                return r
+        return self.default
+
+
+def parse_table(data):
+    routes = [Route(normalize_prefix(e.get("prefix", "")), trunk=e.get("trunk"),
+                    suffix=e.get("suffix", ""), pool=e.get("pool"))
+              for e in data.get("routes", [])]
+    return PrefixIndex(routes, pools=data.get("pools"))
+
+
+class PrefixRouter:
+    """Pemegang index aktif + hot reload dari file (cek mtime)."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.index = PrefixIndex()
+        self.lookup = self.index.lookup     # ditukar bersama index (tanpa lapisan method)
+        self._mtime = None
+        self.reloads = 0
+        self.last_error = None
+        if path:
+            self.reload(force=True)
+
+    def reload(self, force=False):
+        """Muat ulang jika file berubah. Return True jika index ditukar."""
+        if not self.path:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if not force and mtime == self._mtime:
+                return False
+            with open(self.path) as f:
+                index = parse_table(json.load(f))
+        except Exception as e:
+            # file rusak / sedang ditulis -> tetap pakai index lama
+            if str(e) != self.last_error:
+                print(f"[ROUTES] reload gagal: {e}")
+            self.last_error = str(e)
+            return False
+        self.index = index
+        self.lookup = index.lookup
+        self._mtime = mtime
+        self.reloads += 1
+        self.last_error = None
+        print(f"[ROUTES] {len(index)} route dimuat dari {self.path}")
+        return True
+
+    def snapshot(self):
+        index = self.index
+        return {"file": self.path, "routes": len(index), "pools": index.pools,
+                "reloads": self.reloads, "last_error": self.last_error}
+
+
+def _bench(path, n=1_000_000):
+    router = PrefixRouter(path)
+    numbers = ["+62811%07d" % i for i in range(1000)] + ["+62817%07d" % i for i in range(1000)]
+    numbers = (numbers * (n // len(numbers) + 1))[:n]
+    lookup = router.lookup
+    t0 = time.perf_counter()
+    for num in numbers:
+        pass
+    t1 = time.perf_counter()
+    for num in numbers:
+        lookup(num)
+    dt = (time.perf_counter() - t1) - (t1 - t0)   # tanpa overhead loop
+    print(f"{len(router.index)} route, {n} lookup: {dt * 1e9 / n:.0f} ns/lookup")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("pakai: python prefix_routes.py <routes.json>")
+        sys.exit(1)
+    _bench(sys.argv[1])
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Scheduler retry & callback berbasis TimerWheel.
+
+Row yang belum terjawab (atau minta "telepon lagi jam 14:00") disimpan di wheel,
+lalu dimasukkan lagi ke antrian dial saat jatuh tempo. Worker tidak perlu tidur
+untuk menunggu retry. poll() hanya memindahkan row; penyimpanan jadwal ke file
+(save()) dipanggil pemilik scheduler di thread lain, tidak di thread timer.
+
+Aturan:
+  - jarak antar retry mengikuti `spacing_sec` (per nomor percobaan)
+  - maksimal `max_per_day` percobaan per row per hari; sisanya pindah ke besok
+  - maksimal `max_total` percobaan total, setelah itu row dilepas
+  - callback eksplisit ("HH:MM") tidak dihitung sebagai retry
+"""
+import datetime
+import json
+import os
+import threading
+import time
+
+from timer_wheel import TimerWheel
+
+
+def _parse_hhmm(value, now):
+    """'14:00' -> epoch hari ini (atau besok jika jam sudah lewat)."""
+    hh, mm = (int(x) for x in str(value).strip().split(":", 1))
+    base = datetime.datetime.fromtimestamp(now)
+    at = base.replace(hour=hh, minute=mm, second=0, microsecond=0)
+    if at.timestamp() <= now:
+        at += datetime.timedelta(days=1)
+    return at.timestamp()
+
+
+def split_callbacks(rows, field="callback_at", now=None):
+    """
+    Pisahkan row yang field callback-nya tidak bisa diparse ("HH:MM").
+    Return (rows_ok, rows_invalid); row invalid diberi row["_invalid_callback_at"].
+    """
+    now = time.time() if now is None else now
+    ok, invalid = [], []
+    for row in rows:
+        value = row.get(field)
+        if value:
+            try:
+                _parse_hhmm(value, now)
+            except (TypeError, ValueError):
+                row["_invalid_callback_at"] = value
+                invalid.append(row)
+                continue
+        ok.append(row)
+    return ok, invalid
+
+
+class RetryScheduler:
+    def __init__(self, enqueue, tick_sec=1.0, spacing_sec=(900, 1800, 3600),
+                 max_per_day=3, max_total=9, day_start_hour=8, state_file=None,
+                 on_fire=None):
+        self.enqueue = enqueue              # fungsi(row) -> masukkan ke antrian dial
+        self.on_fire = on_fire              # optional callback(row, reason)
+        self.spacing_sec = tuple(spacing_sec)
+        self.max_per_day = max_per_day
+        self.max_total = max_total
+        self.day_start_hour = day_start_hour
+        self.state_file = state_file
+        self.wheel = TimerWheel(tick_sec=tick_sec, now=time.time())
+        self._dirty = False
+        self._save_lock = threading.Lock()
+        self.max_row_id = 0                 # _row_id terbesar dari jadwal yang dimuat
+        if state_file:
+            self._load()
+
+    def __len__(self):
+        return len(self.wheel)
+
+    # ---------------- penjadwalan ----------------
+    def schedule_at(self, row, when, reason="retry"):
+        row["_scheduled_at"] = when
+        row["_scheduled_reason"] = reason
+        h = self.wheel.schedule(when, row)
+        self._dirty = True
+        return h
+
+    def schedule_callback(self, row, hhmm, now=None):
+        """Callback eksplisit, mis. nasabah minta ditelepon jam 14:00."""
+        now = time.time() if now is None else now
+        return self.schedule_at(row, _parse_hhmm(hhmm, now), reason=f"callback@{hhmm}")
+
+    def schedule_retry(self, row, reason="no_answer", now=None):
+        """
+        Jadwalkan percobaan berikutnya sesuai aturan spacing & batas harian.
+        Return epoch jadwal, atau None jika batas total tercapai.
+        """
+        now = time.time() if now is None else now
+        today = datetime.date.fromtimestamp(now).isoformat()
+        total = row.get("_attempts_total", 0) + 1
+        if total > self.max_total:
+            return None
+        if row.get("_attempt_day") != today:
+            row["_attempt_day"] = today
+            row["_attempts_today"] = 0
+        row["_attempts_today"] += 1
+        row["_attempts_total"] = total
+
+        gap = self.spacing_sec[min(total - 1, len(self.spacing_sec) - 1)]
+        when = now + gap
+        if row["_attempts_today"] >= self.max_per_day or datetime.date.fromtimestamp(when).isoformat() != today:
+            # jatah hari ini habis -> besok pagi
+            tomorrow = datetime.datetime.fromtimestamp(now).replace(
+                hour=self.day_start_hour, minute=0, second=0, microsecond=0) + datetime.timedelta(days=1)
+            when = tomorrow.timestamp()
+        self.schedule_at(row, when, reason=reason)
+        return when
+
+    def clear(self):
+        self.wheel.clear()
+        self._dirty = True
+        self.save()
+
+    def pending(self):
+        return self.wheel.pending()
+
+    # ---------------- loop ----------------
+    def poll(self, now=None):
+        """Keluarkan row yang jatuh tempo ke antrian dial. Return jumlah row."""
+        due = self.wheel.advance(time.time() if now is None else now)
+        for row in due:
+            reason = row.pop("_scheduled_reason", "retry")
+            row.pop("_scheduled_at", None)
+            try:
+                self.enqueue(row)
+            except Exception as e:
+                print(f"[RETRY] enqueue gagal: {e}")
+            if self.on_fire:
+                try:
+                    self.on_fire(row, reason)
+                except Exception:
+                    pass
+        if due:
+            self._dirty = True
+        return len(due)
+
+    # ---------------- persist ----------------
+    def save(self):
+        """Tulis jadwal ke state_file jika ada perubahan. Blocking I/O: jangan di thread timer."""
+        if not self.state_file or not self._dirty:
+            return
+        if not self._save_lock.acquire(blocking=False):
+            return                   # penyimpanan sebelumnya masih jalan
+        self._dirty = False
+        tmp = f"{self.state_file}.tmp"
+        try:
+            # salin row: row yang baru keluar dari wheel bisa sedang diubah worker
+            data = [{"when": when, "row": dict(row)} for when, row in self.wheel.pending()]
+            # isi row termasuk kredensial SIP -> file hanya bisa dibaca owner
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.state_file)
+        except Exception as e:
+            self._dirty = True
+            print(f"[RETRY] gagal simpan jadwal: {e}")
+        finally:
+            self._save_lock.release()
+
+    def _load(self):
+        try:
+            with open(self.state_file) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"[RETRY] gagal baca jadwal: {e}")
+            return
+        for ent in data:
+            row = ent.get("row") or {}
+            if isinstance(row.get("_row_id"), int):
+                self.max_row_id = max(self.max_row_id, row["_row_id"])
+            self.wheel.schedule(float(ent["when"]), row)
+        print(f"[RETRY] {len(data)} jadwal dimuat dari {self.state_file}")
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Statistik waktu jawab (INVITE -> 200 OK) per prefix dan per nomor, untuk memilih
+ring timeout per panggilan dari kuantil distribusi yang teramati.
+
+  - per prefix : histogram 1 detik (uint32) + jumlah tidak terjawab
+  - per nomor  : array NumPy ringkas (jumlah jawab, jumlah tidak jawab, waktu jawab maks),
+                 di-index dict nomor -> slot
+  - timeout    = kuantil prefix (fallback global) + margin, minimal waktu jawab terlama
+                 nomor itu sendiri, dibatasi [min_sec, max_sec]
+
+Histogram hanya diisi leg yang berdering sampai timeout penuh: leg dengan timeout yang sudah
+dipendekkan hanya melihat jawaban di bawah timeout itu (tersensor), sehingga kuantilnya
+selalu lebih rendah dan timeout berikutnya makin pendek sampai min_sec. Sebagian kecil leg
+(explore) tetap diberi timeout penuh supaya histogram terus mendapat sampel tak tersensor.
+
+Opsional disimpan ke .npz (state_file) supaya statistik tidak hilang saat restart.
+"""
+import os
+import random
+import threading
+
+import numpy as np
+
+
+class RingStats:
+    def __init__(self, max_sec=45, min_sec=20, quantile=0.95, margin_sec=2.0,
+                 min_samples=30, prefix_digits=5, state_file=None, explore=0.1):
+        self.max_sec = int(max_sec)
+        self.min_sec = min_sec
+        self.quantile = quantile
+        self.margin_sec = margin_sec
+        self.min_samples = min_samples
+        self.prefix_digits = prefix_digits
+        self.explore = explore          # porsi leg yang tetap memakai timeout penuh
+        self.state_file = state_file
+        self.lock = threading.Lock()
+        nbins = self.max_sec + 1
+        self.global_hist = np.zeros(nbins, dtype=np.uint32)
+        self.global_noans = 0
+        self.prefix_hist = {}          # prefix -> np.uint32[nbins]
+        self.prefix_noans = {}
+        # per nomor (kolom NumPy, tumbuh 2x)
+        self.slots = {}
+        self.n_ans = np.zeros(1024, dtype=np.uint16)
+        self.n_noans = np.zeros(1024, dtype=np.uint16)
+        self.ans_max = np.zeros(1024, dtype=np.uint8)
+        # penghematan vs timeout tetap
+        self.legs = 0
+        self.shortened = 0
+        self.timeouts = 0
+        self.saved_sec = 0.0
+        self.timeout_sum = 0.0
+        self.explored = 0
+        if state_file:
+            self.load()
+
+    # ---------------- kunci ----------------
+    def _prefix(self, number):
+        digits = number[1:] if number[:1] == "+" else number
+        return digits[:self.prefix_digits]
+
+    def _slot(self, number):
+        idx = self.slots.get(number)
+        if idx is None:
+            idx = len(self.slots)
+            if idx >= len(self.n_ans):
+                grow = len(self.n_ans)
+                self.n_ans = np.concatenate((self.n_ans, np.zeros(grow, dtype=np.uint16)))
+                self.n_noans = np.concatenate((self.n_noans, np.zeros(grow, dtype=np.uint16)))
+                self.ans_max = np.concatenate((self.ans_max, np.zeros(grow, dtype=np.uint8)))
+            self.slots[number] = idx
+        return idx
+
+    # ---------------- pemilihan timeout ----------------
+    def _hist_quantile(self, hist):
+        total = int(hist.sum())
+        if total < self.min_samples:
+            return None
+        return int(np.searchsorted(np.cumsum(hist), self.quantile * total)) + 1
+
+    def timeout_for(self, number, default=None):
+        """Ring timeout (detik) untuk nomor ini."""
+        default = self.max_sec if default is None else default
+        if self.explore and random.random() < self.explore:
+            return float(default)
+        with self.lock:
+            hist = self.prefix_hist.get(self._prefix(number))
+            q = self._hist_quantile(hist) if hist is not None else None
+            if q is None:
+                q = self._hist_quantile(self.global_hist)
+            if q is None:
+                return default
+            t = q + self.margin_sec
+            idx = self.slots.get(number)
+            if idx is not None and self.n_ans[idx]:
+                t = max(t, int(self.ans_max[idx]) + self.margin_sec)
+        return float(min(default, max(self.min_sec, t)))
+
+    # ---------------- pencatatan ----------------
+    def record(self, number, answer_sec=None, timeout_used=None, timeout_full=None):
+        """
+        Satu leg selesai. answer_sec = detik sampai 200 OK (None = tidak terjawab sampai timeout).
+        timeout_used/timeout_full untuk menghitung detik yang dihemat; leg dengan
+        timeout_used < timeout_full tersensor dan tidak masuk histogram (hanya statistik nomor).
+        """
+        prefix = self._prefix(number)
+        censored = timeout_used is not None and timeout_full is not None and timeout_used < timeout_full
+        with self.lock:
+            hist = self.prefix_hist.get(prefix)
+            if hist is None:
+                hist = self.prefix_hist[prefix] = np.zeros(self.max_sec + 1, dtype=np.uint32)
+            idx = self._slot(number)
+            if answer_sec is not None:
+                b = min(self.max_sec, max(0, int(answer_sec)))
+                if not censored:
+                    hist[b] += 1
+                    self.global_hist[b] += 1
+                self.n_ans[idx] = min(65535, int(self.n_ans[idx]) + 1)
+                self.ans_max[idx] = max(int(self.ans_max[idx]), b)
+            else:
+                if not censored:
+                    self.prefix_noans[prefix] = self.prefix_noans.get(prefix, 0) + 1
+                    self.global_noans += 1
+                self.n_noans[idx] = min(65535, int(self.n_noans[idx]) + 1)
+            if timeout_used is not None:
+                self.legs += 1
+                self.timeout_sum += timeout_used
+                if timeout_full is not None and timeout_used >= timeout_full:
+                    self.explored += 1
+                if censored:
+                    self.shortened += 1
+                    if answer_sec is None:
+                        self.timeouts += 1
+                        self.saved_sec += timeout_full - timeout_used
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "numbers": len(self.slots),
+                "prefixes": len(self.prefix_hist),
+                "answers": int(self.global_hist.sum()),
+                "no_answers": self.global_noans,
+                "global_quantile_sec": self._hist_quantile(self.global_hist),
+                "legs": self.legs,
+                "mean_timeout_sec": round(self.timeout_sum / self.legs, 1) if self.legs else None,
+                "shortened": self.shortened,
+                "full_timeout_legs": self.explored,
+                "timeouts_shortened": self.timeouts,
+                "saved_sec": round(self.saved_sec, 1),
+            }
+
+    # ---------------- persistensi ----------------
+    def save(self):
+        if not self.state_file:
+            return
+        with self.lock:
+            n = len(self.slots)
+            prefixes = list(self.prefix_hist)
+            data = {
+                "numbers": np.array(list(self.slots), dtype="U20"),
+                "n_ans": self.n_ans[:n], "n_noans": self.n_noans[:n], "ans_max": self.ans_max[:n],
+                "prefixes": np.array(prefixes, dtype="U20"),
+                "prefix_hist": (np.stack([self.prefix_hist[p] for p in prefixes]) if prefixes
+                                else np.zeros((0, self.max_sec + 1), dtype=np.uint32)),
+                "prefix_noans": np.array([self.prefix_noans.get(p, 0) for p in prefixes], dtype=np.uint32),
+                "global_hist": self.global_hist,
+                "global_noans": np.array(self.global_noans),
+            }
+        tmp = self.state_file + ".tmp.npz"
+        np.savez(tmp, **data)
+        os.replace(tmp, self.state_file)
+
+    def load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            d = np.load(self.state_file)
+            if d["global_hist"].shape[0] != self.max_sec + 1:
+                print("[RING] state_file beda max_sec, diabaikan")
+                return
+            with self.lock:
+                numbers = [str(x) for x in d["numbers"]]
+                self.slots = {num: i for i, num in enumerate(numbers)}
+                cap = max(1024, len(numbers) * 2)
+                for name, dtype in (("n_ans", np.uint16), ("n_noans", np.uint16), ("ans_max", np.uint8)):
+                    arr = np.zeros(cap, dtype=dtype)
+                    arr[:len(numbers)] = d[name]
+                    setattr(self, name, arr)
+                for p, h, na in zip(d["prefixes"], d["prefix_hist"], d["prefix_noans"]):
+                    self.prefix_hist[str(p)] = h.astype(np.uint32)
+                    self.prefix_noans[str(p)] = int(na)
+                self.global_hist = d["global_hist"].astype(np.uint32)
+                self.global_noans = int(d["global_noans"])
+            print(f"[RING] statistik {len(numbers)} nomor dimuat dari {self.state_file}")
+        except Exception as e:
+            print(f"[RING] gagal memuat {self.state_file}: {e}")
@@ -8,6 +8,8 @@ import requests
 # ==== PJSIP (pjsua) ====
 import pjsua as pj
 
+from timer_service import TimerService
+
 # ======================= Konfigurasi =======================
 PORT = 7000
 RING_TIMEOUT_SEC = 45
@@ -40,6 +42,9 @@ call_status = {
 pause_event = threading.Event()   # set() -> jalan; clear() -> pause
 stop_event = threading.Event()    # set() -> stop
 
+# Satu thread timer (jam monotonic) untuk semua ring timeout
+timers = TimerService()
+
 # ===========================================================
 #                 PJSIP: Library & Account
 # ===========================================================
@@ -51,10 +56,11 @@ def _log_cb(level, s, length):
 
 class _CallCb(pj.CallCallback):
     """Callback panggilan outgoing; akan diberi call oleh PJSIP."""
-    def __init__(self, answered_event, disconnected_event):
+    def __init__(self, answered_event, disconnected_event, wake=None):
         super().__init__()
         self.answered_event = answered_event
         self.disconnected_event = disconnected_event
+        self.wake = wake            # dibangunkan saat CONFIRMED/DISCONNECTED
         self.confirmed = False
         self.last_reason = ""
 
@@ -69,6 +75,8 @@ class _CallCb(pj.CallCallback):
             self.last_reason = ci.last_reason or ""
             if not self.disconnected_event.is_set():
                 self.disconnected_event.set()
+        if self.wake is not None and (self.confirmed or ci.state == pj.CallState.DISCONNECTED):
+            self.wake.set()
 
 class SipManager:
     def __init__(self):
@@ -115,8 +123,8 @@ class SipManager:
             self.acc_user = username
             self.acc_pass = password
             # tunggu register (maks 5 detik)
-            t0 = time.time()
-            while time.time() - t0 < 5:
+            t0 = time.monotonic()
+            while time.monotonic() - t0 < 5:
                 if self.acc.info().reg_status == 200:
                     print(f"[PJSIP] Registered as {username}")
                     return
@@ -136,19 +144,15 @@ class SipManager:
         answered_evt = threading.Event()
         disconnected_evt = threading.Event()
 
-        cb = _CallCb(answered_evt, disconnected_evt)
+        wake = threading.Event()
+        cb = _CallCb(answered_evt, disconnected_evt, wake)
         call = self.acc.make_call(uri, cb)
 
-        # Tunggu answered atau timeout/disconnect
-        t0 = time.time()
-        answered = False
-        while time.time() - t0 < ring_timeout_sec:
-            if answered_evt.is_set():
-                answered = True
-                break
-            if disconnected_evt.is_set():
-                break
-            time.sleep(0.2)
+        # Tunggu answered atau timeout/disconnect (deadline di timer service, tanpa polling)
+        deadline = timers.call_later(ring_timeout_sec, wake.set)
+        wake.wait(ring_timeout_sec + 5)
+        deadline.cancel()
+        answered = answered_evt.is_set()
 
         detail = "timeout"
         if answered and agent_user:
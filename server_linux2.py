@@ -1,34 +1,201 @@
 #!/usr/bin/env python3
+import itertools
+import os
+import tempfile
 import threading
 import time
-from queue import Queue, Empty
+from queue import Empty
 from collections import deque
-from flask import Flask, jsonify, request as flask_request
+from flask import Flask, Response, jsonify, request as flask_request
 import requests
 
 # ==== PJSIP (pjsua) ====
-import pjsua as pj
+# PJSUA_BACKEND=sim -> pjsua_sim (tanpa binding native / trunk, untuk simulasi & load test)
+PJSUA_BACKEND = os.environ.get("PJSUA_BACKEND", "pjsua")
+if PJSUA_BACKEND == "sim":
+    import pjsua_sim as pj
+else:
+    import pjsua as pj
+
+from phone_norm import normalize_number, normalize_rows, dial_string, cache_info as phone_cache_info, DIAL_NATIONAL
+from sip_outcome import CallOutcome, classify, is_hard_failure
+from retry_scheduler import RetryScheduler, split_callbacks
+from timer_service import TimerService
+from call_session import CallSession, CallRegistry, CALLING, EARLY, CONNECTING, CONFIRMED, DISCONNECTED
+from dialer_shards import ShardSupervisor, ShardLink, is_shard_child, RESPAWN_DELAY_SEC
+from trunk_limiter import TrunkLimiter
+from trunks import TrunkTable, load_trunks
+from prefix_routes import PrefixRouter
+from amd import AmdDetector, WavTail, MACHINE as AMD_MACHINE
+from ring_stats import RingStats
+from best_time import BestTimeModel
+from dial_queue import DialQueue
+from cdr_store import CdrWriter, session_record, csv_chunks, gzip_chunks
+from cdr_stats import CdrStats
+from calling_window import CallingWindows, explicit_zone, zone_for_row, zone_for_number
+from metrics import Registry, render as render_metrics
+from tracing import Tracer, chrome_events, timeline, waterfall
+from pjsip_log import PjsipLog, tail_file
+from callback_queue import CallbackQueue
 
 # ======================= Konfigurasi =======================
-PORT = 7000
+PORT = int(os.environ.get("DIALER_PORT", "7000"))
 RING_TIMEOUT_SEC = 45
-RETRY_GAP_SEC = 4
+RETRY_GAP_SEC = float(os.environ.get("RETRY_GAP_SEC", "4"))   # jeda antar leg/row (load test simulasi: 0)
+
+# Fase ringing leg nasabah/EC: putus lebih awal daripada menunggu RING_TIMEOUT_SEC penuh
+NO_RING_TIMEOUT_SEC = 15        # belum ada 180/183/early media setelah X detik -> dianggap tidak aktif
+EARLY_MEDIA_ABANDON_SEC = None  # early media tanpa 180 selama X detik -> dianggap pengumuman operator
+                                # ("nomor tidak aktif"); None = mati, karena sebagian operator memutar
+                                # nada sambung (RBT) lewat 183 juga
+
+# Ring timeout adaptif (ring_stats.py): kuantil waktu jawab per prefix / nomor, maks RING_TIMEOUT_SEC
+ADAPTIVE_RING_TIMEOUT = True
+RING_TIMEOUT_MIN_SEC = 20
+RING_TIMEOUT_QUANTILE = 0.95
+RING_TIMEOUT_MARGIN_SEC = 2
+RING_STATS_MIN_SAMPLES = 30     # jawaban minimum sebelum kuantil dipakai (sebelumnya RING_TIMEOUT_SEC)
+RING_TIMEOUT_EXPLORE = 0.1      # porsi leg tetap memakai timeout penuh (sampel tak tersensor untuk kuantil)
+RING_STATS_FILE = None          # mis. "ring_stats.npz" agar statistik selamat saat restart
+RING_STATS_SAVE_SEC = 60
+
+# Jam terbaik menelepon (best_time.py): peluang jawab per nomor per jam dari histori,
+# antrian yang menunggu diurutkan ulang berkala agar nasabah ditelepon di jam paling mungkin menjawab
+BEST_TIME_RERANK = True
+BEST_TIME_RERANK_SEC = 300
+BEST_TIME_PRIOR_WEIGHT = 4.0    # bobot prior global per jam untuk nomor dengan histori sedikit
+BEST_TIME_FILE = None           # mis. "best_time.npz"
+BEST_TIME_SAVE_SEC = 300
+
+# Jendela jam telepon per zona waktu nasabah (calling_window.py): row dikelompokkan per zona
+# (field TIMEZONE_FIELD atau prefix kode area), worker hanya mengambil dari zona yang sedang buka
+CALLING_WINDOW_ENABLED = os.environ.get("CALLING_WINDOW", "1") == "1"
+CALLING_WINDOW = ("08:00", "20:00")     # jam lokal nasabah
+CALLING_DAYS = (0, 1, 2, 3, 4, 5)       # Senin-Sabtu (0 = Senin)
+TIMEZONE_FIELD = "timezone"             # "WIB" / "WITA" / "WIT"
+DEFAULT_TIMEZONE = "WIB"                # nomor seluler tidak geografis
+
+# CDR per leg (cdr_store.py): kolumnar append-only, di-flush thread sendiri
+CDR_DIR = os.environ.get("CDR_DIR", "cdr")     # kosong = CDR mati
+CDR_FLUSH_SEC = 1.0
+CDR_STATS_BUCKET_SEC = 3600     # /api/stats: agregat per bucket; bucket yang sudah tutup di-cache
+CDR_MAX_CALL_SEC = 3600         # durasi panggilan terpanjang yang diperhitungkan sebelum bucket di-cache
+CDR_STATS_MAX_DAYS = 92         # rentang maksimum satu query /api/stats
+CDR_EXPORT_CHUNK = 8192         # /export/cdr.csv: record per potongan yang di-stream
+TRACE_MAX_SPANS = 20000         # ring buffer span (/debug/trace/<row_id>)
+TRACE_FILE = os.environ.get("DIALER_TRACE_FILE")    # ekspor format Chrome trace; None = mati
+TRACE_EXPORT_SEC = 2.0
+
+# Log PJSIP: callback hanya append ke ring; file ditulis per batch oleh thread sendiri
+PJSIP_LOG_LEVEL = 2
+PJSIP_LOG_FILE = os.environ.get("PJSIP_LOG_FILE", "pjsip.log")  # kosong = hanya ring (/debug/pjsip-log)
+PJSIP_LOG_MAX_BYTES = 20 * 1024 * 1024  # rotasi: pjsip.log.1 .. .N
+PJSIP_LOG_BACKUPS = 5
+PJSIP_LOG_RING = 5000
+PJSIP_LOG_RATE = 200                    # baris/detik per modul (level >= 2); error selalu lolos
+PJSIP_LOG_MODULE_RATES = {}             # override per modul, mis. {"pjsua_media.c": 20}
+PJSIP_LOG_SAMPLE = {}                   # simpan 1 dari N baris, mis. {"sip_endpoint.c": 10}
+PJSIP_LOG_CONSOLE = False               # juga cetak ke stdout (dari thread writer)
+
+# Mode bridge: "agent_first" = agent ditelepon dulu lalu nasabah (agent mendengar ringback);
+# "peer_first" = nasabah dulu, agent baru ditelepon setelah nasabah menjawab
+BRIDGE_MODE = os.environ.get("BRIDGE_MODE", "agent_first")
+AGENT_ANSWER_TIMEOUT_SEC = 15   # peer_first: batas tunggu agent menjawab
+PEER_HOLD_WAV = None            # peer_first: wav diputar ke nasabah selama agent dipanggil
+
+# AMD: audio nasabah di-tap (recorder conf_slot) beberapa detik setelah CONFIRMED,
+# agent hanya di-bridge jika terdeteksi manusia (atau belum pasti)
+AMD_ENABLED = os.environ.get("AMD_ENABLED", "0") == "1"
+AMD_MAX_SEC = 3.5               # jendela analisis maksimum
+AMD_POLL_SEC = 0.2              # interval baca audio rekaman
+AMD_TMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
 CLIENT_PORT_DEFAULT = 6000
 
 # SIP server (Sesuai konfig kamu)
 SIP_DOMAIN = "ld.infin8link.com"
-SIP_HOSTPORT = "ld.infin8link.com:7060"  # <- penting: 7060
-SIP_REG_URI = f"sip:{SIP_HOSTPORT}"      # REGISTER ke host:port di atas
 
-# Polling step
-DIAL_WAIT_STEP = 0.1
+# Tabel trunk: akun SIP didaftarkan ke setiap trunk aktif, leg dirutekan berbobot
+# (connect rate & RTT probe OPTIONS), trunk yang down dilewati otomatis
+TRUNKS = [
+    {"name": "infin8-7060", "hostport": "ld.infin8link.com:7060", "transport": "udp", "weight": 1.0},
+    {"name": "infin8-6070", "hostport": "ld.infin8link.com:6070", "transport": "udp", "weight": 1.0,
+     "enabled": False},
+]
+TRUNKS_FILE = os.environ.get("TRUNKS_FILE")  # JSON list format sama; menggantikan TRUNKS
+AGENT_TRUNK = None              # nama trunk khusus leg agent (None = ikut routing)
+TRUNK_PROBE_SEC = 10            # interval probe OPTIONS
+TRUNK_PROBE_TIMEOUT_SEC = 2
+TRUNK_FAILOVER_MAX = 2          # leg yang ditolak trunk (5xx) dicoba di trunk lain, maks N trunk
+
+# Routing per prefix nomor (lihat prefix_routes.py): trunk pilihan, suffix dial, pool concurrency
+PREFIX_ROUTES_FILE = os.environ.get("PREFIX_ROUTES_FILE")   # mis. "routes.json"; kosong = tanpa routing prefix
+PREFIX_ROUTES_RELOAD_SEC = 5    # cek perubahan file; tabel baru dipakai tanpa menghentikan dialer
+
+# Format nomor ke trunk (nomor di queue selalu E.164 hasil normalisasi)
+DIAL_NUMBER_FORMAT = DIAL_NATIONAL
+PHONE_FIELDS = ("phone", "ec_phone_1", "ec_phone_2")
+
+# Jadwal ulang berdasarkan outcome SIP
+BUSY_REQUEUE_SEC = 300          # nasabah sibuk (486) -> coba lagi 5 menit kemudian
+BUSY_REQUEUE_MAX = 3            # maksimal requeue karena sibuk per row
+CONGESTION_BACKOFF_MAX_SEC = 60 # batas backoff saat trunk 503
+
+# Retry nasabah yang belum terjawab (lewat timer wheel, bukan sleep)
+RETRY_SPACING_SEC = (900, 1800, 3600)   # jarak retry ke-1, ke-2, ke-3+
+RETRY_MAX_PER_DAY = 3                   # maks percobaan per row per hari
+RETRY_MAX_TOTAL = 9                     # maks retry total per row
+RETRY_DAY_START_HOUR = 8                # jatah habis -> lanjut besok jam 08:00
+RETRY_STATE_FILE = None                 # mis. "retry_schedule.json" agar jadwal selamat saat restart
+RETRY_STATE_SAVE_SEC = 10               # interval simpan jadwal retry (thread terpisah, bukan thread timer)
+
+# Pembatas INVITE per trunk (token bucket CPS + AIMD concurrency)
+TRUNK_CPS = float(os.environ.get("TRUNK_CPS", "5"))    # maks INVITE per detik ke trunk (dibagi rata antar shard)
+TRUNK_BURST = int(os.environ.get("TRUNK_BURST", "5"))
+TRUNK_MIN_CONCURRENCY = 2
+TRUNK_MAX_CONCURRENCY = 30
+TRUNK_INITIAL_CONCURRENCY = 10
+
+# Mode sharded: 0 = dialer di proses ini (default); N = N proses dialer terpisah
+DIALER_SHARDS = int(os.environ.get("DIALER_SHARDS", "0"))
+SHARD_SIP_PORT_BASE = 5080              # shard i pakai port SIP 5080+i (UDP & TCP)
+SHARD_STATUS_SEC = 0.5                  # interval kirim status shard -> supervisor
+
+# Mode cluster: isi URL koordinator (cluster_coordinator.py) agar node me-lease row dari antrian bersama
+CLUSTER_COORDINATOR = os.environ.get("CLUSTER_COORDINATOR")   # mis. "http://127.0.0.1:7100"
+NODE_ID = os.environ.get("NODE_ID") or f"node-{PORT}"
+NODE_URL = os.environ.get("NODE_URL") or f"http://127.0.0.1:{PORT}"
+CLUSTER_SYNC_SEC = 1.0                  # interval heartbeat + lease
+CLUSTER_PREFETCH = 1                    # row yang di-lease per worker (per shard)
 # ===========================================================
 
 app = Flask(__name__)
 
 # ======= State global =======
 connected_clients = set()    # contoh: "http://192.168.88.201:6000"
-call_queue = Queue()
+calling_windows = (CallingWindows(CALLING_WINDOW[0], CALLING_WINDOW[1], CALLING_DAYS)
+                   if CALLING_WINDOW_ENABLED else None)
+
+def row_zone(row):
+    return zone_for_row(row, TIMEZONE_FIELD, "phone", DEFAULT_TIMEZONE)
+
+def new_dial_queue():
+    if calling_windows is None:
+        return DialQueue()
+    return DialQueue(bucket_of=row_zone, windows=calling_windows)
+
+row_zones = {}              # row_id -> zona eksplisit row (TIMEZONE_FIELD) selama row dikerjakan worker
+
+def number_zone(number, row_id=None):
+    """Zona satu leg: zona eksplisit row (sama dengan bucket antrian), selain itu kode area nomor."""
+    return row_zones.get(row_id) or zone_for_number(number, DEFAULT_TIMEZONE)
+
+def local_hour_for(number, row_id=None):
+    """Jam lokal nasabah, None = jam server."""
+    if calling_windows is None:
+        return None
+    return calling_windows.local_hour(number_zone(number, row_id))
+
+call_queue = new_dial_queue()
 state_lock = threading.Lock()
 
 call_status = {
@@ -38,6 +205,8 @@ call_status = {
     "in_progress": None,   # dict info item berjalan
     "processed": 0,
     "queued": 0,
+    "rejected": 0,         # row ditolak saat ingestion (tidak ada nomor valid)
+    "requeued": 0,         # row dijadwalkan ulang (sibuk / tidak terjawab / callback)
     "active_sip_user": None
 }
 
@@ -51,14 +220,97 @@ events_buf = deque(maxlen=EVENT_MAX)  # simpan dict event
 event_lock = threading.Lock()
 event_seq = 0
 
+# ======= Metrics (/metrics, format teks Prometheus) =======
+# sel per thread (metrics.py): observe/inc tanpa lock, aman dibiarkan nyala di produksi
+metrics = Registry()
+m_legs = metrics.counter("dialer_legs_total", "Leg selesai per jenis leg dan outcome", ("leg", "outcome"))
+m_rows = metrics.counter("dialer_rows_total", "Row selesai dikerjakan worker")
+m_pdd = metrics.histogram("dialer_post_dial_delay_seconds",
+                          "INVITE -> 180/183/early media pertama (leg nasabah / EC)",
+                          (0.25, 0.5, 1, 2, 3, 5, 8, 13, 20), ("leg",))
+m_ring = metrics.histogram("dialer_ring_seconds", "INVITE -> 200 OK leg nasabah / EC yang terjawab",
+                           (1, 2, 5, 10, 15, 20, 25, 30, 40, 60), ("leg",))
+m_agent_answer = metrics.histogram("dialer_agent_answer_seconds", "INVITE -> 200 OK leg agent",
+                                   (0.25, 0.5, 1, 2, 3, 5, 8, 13, 20))
+m_bridge = metrics.histogram("dialer_bridge_setup_seconds", "200 OK leg terakhir -> media di-bridge",
+                             (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+m_broadcast = metrics.histogram("dialer_broadcast_seconds", "Latensi POST broadcast ke satu client",
+                                (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5), ("path",))
+m_callback_lag = metrics.histogram("dialer_callback_lag_seconds", "Callback PJSIP -> diproses thread consumer",
+                                   (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5))
+m_broadcast_errors = metrics.counter("dialer_broadcast_errors_total", "POST broadcast gagal (client dibuang)")
+metrics.gauge("dialer_active_legs", "Leg SIP yang sedang hidup",
+              lambda: sip.calls.snapshot_counts().get("active") if sip is not None else None)
+metrics.gauge("dialer_callback_queue_depth", "Perubahan state PJSIP yang belum diproses consumer",
+              lambda: sip.callbacks.q.qsize() if sip is not None else None)
+metrics.gauge("dialer_registered_accounts", "Akun SIP terdaftar (per trunk)",
+              lambda: len(sip.accs) if sip is not None else None)
+metrics.gauge("dialer_event_buffer_fill_ratio", "Isi buffer event / EVENT_MAX",
+              lambda: len(events_buf) / EVENT_MAX if _shard_link is None else None)
+metrics.gauge("dialer_queue_depth", "Row menunggu di call_queue per bucket zona waktu",
+              lambda: {(b["bucket"] or "",): b["size"] for b in call_queue.buckets_snapshot()}, ("bucket",))
+
+# ======= Tracing span per row (/debug/trace/<row_id>) =======
+# proses shard meneruskan span ke supervisor; ekspor file hanya di supervisor / proses tunggal
+tracer = Tracer(TRACE_MAX_SPANS, export_file=None if is_shard_child() else TRACE_FILE,
+                forward=is_shard_child())
+
+def trace_leg(sess, outcome, trunk=None):
+    """Leg selesai -> span leg (INVITE -> BYE) + span teardown (hangup -> DISCONNECTED)."""
+    end = sess.t_bye or time.time()
+    t0 = sess.t_invite or end
+
+    def rel(t):
+        return None if t is None else round((t - t0) * 1000, 1)
+
+    tracer.record(f"{sess.leg}_leg", t0, end, row_id=sess.row_id, call_id=sess.sip_call_id,
+                  number=sess.number, trunk=trunk, code=sess.code, outcome=outcome.value,
+                  ms_180=rel(sess.t_180), ms_183=rel(sess.t_183), ms_media=rel(sess.t_media),
+                  ms_200=rel(sess.t_200), ms_bridge=rel(sess.t_bridge))
+    tracer.record("teardown", min(sess.t_hangup or end, end), end, row_id=sess.row_id, call_id=sess.sip_call_id,
+                  leg=sess.leg, by="dialer" if sess.t_hangup is not None else "remote", reason=sess.reason)
+
+def observe_leg(sess, outcome):
+    """Leg selesai -> counter outcome + histogram fase dial (dipanggil dari on_state DISCONNECTED)."""
+    m_legs.inc(leg=sess.leg, outcome=outcome.value)
+    t0 = sess.t_invite
+    if t0 is None:
+        return
+    if sess.leg == "agent":
+        if sess.t_200 is not None:
+            m_agent_answer.observe(sess.t_200 - t0)
+        return
+    first = [t for t in (sess.t_180, sess.t_183, sess.t_media) if t is not None]
+    if first:
+        m_pdd.observe(min(first) - t0, leg=sess.leg)
+    if sess.t_200 is not None:
+        m_ring.observe(sess.t_200 - t0, leg=sess.leg)
+
+# ======= Sharding =======
+_shard_link = None     # diisi di proses shard (pipe ke supervisor)
+shards = None          # ShardSupervisor di proses supervisor
+shard_status = {}      # idx -> status terakhir dari shard
+shard_rows = {}        # idx -> {row_id: row} yang dikirim ke shard dan belum "done"
+shard_rows_lock = threading.Lock()
+
+# ======= Cluster =======
+_cluster_outbox = deque(maxlen=EVENT_MAX)   # event yang belum dikirim ke koordinator
+_held_rows = set()                          # row_id hasil lease yang belum selesai
+_held_lock = threading.Lock()
+
 def broadcast_to_clients(path, payload):
     dead = []
     for base in list(connected_clients):
         url = f"{base}{path}"
-        try:
-            requests.post(url, json=payload, timeout=2.5)
-        except Exception:
-            dead.append(base)
+        t0 = time.perf_counter()
+        with tracer.span("broadcast", path=path, client=base) as span:
+            try:
+                requests.post(url, json=payload, timeout=2.5)
+            except Exception as e:
+                dead.append(base)
+                m_broadcast_errors.inc()
+                span["error"] = str(e)[:120]
+        m_broadcast.observe(time.perf_counter() - t0, path=path)
     for d in dead:
         connected_clients.discard(d)
 
@@ -68,12 +320,19 @@ def publish_event(ev: dict, also_broadcast=True):
     ev: { "type": "...", "payload": {...} }
     """
     global event_seq
+    if _shard_link is not None:
+        # proses shard: event diteruskan ke supervisor (buffer & broadcast ada di sana)
+        _shard_link.send("event", ev, also_broadcast, tracer.current_row())
+        return ev
     with event_lock:
         event_seq += 1
         ev_out = dict(ev)
         ev_out["event_id"] = event_seq
         ev_out["ts"] = time.time()
         events_buf.append(ev_out)
+    if CLUSTER_COORDINATOR:
+        _cluster_outbox.append({"ev": ev_out, "also_broadcast": also_broadcast})
+        also_broadcast = False     # broadcast ke client dilakukan koordinator
     if also_broadcast:
         try:
             broadcast_to_clients("/receive-info", ev.get("payload", ev))
@@ -81,8 +340,8 @@ def publish_event(ev: dict, also_broadcast=True):
             pass
     return ev_out
 
-def make_progress_payload(item, phase, number, answered, detail):
-    return {
+def make_progress_payload(item, phase, number, answered, detail, outcome=None):
+    payload = {
         # progress payload TIDAK berisi kredensial user agar client tidak overwrite kartu staff
         "user": {"username": "worker"},
         "data": [],  # jangan kirim batch di progress agar tabel tidak ke-refresh
@@ -93,15 +352,30 @@ def make_progress_payload(item, phase, number, answered, detail):
             "detail": detail
         }
     }
+    if outcome is not None:
+        payload["progress"]["outcome"] = outcome.value
+    return payload
 
 # ===========================================================
 #                 PJSIP: Library & Account
 # ===========================================================
+pjsip_log = None    # PjsipLog; dibuat saat inisialisasi proses dialer
+
+def pjsip_log_path(shard=None):
+    if not PJSIP_LOG_FILE or shard is None:
+        return PJSIP_LOG_FILE or None
+    base, ext = os.path.splitext(PJSIP_LOG_FILE)
+    return f"{base}-shard{shard}{ext}"
+
+def new_pjsip_log(shard=None):
+    return PjsipLog(pjsip_log_path(shard), ring=PJSIP_LOG_RING, rate=PJSIP_LOG_RATE,
+                    module_rates=PJSIP_LOG_MODULE_RATES, sample=PJSIP_LOG_SAMPLE,
+                    max_bytes=PJSIP_LOG_MAX_BYTES, backups=PJSIP_LOG_BACKUPS, console=PJSIP_LOG_CONSOLE)
+
 def _log_cb(level, s, length):
-    try:
-        print(s.strip())
-    except Exception:
-        pass
+    # jalan di thread PJSIP (signalling / media): tanpa I/O, tanpa blok
+    if pjsip_log is not None:
+        pjsip_log.write(level, s)
 
 def _register_pj_thread(name="worker"):
     """Wajib dipanggil di setiap thread non-utama yang menyentuh PJLIB/PJSUA."""
@@ -110,99 +384,458 @@ def _register_pj_thread(name="worker"):
     except Exception:
         pass
 
+# Satu thread timer (jam monotonic) untuk semua ring timeout, jeda & tick scheduler
+timers = TimerService(on_thread_start=lambda: _register_pj_thread("timer-service"))
+
+# Event tunggu yang sedang aktif (leg / jeda); STOP membangunkan semuanya
+_waits = set()
+_waits_lock = threading.Lock()
+
+def _new_wait():
+    ev = threading.Event()
+    with _waits_lock:
+        _waits.add(ev)
+    # STOP yang datang sebelum ev terdaftar sudah lewat wake_all_waits(): bangunkan sendiri
+    if stop_event.is_set():
+        ev.set()
+    return ev
+
+def _drop_wait(ev):
+    with _waits_lock:
+        _waits.discard(ev)
+
+def wake_all_waits():
+    with _waits_lock:
+        for ev in _waits:
+            ev.set()
+
+def gap_wait(sec):
+    """Jeda antar panggilan lewat timer service; langsung bangun saat STOP."""
+    if sec <= 0 or stop_event.is_set():
+        return
+    ev = _new_wait()
+    try:
+        timers.sleep(sec, wake=ev)
+    finally:
+        _drop_wait(ev)
+
+# pj.CallState -> nama state CallSession
+_PJ_STATES = {
+    pj.CallState.CALLING: CALLING,
+    pj.CallState.EARLY: EARLY,
+    pj.CallState.CONNECTING: CONNECTING,
+    pj.CallState.CONFIRMED: CONFIRMED,
+    pj.CallState.DISCONNECTED: DISCONNECTED,
+}
+
 class _CallCb(pj.CallCallback):
     """Callback untuk setiap panggilan (agent atau nasabah)."""
-    def __init__(self, answered_event, disconnected_event):
+    def __init__(self, answered_event, disconnected_event, wake=None, session=None):
         super().__init__()
         self.answered_event = answered_event
         self.disconnected_event = disconnected_event
+        self.wake = wake            # dibangunkan saat CONFIRMED/DISCONNECTED
+        self.session = session      # CallSession leg ini (di registry sip.calls)
+        self.limiters = ()          # TrunkLimiter trunk (+ pool); slot dilepas saat DISCONNECTED
+        self.trunk = None           # Trunk yang dipakai leg ini (statistik routing)
         self.confirmed = False
         self.last_reason = ""
-
+        self.last_code = 0
+        self.on_early_media = None  # dipasang await_leg (aturan EARLY_MEDIA_ABANDON_SEC)
+        self.abandon_reason = None  # diisi jika leg diputus oleh aturan fase ringing
+        self.abandon_at = None      # detik sejak mulai menunggu
+        self.cdr_outcome = None     # outcome CDR jika bukan dari SIP code (timeout / abandon / AMD)
+        self.cdr_detail = ""
+
+    # Callback PJSIP hanya membaca info() lalu menyerahkan perubahan state ke
+    # sip.callbacks (CallbackQueue); registry, log, metrik, CDR dan wake jalan di consumer.
     def on_state(self):
         ci = self.call.info()
-        print(f"[PJSIP] Call state: {ci.state_text} | code={ci.last_code} reason={ci.last_reason}")
-        if ci.state == pj.CallState.CONFIRMED and not self.confirmed:
+        sip.callbacks.put(self._apply_state, ci.state, ci.state_text, ci.last_code, ci.last_reason or "",
+                          getattr(ci, "sip_call_id", None), time.time())
+
+    def on_media_state(self):
+        ci = self.call.info()
+        if ci.media_state == pj.MediaState.ACTIVE and self.session is not None:
+            sip.callbacks.put(self._apply_media, time.time())
+
+    def _apply_state(self, pj_state, state_text, code, reason, call_id, now):
+        if pjsip_log is not None:
+            pjsip_log.write(3, f"{time.strftime('%H:%M:%S', time.localtime(now))} call-state {state_text} | "
+                               f"code={code} reason={reason} call_id={call_id or ''}", module="call-state")
+        if self.session is not None:
+            sip.calls.set_call_id(self.session, call_id)
+            state = _PJ_STATES.get(pj_state)
+            if state is not None:
+                sip.calls.update(self.session, state, code, reason, now)
+        if pj_state == pj.CallState.CONFIRMED and not self.confirmed:
             self.confirmed = True
             if not self.answered_event.is_set():
                 self.answered_event.set()
-        if ci.state == pj.CallState.DISCONNECTED:
-            self.last_reason = ci.last_reason or ""
+        if pj_state == pj.CallState.DISCONNECTED:
+            self.last_reason = reason
+            self.last_code = code
+            leg_finished(self)
+            self.release_trunk(code)
             if not self.disconnected_event.is_set():
                 self.disconnected_event.set()
+        if self.wake is not None and (self.confirmed or pj_state == pj.CallState.DISCONNECTED):
+            self.wake.set()
+
+    def _apply_media(self, now):
+        self.session.on_media(now)
+        if not self.confirmed and self.session.early_media:
+            hook = self.on_early_media
+            if hook is not None:
+                hook()
+
+    def release_trunk(self, code=None):
+        """
+        code None = leg tidak pernah dikirim (make_call gagal): slot dilepas tanpa umpan AIMD,
+        dicatat sebagai gagal kirim untuk health trunk.
+        """
+        limiters, self.limiters = self.limiters, ()
+        for limiter in limiters:
+            limiter.release(code, answered=self.confirmed)
+        trunk, self.trunk = self.trunk, None
+        if trunk is not None:
+            trunk_table.record_result(trunk, code, answered=self.confirmed, transport_error=code is None)
+
+# ======= CDR =======
+cdr_writer = None           # CdrWriter; dibuat saat inisialisasi proses dialer
+row_campaigns = {}          # row_id -> campaign selama row dikerjakan worker
+# record ditulis saat BYE dengan ts = INVITE: bucket baru di-cache setelah leg terlama pasti tercatat
+cdr_stats = CdrStats(CDR_DIR, bucket_sec=CDR_STATS_BUCKET_SEC,
+                     grace_sec=RING_TIMEOUT_SEC + CDR_MAX_CALL_SEC + CDR_FLUSH_SEC + 5,
+                     max_buckets=CDR_STATS_MAX_DAYS * 86400 // CDR_STATS_BUCKET_SEC) if CDR_DIR else None
+
+def leg_finished(cb):
+    """Leg selesai -> metrik + satu CDR (hanya append ke deque, I/O di thread flush)."""
+    sess = cb.session
+    if sess is None:
+        return
+    if cb.cdr_outcome is not None:
+        outcome = cb.cdr_outcome
+    elif cb.confirmed:
+        outcome = CallOutcome.ANSWERED
+    else:
+        outcome = classify(cb.last_code, cb.last_reason)
+    observe_leg(sess, outcome)
+    trace_leg(sess, outcome, cb.trunk.name if cb.trunk is not None else None)
+    if cdr_writer is None:
+        return
+    cdr_writer.append(session_record(sess, cb.trunk.name if cb.trunk is not None else None,
+                                     outcome.value, cb.cdr_detail))
+
+# ======= Trunk: tabel routing + limiter per trunk =======
+trunk_table = TrunkTable(load_trunks(TRUNKS_FILE) if TRUNKS_FILE else TRUNKS)
+
+prefix_router = PrefixRouter(PREFIX_ROUTES_FILE)
+ring_stats = RingStats(max_sec=RING_TIMEOUT_SEC, min_sec=RING_TIMEOUT_MIN_SEC, quantile=RING_TIMEOUT_QUANTILE,
+                       margin_sec=RING_TIMEOUT_MARGIN_SEC, min_samples=RING_STATS_MIN_SAMPLES,
+                       explore=RING_TIMEOUT_EXPLORE,
+                       state_file=None if is_shard_child() else RING_STATS_FILE)
+best_time = BestTimeModel(prior_weight=BEST_TIME_PRIOR_WEIGHT,
+                          state_file=None if is_shard_child() else BEST_TIME_FILE)
+
+def agent_trunk():
+    return trunk_table.get(AGENT_TRUNK) if AGENT_TRUNK else None
+
+trunk_limiters = {}
+_trunk_lock = threading.Lock()
+
+def get_trunk_limiter(hostport):
+    with _trunk_lock:
+        lim = trunk_limiters.get(hostport)
+        if lim is None:
+            share = max(1, DIALER_SHARDS) if is_shard_child() else 1
+            lim = TrunkLimiter(hostport, cps=TRUNK_CPS / share, burst=max(1, TRUNK_BURST // share),
+                               min_conc=TRUNK_MIN_CONCURRENCY, max_conc=TRUNK_MAX_CONCURRENCY,
+                               initial_conc=TRUNK_INITIAL_CONCURRENCY)
+            trunk_limiters[hostport] = lim
+        return lim
+
+def get_pool_limiter(pool):
+    """Pool concurrency dari tabel prefix (mis. per operator); ukuran ikut hot reload."""
+    share = max(1, DIALER_SHARDS) if is_shard_child() else 1
+    size = max(1, int(prefix_router.index.pools.get(pool, TRUNK_MAX_CONCURRENCY)) // share)
+    key = f"pool:{pool}"
+    with _trunk_lock:
+        lim = trunk_limiters.get(key)
+        if lim is None:
+            # pool hanya membatasi concurrency (tanpa AIMD: 5xx milik trunk, bukan pool);
+            # CPS tetap diatur limiter trunk
+            lim = TrunkLimiter(key, cps=1000.0, burst=1000, min_conc=1, max_conc=size, initial_conc=size,
+                               aimd=False)
+            trunk_limiters[key] = lim
+        elif lim.max_conc != size:
+            lim.resize(size)
+        return lim
+
+def trunk_stats():
+    with _trunk_lock:
+        lims = list(trunk_limiters.values())
+    return [lim.stats() for lim in lims]
+
+# Leg yang diputus lebih awal oleh aturan fase ringing: alasan -> jumlah & detik yang dihemat
+early_abandon_stats = {}
+
+def note_early_abandon(reason, saved_sec):
+    with state_lock:
+        st = early_abandon_stats.setdefault(reason, {"count": 0, "saved_sec": 0.0})
+        st["count"] += 1
+        st["saved_sec"] += max(0.0, saved_sec)
+
+def amd_snapshot(stats):
+    return {label: {"count": v["count"],
+                    "mean_decided_sec": round(v["decided_sec"] / v["count"], 2) if v["count"] else None}
+            for label, v in stats.items()}
+
+def early_abandon_snapshot(stats):
+    out = {}
+    for reason, v in stats.items():
+        out[reason] = {"outcome": CallOutcome.UNAVAILABLE.value, "count": v["count"],
+                       "saved_sec": round(v["saved_sec"], 1),
+                       "saved_sec_per_call": round(v["saved_sec"] / v["count"], 1) if v["count"] else None}
+    return out
+
+def await_leg(call, cb, timeout_sec, wake):
+    """
+    Tunggu satu leg sampai answered / disconnected / timeout / abandoned / aborted.
+    Deadline didaftarkan ke timer service; saat kadaluarsa timer langsung hangup leg.
+    Leg nasabah/EC juga diputus lebih awal oleh aturan fase ringing (NO_RING_TIMEOUT_SEC,
+    EARLY_MEDIA_ABANDON_SEC) -> "abandoned", alasan di cb.abandon_reason.
+    Thread pemanggil hanya menunggu event (tanpa polling).
+    """
+    expired = []
+    t0 = time.monotonic()
+    sess = cb.session
+
+    def _on_expire():
+        if cb.answered_event.is_set():
+            return
+        expired.append(True)
+        cb.cdr_outcome, cb.cdr_detail = CallOutcome.NO_ANSWER, "ring_timeout"
+        try:
+            sess.hangup()
+        except Exception:
+            pass
+        wake.set()
+
+    def _abandon(reason):
+        # semua callback timer jalan di satu thread, jadi tidak balapan dengan _on_expire
+        if cb.answered_event.is_set() or cb.disconnected_event.is_set() or expired or cb.abandon_reason:
+            return
+        cb.abandon_reason = reason
+        cb.abandon_at = time.monotonic() - t0
+        cb.cdr_outcome, cb.cdr_detail = CallOutcome.UNAVAILABLE, reason
+        try:
+            sess.hangup()
+        except Exception:
+            pass
+        wake.set()
+
+    rules = [timers.call_later(timeout_sec, _on_expire)]
+    if sess is not None and sess.leg != "agent":
+        if NO_RING_TIMEOUT_SEC and NO_RING_TIMEOUT_SEC < timeout_sec:
+            rules.append(timers.call_later(
+                NO_RING_TIMEOUT_SEC, lambda: None if sess.ringing else _abandon("no_ringing")))
+        if EARLY_MEDIA_ABANDON_SEC:
+            cb.on_early_media = lambda: rules.append(timers.call_later(
+                EARLY_MEDIA_ABANDON_SEC, lambda: None if sess.t_180 is not None else _abandon("early_media")))
+    try:
+        # batas aman: kalau karena sesuatu event tidak pernah di-set
+        wake.wait(timeout_sec + 5)
+    finally:
+        cb.on_early_media = None
+        for timer in rules:
+            timer.cancel()
+        _drop_wait(wake)
+    if stop_event.is_set() and not cb.answered_event.is_set():
+        return "aborted"
+    if cb.answered_event.is_set():
+        return "answered"
+    if cb.abandon_reason:
+        note_early_abandon(cb.abandon_reason, timeout_sec - cb.abandon_at)
+        return "abandoned"
+    if expired or not cb.disconnected_event.is_set():
+        return "timeout"
+    return "disconnected"
 
 class SipManager:
-    def __init__(self):
+    def __init__(self, sip_port=0):
+        self.sip_port = sip_port
         self.lib = None
-        self.acc = None
+        self.accs = {}              # nama trunk -> pj.Account (user yang sama di semua trunk)
         self.acc_user = None
         self.acc_pass = None
         self.lock = threading.Lock()
+        # callback PJSIP -> consumer thread (callback tidak pernah menunggu registry / I/O)
+        self.callbacks = CallbackQueue(on_thread_start=lambda: _register_pj_thread("pj-callbacks"),
+                                       on_lag=m_callback_lag.observe)
         self._init_lib()
-        # tracking leg aktif
-        self.active_calls = set()
-        self.active_lock = threading.Lock()
+        # registry leg aktif (index per call id / row id / agent)
+        self.calls = CallRegistry()
 
     def _init_lib(self):
         self.lib = pj.Lib()
-        self.lib.init(log_cfg=pj.LogConfig(level=2, callback=_log_cb))
+        self.lib.init(log_cfg=pj.LogConfig(level=PJSIP_LOG_LEVEL, callback=_log_cb))
         # transport UDP & TCP
-        self.lib.create_transport(pj.TransportType.UDP, pj.TransportConfig(0))
-        self.lib.create_transport(pj.TransportType.TCP, pj.TransportConfig(0))
+        self.lib.create_transport(pj.TransportType.UDP, pj.TransportConfig(self.sip_port))
+        self.lib.create_transport(pj.TransportType.TCP, pj.TransportConfig(self.sip_port))
         self.lib.start()
         # Nonaktifkan audio device (server headless); media tetap bisa via conference port
         self.lib.set_null_snd_dev()
         print("[PJSIP] Library started (null audio).")
 
     def _destroy_acc(self):
-        if self.acc:
+        for acc in self.accs.values():
             try:
-                self.acc.delete()
+                acc.delete()
             except Exception:
                 pass
-            self.acc = None
-            self.acc_user = None
-            self.acc_pass = None
+        self.accs = {}
+        self.acc_user = None
+        self.acc_pass = None
 
     def ensure_account(self, username: str, password: str):
         # pastikan thread ini sudah terdaftar di PJLIB
         _register_pj_thread("ensure-account")
 
         with self.lock:
-            if self.acc and self.acc_user == username and self.acc_pass == password:
+            if self.accs and self.acc_user == username and self.acc_pass == password:
                 return
             self._destroy_acc()
-            cfg = pj.AccountConfig()
-            cfg.id = f"sip:{username}@{SIP_DOMAIN}"
-            cfg.reg_uri = SIP_REG_URI
-            # Penting: gunakan argumen POSISI (realm, username, passwd)
-            cfg.auth_cred = [pj.AuthCred("*", username, password)]
-            # Paksa route via transport yang kamu mau (UDP di sini)
-            cfg.proxy = [f"sip:{SIP_HOSTPORT};transport=udp"]
-
-            self.acc = self.lib.create_account(cfg)
+            for t in trunk_table.trunks:
+                if not t.enabled:
+                    continue
+                cfg = pj.AccountConfig()
+                cfg.id = f"sip:{username}@{t.domain or SIP_DOMAIN}"
+                cfg.reg_uri = f"sip:{t.hostport}"
+                # Penting: gunakan argumen POSISI (realm, username, passwd)
+                cfg.auth_cred = [pj.AuthCred("*", username, password)]
+                # Paksa route via trunk + transport-nya
+                cfg.proxy = [f"sip:{t.hostport};transport={t.transport}"]
+                self.accs[t.name] = self.lib.create_account(cfg)
             self.acc_user = username
             self.acc_pass = password
 
-            # Tunggu register (maks 5 detik)
-            t0 = time.time()
-            while time.time() - t0 < 5:
-                info = self.acc.info()
-                if info.reg_status == 200:
-                    print(f"[PJSIP] Registered as {username}")
-                    return
-                time.sleep(0.2)
-            print(f"[PJSIP] Register pending/failed: {self.acc.info().reg_status}")
-
-    def _track_call(self, call, add=True):
-        with self.active_lock:
-            if add:
-                self.active_calls.add(call)
-            else:
-                try:
-                    self.active_calls.discard(call)
-                except Exception:
-                    pass
+            # Tunggu register semua trunk (maks 5 detik total)
+            t0 = time.monotonic()
+            pending = dict(self.accs)
+            while pending and time.monotonic() - t0 < 5:
+                for name, acc in list(pending.items()):
+                    if acc.info().reg_status == 200:
+                        print(f"[PJSIP] Registered as {username} @ {name}")
+                        del pending[name]
+                if pending:
+                    time.sleep(0.2)
+            for name, acc in pending.items():
+                print(f"[PJSIP] Register pending/failed @ {name}: {acc.info().reg_status}")
+
+    def _dial(self, user_part, leg, number, row_id=None, agent=None, trunk=None, pool=None):
+        """
+        Buat 1 leg ke sip:<user_part>@<trunk> + CallSession di registry.
+        Return (call, cb, sess, wake); wake dipakai await_leg().
+        Return None jika STOP saat menunggu limiter pool / trunk.
+        """
+        trunk = trunk or trunk_table.select()
+        acc = self.accs.get(trunk.name) if trunk is not None else None
+        if acc is None:
+            raise RuntimeError(f"no account for trunk {trunk.name if trunk else None}")
+        limiters = []
+        for limiter in ((get_pool_limiter(pool),) if pool else ()) + (get_trunk_limiter(trunk.hostport),):
+            if limiter.acquire(stop_event=stop_event) is None:
+                for held in limiters:
+                    held.release()
+                return None
+            limiters.append(limiter)
+        ans = threading.Event()
+        disc = threading.Event()
+        wake = _new_wait()
+        sess = CallSession(leg, number, row_id=row_id, agent=agent)
+        sess.campaign = row_campaigns.get(row_id)
+        cb = _CallCb(ans, disc, wake, session=sess)
+        cb.limiters = limiters
+        cb.trunk = trunk
+        self.calls.add(sess)
+        self.calls.update(sess, CALLING)
+        try:
+            sess.call = acc.make_call(f"sip:{user_part}@{trunk.hostport};transport={trunk.transport}", cb)
+        except Exception:
+            self.calls.remove(sess)
+            _drop_wait(wake)
+            cb.release_trunk()
+            raise
+        return sess.call, cb, sess, wake
+
+    def _dial_leg(self, user_part, leg, number, ring_timeout_sec, row_id=None, agent=None, trunk=None,
+                  route=None):
+        """
+        Dial + tunggu satu leg (await_leg). Leg yang ditolak trunk (5xx) dicoba lagi
+        di trunk lain sampai TRUNK_FAILOVER_MAX trunk; trunk= memaksa satu trunk.
+        route (prefix_routes.Route): trunk pilihan, suffix dial dan pool concurrency.
+        Leg nasabah/EC memakai ring timeout adaptif (ring_stats) dan hasilnya dicatat.
+        Return (res, (call, cb, sess, wake)) atau ("aborted"/"no_trunk", None).
+        """
+        full_timeout = ring_timeout_sec
+        if leg != "agent" and ADAPTIVE_RING_TIMEOUT:
+            ring_timeout_sec = ring_stats.timeout_for(number, full_timeout)
+        pool = None
+        if route is not None:
+            user_part += route.suffix
+            pool = route.pool
+        t = trunk or trunk_table.select(prefer=route.trunk if route is not None else None)
+        if t is None or t.name not in self.accs:
+            return "no_trunk", None
+        tried = []
+        while True:
+            dialed = self._dial(user_part, leg, number, row_id=row_id, agent=agent, trunk=t, pool=pool)
+            if dialed is None:
+                return "aborted", None
+            call, cb, sess, wake = dialed
+            res = await_leg(call, cb, ring_timeout_sec, wake)
+            if (trunk is None and res == "disconnected" and len(tried) + 1 < TRUNK_FAILOVER_MAX
+                    and classify(cb.last_code, cb.last_reason) == CallOutcome.CONGESTION):
+                tried.append(t.name)
+                nxt = trunk_table.select(exclude=tried)
+                if nxt is not None and nxt.name in self.accs:
+                    self._track_call(sess, False)
+                    print(f"[TRUNK] {leg} {number}: {t.name} -> {cb.last_code}, failover ke {nxt.name}")
+                    publish_event({"type": "trunk",
+                                   "payload": {"failover": leg, "number": number, "from": t.name,
+                                               "to": nxt.name, "code": cb.last_code}},
+                                  also_broadcast=False)
+                    t = nxt
+                    continue
+            if leg != "agent":
+                outcome = classify(cb.last_code, cb.last_reason) if res == "disconnected" else None
+                if res == "answered":
+                    ring_stats.record(number, sess.ring_sec(), ring_timeout_sec, full_timeout)
+                elif res == "timeout":
+                    ring_stats.record(number, None, ring_timeout_sec, full_timeout)
+                elif outcome == CallOutcome.NO_ANSWER:
+                    ring_stats.record(number, None)
+                if res in ("answered", "timeout", "abandoned") or outcome in (
+                        CallOutcome.NO_ANSWER, CallOutcome.BUSY, CallOutcome.UNAVAILABLE):
+                    best_time.record(number, res == "answered", hour=local_hour_for(number, row_id))
+            return res, dialed
+
+    def _track_call(self, sess, add=True):
+        if add:
+            self.calls.add(sess)
+        else:
+            self.calls.remove(sess)
+
+    def hangup_row(self, row_id):
+        """Putuskan semua leg milik satu row. Return jumlah leg."""
+        legs = self.calls.for_row(row_id)
+        for sess in legs:
+            try:
+                sess.hangup()
+            except Exception:
+                pass
+        return len(legs)
 
     def hangup_all(self):
         """Putuskan semua leg aktif segera (untuk STOP total)."""
@@ -211,100 +844,284 @@ class SipManager:
                 self.lib.hangup_all()
         except Exception:
             pass
-        with self.active_lock:
-            for c in list(self.active_calls):
-                try:
-                    c.hangup()
-                except Exception:
-                    pass
-            self.active_calls.clear()
+        for sess in self.calls.all():
+            try:
+                sess.hangup()
+            except Exception:
+                pass
+            self.calls.remove(sess)
 
     # -------------------- 3PCC Bridge --------------------
-    def bridge_agent_with_peer(self, agent_user: str, peer_number: str, ring_timeout_sec: int):
+    def bridge_agent_with_peer(self, agent_user: str, peer_number: str, ring_timeout_sec: int, row_id=None):
         """
         3PCC:
-          1) Panggil Agent (sip:<agent_user>@HOSTPORT;transport=udp) -> tunggu jawab
-          2) Panggil Peer (sip:<peer_number>@HOSTPORT;transport=udp) -> tunggu jawab
+          1) Panggil Agent (sip:<agent_user>@<trunk>) -> tunggu jawab
+          2) Panggil Peer (sip:<peer_number>@<trunk>) -> tunggu jawab (failover trunk jika 5xx)
           3) Hubungkan conf_slot keduanya (dua arah)
         Hormati stop_event: jika STOP, hangup semua dan return aborted.
         """
         _register_pj_thread("bridge-3pcc")
-        if not self.acc:
+        if not self.accs:
             return {"ok": False, "reason": "no_account"}
 
         # --- 1) Call agent ---
-        agent_uri = f"sip:{agent_user}@{SIP_HOSTPORT};transport=udp"
-        a_ans = threading.Event()
-        a_disc = threading.Event()
-        a_cb = _CallCb(a_ans, a_disc)
-        a_call = self.acc.make_call(agent_uri, a_cb)
-        self._track_call(a_call, True)
-
-        t0 = time.time()
-        while time.time() - t0 < ring_timeout_sec:
-            if stop_event.is_set():
-                self.hangup_all()
-                return {"ok": False, "reason": "aborted"}
-            if a_ans.is_set():
-                break
-            if a_disc.is_set():
-                return {"ok": False, "reason": "agent_disconnected"}
-            time.sleep(DIAL_WAIT_STEP)
-        if not a_ans.is_set():
-            self._track_call(a_call, False)
-            try: a_call.hangup()
-            except: pass
-            return {"ok": False, "reason": "agent_no_answer"}
+        res, leg = self._dial_leg(agent_user, "agent", agent_user, ring_timeout_sec,
+                                  row_id=row_id, agent=agent_user, trunk=agent_trunk())
+        if res == "no_trunk":
+            return {"ok": False, "reason": "no_trunk", "leg": "agent", "outcome": CallOutcome.FAILED}
+        if leg is None:
+            return {"ok": False, "reason": "aborted", "leg": "agent", "outcome": CallOutcome.ABORTED}
+        a_call, a_cb, a_sess, _ = leg
+
+        if res == "aborted":
+            self.hangup_all()
+            return {"ok": False, "reason": "aborted", "leg": "agent", "outcome": CallOutcome.ABORTED}
+        if res == "disconnected":
+            self._track_call(a_sess, False)
+            return {"ok": False, "reason": "agent_disconnected", "leg": "agent", "code": a_cb.last_code,
+                    "outcome": classify(a_cb.last_code, a_cb.last_reason)}
+        if res == "timeout":
+            # leg sudah di-hangup oleh timer service
+            self._track_call(a_sess, False)
+            return {"ok": False, "reason": "agent_no_answer", "leg": "agent", "code": 0,
+                    "outcome": CallOutcome.NO_ANSWER}
 
         publish_event({"type":"progress",
                        "payload": make_progress_payload({"nama_nasabah":"-"}, "AGENT", agent_user, True, "agent_answered")},
                       also_broadcast=False)
 
-        # --- 2) Call peer (nasabah) ---
-        peer_uri = f"sip:{peer_number}@{SIP_HOSTPORT};transport=udp"
-        p_ans = threading.Event()
-        p_disc = threading.Event()
-        p_cb = _CallCb(p_ans, p_disc)
-        p_call = self.acc.make_call(peer_uri, p_cb)
-        self._track_call(p_call, True)
+        # --- 2) Call peer (nasabah) --- agent menunggu di leg yang sudah tersambung
+        result, p_leg = self._call_peer(peer_number, ring_timeout_sec, row_id, agent_user)
+        if p_leg is not None:
+            # --- 3) Bridge media dua arah ---
+            result = self._bridge_media(a_call, a_sess, p_leg[0], p_leg[2])
+        note_agent_idle(a_sess, result["ok"])
+        return result
 
-        t1 = time.time()
-        while time.time() - t1 < ring_timeout_sec:
-            if stop_event.is_set():
-                self.hangup_all()
-                return {"ok": False, "reason": "aborted"}
-            if p_ans.is_set():
-                break
-            if p_disc.is_set():
-                # peer putus sebelum jawab
-                try: p_call.hangup()
+    def bridge_peer_first(self, agent_user: str, peer_number: str, ring_timeout_sec: int, row_id=None):
+        """
+        Mode peer-first (progressive):
+          1) Panggil Peer -> tunggu jawab (agent belum ditelepon)
+          2) Peer CONFIRMED -> panggil Agent (maks AGENT_ANSWER_TIMEOUT_SEC); peer mendengar PEER_HOLD_WAV
+          3) Hubungkan conf_slot keduanya
+        Agent hanya tersambung ke leg yang pasti ada nasabahnya (tanpa dengar ringback).
+        """
+        _register_pj_thread("bridge-peer-first")
+        if not self.accs:
+            return {"ok": False, "reason": "no_account"}
+
+        # --- 1) Call peer (nasabah) ---
+        result, p_leg = self._call_peer(peer_number, ring_timeout_sec, row_id, agent_user)
+        if p_leg is None:
+            return result
+        p_call, p_cb, p_sess, _ = p_leg
+
+        # --- 2) Call agent, nasabah ditahan (hold audio) ---
+        hold = self._start_hold(p_call)
+        try:
+            res, leg = self._dial_leg(agent_user, "agent", agent_user, AGENT_ANSWER_TIMEOUT_SEC,
+                                      row_id=row_id, agent=agent_user, trunk=agent_trunk())
+        finally:
+            self._stop_hold(hold)
+        if res == "aborted":
+            self.hangup_all()
+            return {"ok": False, "reason": "aborted", "leg": "agent", "outcome": CallOutcome.ABORTED}
+        a_sess = leg[2] if leg is not None else None
+        if res != "answered" or p_cb.disconnected_event.is_set():
+            # agent tidak menjawab / nasabah sudah menutup -> putuskan kedua leg
+            for sess in (p_sess, a_sess):
+                if sess is None:
+                    continue
+                try: sess.hangup()
                 except: pass
-                self._track_call(p_call, False)
-                return {"ok": False, "reason": "peer_disconnected"}
-            time.sleep(DIAL_WAIT_STEP)
-        if not p_ans.is_set():
-            try: p_call.hangup()
+                self._track_call(sess, False)
+            if res == "answered":
+                note_agent_idle(a_sess, False)
+                return {"ok": False, "reason": "peer_abandoned", "leg": "peer", "code": p_cb.last_code,
+                        "outcome": CallOutcome.CANCELLED}
+            reason = {"no_trunk": "no_trunk", "disconnected": "agent_disconnected"}.get(res, "agent_no_answer")
+            return {"ok": False, "reason": reason, "leg": "agent",
+                    "code": leg[1].last_code if leg is not None else 0, "outcome": CallOutcome.NO_ANSWER}
+
+        publish_event({"type":"progress",
+                       "payload": make_progress_payload({"nama_nasabah":"-"}, "AGENT", agent_user, True, "agent_answered")},
+                      also_broadcast=False)
+
+        # --- 3) Bridge media dua arah ---
+        result = self._bridge_media(leg[0], a_sess, p_call, p_sess)
+        note_agent_idle(a_sess, result["ok"])
+        return result
+
+    def _call_peer(self, peer_number, ring_timeout_sec, row_id, agent_user):
+        """
+        Panggil nasabah dan tunggu jawab.
+        Return (None, (call, cb, sess, wake)) jika terjawab, atau (result gagal, None).
+        """
+        res, leg = self._dial_leg(dial_string(peer_number, DIAL_NUMBER_FORMAT), "peer", peer_number,
+                                  ring_timeout_sec, row_id=row_id, agent=agent_user,
+                                  route=prefix_router.lookup(peer_number))
+        if res == "no_trunk":
+            return {"ok": False, "reason": "no_trunk", "leg": "peer", "outcome": CallOutcome.FAILED}, None
+        if leg is None:
+            self.hangup_all()
+            return {"ok": False, "reason": "aborted", "leg": "peer", "outcome": CallOutcome.ABORTED}, None
+        p_call, p_cb, p_sess, _ = leg
+
+        if res == "aborted":
+            self.hangup_all()
+            return {"ok": False, "reason": "aborted", "leg": "peer", "outcome": CallOutcome.ABORTED}, None
+        if res == "disconnected":
+            # peer putus sebelum jawab
+            try: p_sess.hangup()
             except: pass
-            self._track_call(p_call, False)
-            return {"ok": False, "reason": "peer_no_answer"}
+            self._track_call(p_sess, False)
+            outcome = classify(p_cb.last_code, p_cb.last_reason)
+            return {"ok": False, "reason": f"peer_{outcome.value}", "leg": "peer",
+                    "code": p_cb.last_code, "outcome": outcome}, None
+        if res == "abandoned":
+            # tidak ada ringing / pengumuman operator -> diputus sebelum RING_TIMEOUT_SEC
+            self._track_call(p_sess, False)
+            return {"ok": False, "reason": f"peer_{p_cb.abandon_reason}", "leg": "peer",
+                    "code": p_cb.last_code, "outcome": CallOutcome.UNAVAILABLE}, None
+        if res == "timeout":
+            self._track_call(p_sess, False)
+            return {"ok": False, "reason": "peer_no_answer", "leg": "peer", "code": 0,
+                    "outcome": CallOutcome.NO_ANSWER}, None
 
         publish_event({"type":"progress",
                        "payload": make_progress_payload({"nama_nasabah":"-"}, "NASABAH-LEG", peer_number, True, "peer_answered")},
                       also_broadcast=False)
 
-        # --- 3) Bridge media dua arah ---
+        amd = self._screen_answer(p_call, p_sess)
+        if amd is not None and amd.label == AMD_MACHINE:
+            p_cb.cdr_outcome, p_cb.cdr_detail = CallOutcome.MACHINE, f"amd:{amd.reason}"
+            try: p_sess.hangup()
+            except: pass
+            self._track_call(p_sess, False)
+            return {"ok": False, "reason": f"peer_machine:{amd.reason}", "leg": "peer", "code": 200,
+                    "outcome": CallOutcome.MACHINE}, None
+        if p_cb.disconnected_event.is_set():
+            # nasabah menutup selama analisis AMD
+            self._track_call(p_sess, False)
+            return {"ok": False, "reason": "peer_abandoned", "leg": "peer", "code": p_cb.last_code,
+                    "outcome": CallOutcome.CANCELLED}, None
+        return None, leg
+
+    def _screen_answer(self, call, sess):
+        """
+        AMD: rekam conf_slot nasabah (file WAV di AMD_TMP_DIR) dan nilai tiap AMD_POLL_SEC
+        sampai ada keputusan atau AMD_MAX_SEC. Return AmdResult, atau None jika AMD mati/gagal.
+        """
+        if not AMD_ENABLED:
+            return None
+        lib = pj.Lib.instance()
+        path = os.path.join(AMD_TMP_DIR, f"amd-{os.getpid()}-{sess.sid}.wav")
         try:
-            a_slot = a_call.info().conf_slot
-            p_slot = p_call.info().conf_slot
-            pj.Lib.instance().conf_connect(a_slot, p_slot)
-            pj.Lib.instance().conf_connect(p_slot, a_slot)
-            return {"ok": True, "reason": "bridged", "a_call": a_call, "p_call": p_call}
+            rec = lib.create_recorder(path)
+            lib.conf_connect(call.info().conf_slot, lib.recorder_get_slot(rec))
+        except Exception as e:
+            print(f"[AMD] tap gagal: {e}")
+            return None
+        det = AmdDetector(max_sec=AMD_MAX_SEC)
+        tail = WavTail(path)
+        wake = _new_wait()
+        result = None
+        try:
+            deadline = time.monotonic() + AMD_MAX_SEC + 1.0
+            while result is None and not stop_event.is_set():
+                # sleep() meng-clear wake setelah bangun: tiap poll benar-benar menunggu AMD_POLL_SEC
+                timers.sleep(AMD_POLL_SEC, wake=wake)
+                if stop_event.is_set() or sess.state == DISCONNECTED:
+                    break
+                result = det.feed(tail.read(), tail.rate)
+                if result is None and time.monotonic() >= deadline:
+                    result = det.finish()
+        finally:
+            _drop_wait(wake)
+            try:
+                lib.recorder_destroy(rec)
+            except Exception:
+                pass
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if result is not None:
+            note_amd(result)
+            print(f"[AMD] {sess.number}: {result.label} ({result.reason}, {result.decided_sec:.1f}s)")
+        return result
+
+    def _bridge_media(self, a_call, a_sess, p_call, p_sess):
+        try:
+            with tracer.span("bridge", row_id=p_sess.row_id, call_id=p_sess.sip_call_id,
+                             agent_call_id=a_sess.sip_call_id):
+                a_slot = a_call.info().conf_slot
+                p_slot = p_call.info().conf_slot
+                pj.Lib.instance().conf_connect(a_slot, p_slot)
+                pj.Lib.instance().conf_connect(p_slot, a_slot)
+            a_sess.peer, p_sess.peer = p_sess, a_sess
+            a_sess.t_bridge = p_sess.t_bridge = time.time()
+            answered = [t for t in (a_sess.t_200, p_sess.t_200) if t is not None]
+            if answered:
+                m_bridge.observe(a_sess.t_bridge - max(answered))
+            return {"ok": True, "reason": "bridged", "leg": "peer", "code": 200,
+                    "outcome": CallOutcome.ANSWERED, "agent": a_sess, "peer": p_sess}
         except Exception as e:
             # gagal bridge → putuskan
             self.hangup_all()
-            return {"ok": False, "reason": f"bridge_error:{e}"}
+            return {"ok": False, "reason": f"bridge_error:{e}", "leg": "bridge", "outcome": CallOutcome.FAILED}
+
+    def _start_hold(self, call):
+        """Putar PEER_HOLD_WAV ke leg (loop). Return player id atau None."""
+        if not PEER_HOLD_WAV:
+            return None
+        try:
+            lib = pj.Lib.instance()
+            player = lib.create_player(PEER_HOLD_WAV, loop=True)
+            lib.conf_connect(lib.player_get_slot(player), call.info().conf_slot)
+            return player
+        except Exception as e:
+            print(f"[PJSIP] hold audio gagal: {e}")
+            return None
+
+    def _stop_hold(self, player):
+        if player is None:
+            return
+        try:
+            pj.Lib.instance().player_destroy(player)
+        except Exception:
+            pass
+
+sip = None   # SipManager, dibuat saat inisialisasi (per proses dialer)
 
-sip = SipManager()
+# Detik agent tersambung tanpa lawan bicara (ringback / menunggu nasabah), per mode bridge
+bridge_stats = {"mode": BRIDGE_MODE, "bridged": 0, "agent_legs": 0, "agent_idle_sec": 0.0}
+
+def note_agent_idle(a_sess, bridged):
+    """Catat idle leg agent: dari agent menjawab sampai bridge (atau sampai percobaan selesai)."""
+    if a_sess is None or a_sess.t_200 is None:
+        return
+    idle = max(0.0, time.time() - a_sess.t_200)
+    with state_lock:
+        bridge_stats["agent_legs"] += 1
+        bridge_stats["agent_idle_sec"] += idle
+        if bridged:
+            bridge_stats["bridged"] += 1
+
+# Hasil AMD: label -> jumlah & total detik sampai keputusan
+amd_stats = {}
+
+def note_amd(result):
+    with state_lock:
+        st = amd_stats.setdefault(result.label, {"count": 0, "decided_sec": 0.0})
+        st["count"] += 1
+        st["decided_sec"] += result.decided_sec
+
+def bridge_stats_snapshot(stats=None):
+    s = dict(stats or bridge_stats)
+    s["agent_idle_sec"] = round(s["agent_idle_sec"], 2)
+    s["idle_sec_per_bridge"] = round(s["agent_idle_sec"] / s["bridged"], 2) if s["bridged"] else None
+    return s
 
 # ===========================================================
 #                     Worker antrian
@@ -320,9 +1137,17 @@ def call_flow_worker():
 
         username = item.get("_sip_user")  # agent SIP (MicroSIP di Windows)
         password = item.get("_sip_pass")
+        tracer.begin_row(item.get("_row_id"), queued_at=item.get("_queued_at"), phone=item.get("phone"),
+                         agent=username)
+        if item.get("campaign"):
+            row_campaigns[item.get("_row_id")] = item["campaign"]
+        zone = explicit_zone(item, TIMEZONE_FIELD)
+        if zone:
+            row_zones[item.get("_row_id")] = zone
 
         with state_lock:
             call_status["in_progress"] = {
+                "row_id": item.get("_row_id"),
                 "nama_nasabah": item.get("nama_nasabah"),
                 "phone": item.get("phone"),
                 "ec_name_1": item.get("ec_name_1"),
@@ -339,7 +1164,7 @@ def call_flow_worker():
                 break
             time.sleep(0.2)
         if stop_event.is_set():
-            call_queue.task_done()
+            row_done(item)
             with state_lock:
                 call_status["in_progress"] = None
             continue
@@ -350,21 +1175,22 @@ def call_flow_worker():
                 break
             time.sleep(0.2)
         if stop_event.is_set():
-            call_queue.task_done()
+            row_done(item)
             with state_lock:
                 call_status["in_progress"] = None
             continue
 
         # Login SIP
         try:
-            sip.ensure_account(username, password)
+            with tracer.span("register", user=username):
+                sip.ensure_account(username, password)
         except Exception as e:
             payload = make_progress_payload(item, "LOGIN", "-", False, f"login_failed:{e}")
             publish_event({"type": "progress", "payload": payload})
             with state_lock:
                 call_status["processed"] += 1
                 call_status["in_progress"] = None
-            call_queue.task_done()
+            row_done(item)
             continue
 
         # Urutan panggilan: NASABAH (bridge ke agent), lalu EC1/EC2 (optional single-leg)
@@ -376,31 +1202,55 @@ def call_flow_worker():
 
         # NASABAH via BRIDGE ke agent
         label, number = numbers[0]
+        peer_outcome = None
         if number:
             publish_event({"type": "progress",
                            "payload": make_progress_payload(item, f"CALLING {label}", number, None, "ringing")})
 
-            result = sip.bridge_agent_with_peer(agent_user=username, peer_number=number,
-                                                ring_timeout_sec=RING_TIMEOUT_SEC)
+            bridge = sip.bridge_peer_first if BRIDGE_MODE == "peer_first" else sip.bridge_agent_with_peer
+            result = bridge(agent_user=username, peer_number=number,
+                            ring_timeout_sec=RING_TIMEOUT_SEC,
+                            row_id=item.get("_row_id"))
             answered = result.get("ok", False)
             detail = result.get("reason", "")
+            outcome = result.get("outcome", CallOutcome.FAILED)
+            peer_outcome = outcome
             publish_event({"type": "progress",
-                           "payload": make_progress_payload(item, label, number, answered, detail)})
+                           "payload": make_progress_payload(item, label, number, answered, detail, outcome)})
 
             # Jika bridged berhasil, akhiri proses item ini (agent ngobrol dengan nasabah)
             if answered:
                 with state_lock:
                     call_status["processed"] += 1
                     call_status["in_progress"] = None
-                call_queue.task_done()
+                row_done(item)
+                continue
+
+            # Nasabah sibuk -> coba lagi nanti, jangan habiskan slot untuk EC sekarang
+            if (outcome == CallOutcome.BUSY and result.get("leg") == "peer"
+                    and item.get("_busy_requeues", 0) < BUSY_REQUEUE_MAX):
+                item["_busy_requeues"] = item.get("_busy_requeues", 0) + 1
+                requeue_later(item, BUSY_REQUEUE_SEC, reason="busy")
+                publish_event({"type": "progress",
+                               "payload": make_progress_payload(item, label, number, False,
+                                                                f"busy_requeued:{BUSY_REQUEUE_SEC}s", outcome)},
+                              also_broadcast=False)
+                with state_lock:
+                    call_status["in_progress"] = None
+                row_done(item)
                 continue
-            else:
-                time.sleep(RETRY_GAP_SEC)
+
+            gap_wait(retry_gap_for(outcome))
 
         # EC1 dan EC2 — panggilan 1 leg saja (tanpa bridge), hanya untuk pemberitahuan
         for label, number in numbers[1:]:
             if not number:
                 continue
+            if calling_windows is not None and not calling_windows.is_open(number_zone(number, item.get("_row_id"))):
+                publish_event({"type": "progress",
+                               "payload": make_progress_payload(item, label, number, False, "outside_window")},
+                              also_broadcast=False)
+                continue
             if stop_event.is_set():
                 break
             while not pause_event.is_set():
@@ -413,61 +1263,392 @@ def call_flow_worker():
             publish_event({"type": "progress",
                            "payload": make_progress_payload(item, f"CALLING {label}", number, None, "ringing")})
 
-            ok = single_leg_call(number)
+            ok = single_leg_call(number, row_id=item.get("_row_id"))
             publish_event({"type": "progress",
-                           "payload": make_progress_payload(item, label, number, ok["answered"], ok["detail"])})
+                           "payload": make_progress_payload(item, label, number, ok["answered"], ok["detail"],
+                                                            ok.get("outcome"))})
             if ok["answered"]:
                 break
-            time.sleep(RETRY_GAP_SEC)
+            gap_wait(retry_gap_for(ok.get("outcome", CallOutcome.FAILED)))
+
+        # Nasabah belum terjawab -> jadwalkan redial (kecuali nomor invalid / STOP)
+        if (peer_outcome is not None and not stop_event.is_set()
+                and peer_outcome not in (CallOutcome.ANSWERED, CallOutcome.ABORTED)
+                and not is_hard_failure(peer_outcome)):
+            schedule_retry(item, peer_outcome)
 
         with state_lock:
             call_status["processed"] += 1
             call_status["in_progress"] = None
-        call_queue.task_done()
+        row_done(item)
 
-def single_leg_call(number: str):
+def single_leg_call(number: str, row_id=None):
     """Panggilan 1 leg (untuk EC)."""
     _register_pj_thread("single-leg")
-    if not sip.acc:
+    if not sip.accs:
         return {"answered": False, "detail": "no_account"}
 
-    uri = f"sip:{number}@{SIP_HOSTPORT};transport=udp"
-    ans = threading.Event()
-    disc = threading.Event()
-    cb = _CallCb(ans, disc)
-    call = sip.acc.make_call(uri, cb)
-    sip._track_call(call, True)
+    res, leg = sip._dial_leg(dial_string(number, DIAL_NUMBER_FORMAT), "ec", number, RING_TIMEOUT_SEC,
+                             row_id=row_id, route=prefix_router.lookup(number))
+    if res == "no_trunk":
+        return {"answered": False, "detail": "no_trunk", "outcome": CallOutcome.FAILED}
+    if leg is None:
+        return {"answered": False, "detail": "aborted", "outcome": CallOutcome.ABORTED}
+    call, cb, sess, _ = leg
+
+    if res == "aborted":
+        try: sess.hangup()
+        except: pass
+        sip._track_call(sess, False)
+        return {"answered": False, "detail": "aborted", "outcome": CallOutcome.ABORTED}
+    answered = res == "answered"
 
-    t0 = time.time()
-    answered = False
-    while time.time() - t0 < RING_TIMEOUT_SEC:
-        if stop_event.is_set():
-            try: call.hangup()
-            except: pass
-            sip._track_call(call, False)
-            return {"answered": False, "detail": "aborted"}
-        if ans.is_set():
-            answered = True
-            break
-        if disc.is_set():
-            break
-        time.sleep(DIAL_WAIT_STEP)
+    try:
+        sess.hangup()
+    except Exception:
+        pass
+    sip._track_call(sess, False)
+    if answered and cb.disconnected_event.is_set():
+        return {"answered": True, "detail": "disconnected", "outcome": CallOutcome.ANSWERED}
+    if answered:
+        return {"answered": True, "detail": "answered", "outcome": CallOutcome.ANSWERED}
+    if res == "abandoned":
+        return {"answered": False, "detail": cb.abandon_reason, "code": cb.last_code,
+                "outcome": CallOutcome.UNAVAILABLE}
+    if res == "disconnected":
+        outcome = classify(cb.last_code, cb.last_reason)
+        return {"answered": False, "detail": outcome.value, "code": cb.last_code, "outcome": outcome}
+    return {"answered": False, "detail": "timeout", "outcome": CallOutcome.NO_ANSWER}
 
+# ===========================================================
+#              Jeda & jadwal ulang berdasarkan outcome
+# ===========================================================
+_congestion_streak = 0
+
+def retry_gap_for(outcome):
+    """Jeda (detik) sebelum leg berikutnya, berdasarkan outcome leg sebelumnya."""
+    global _congestion_streak
+    if outcome == CallOutcome.CONGESTION:
+        # trunk 503 -> backoff eksponensial
+        _congestion_streak += 1
+        return min(RETRY_GAP_SEC * (2 ** _congestion_streak), CONGESTION_BACKOFF_MAX_SEC)
+    _congestion_streak = 0
+    if outcome in (CallOutcome.ANSWERED, CallOutcome.ABORTED) or is_hard_failure(outcome):
+        return 0
+    return RETRY_GAP_SEC
+
+def _retry_fire(row, reason):
+    publish_event({"type": "retry",
+                   "payload": {"nama_nasabah": row.get("nama_nasabah"), "phone": row.get("phone"),
+                               "reason": reason}},
+                  also_broadcast=False)
+
+def enqueue_row(row):
+    row["_queued_at"] = time.time()     # awal span "dequeue"
+    call_queue.put(row)
+
+retry_scheduler = RetryScheduler(
+    enqueue=enqueue_row,
+    spacing_sec=RETRY_SPACING_SEC,
+    max_per_day=RETRY_MAX_PER_DAY,
+    max_total=RETRY_MAX_TOTAL,
+    day_start_hour=RETRY_DAY_START_HOUR,
+    state_file=RETRY_STATE_FILE,
+    on_fire=_retry_fire,
+)
+# row id unik per row yang masuk antrian; row retry yang dimuat dari state file
+# tetap memakai _row_id lama, jadi id baru dimulai setelahnya
+_row_seq = itertools.count(retry_scheduler.max_row_id + 1)
+
+def row_done(item):
+    """Worker selesai dengan satu row (terjawab, gagal, dijadwalkan ulang atau dibatalkan)."""
+    call_queue.task_done()
+    m_rows.inc()
+    tracer.end_row(item.get("_row_id"))
+    row_campaigns.pop(item.get("_row_id"), None)
+    row_zones.pop(item.get("_row_id"), None)
+    if _shard_link is not None:
+        _shard_link.send("done", item.get("_row_id"))
+    else:
+        _release_row(item.get("_row_id"))
+
+def _release_row(row_id):
+    with _held_lock:
+        _held_rows.discard(row_id)
+
+def _cluster_post(path, body, timeout=3):
+    r = requests.post(f"{CLUSTER_COORDINATOR}{path}", json=body, timeout=timeout)
+    r.raise_for_status()
+    return r.json()
+
+def requeue_later(item, delay_sec, reason="retry"):
+    """Masukkan row ke antrian lagi setelah delay_sec (tanpa menahan worker)."""
+    if _shard_link is not None:
+        _shard_link.send("requeue", item, delay_sec, reason)   # jadwal dipegang supervisor
+        return
+    if CLUSTER_COORDINATOR:
+        try:
+            _cluster_post("/cluster/requeue", {"row": item, "delay": delay_sec, "reason": reason})
+        except Exception as e:
+            print(f"[CLUSTER] requeue gagal: {e}")
+        return
+    retry_scheduler.schedule_at(item, time.time() + delay_sec, reason=reason)
+    with state_lock:
+        call_status["requeued"] += 1
+
+def schedule_retry(item, outcome):
+    """Nasabah belum terjawab -> jadwalkan retry sesuai aturan. Return epoch atau None."""
+    if _shard_link is not None:
+        _shard_link.send("retry", item, outcome.value)
+        return None
+    if CLUSTER_COORDINATOR:
+        try:
+            return _cluster_post("/cluster/retry", {"row": item, "outcome": outcome.value}).get("when")
+        except Exception as e:
+            print(f"[CLUSTER] retry gagal: {e}")
+            return None
+    when = retry_scheduler.schedule_retry(item, reason=outcome.value)
+    if when is not None:
+        with state_lock:
+            call_status["requeued"] += 1
+        publish_event({"type": "progress",
+                       "payload": make_progress_payload(
+                           item, "RETRY", item.get("phone"), False,
+                           "retry_at:" + time.strftime("%Y-%m-%d %H:%M", time.localtime(when)),
+                           outcome)},
+                      also_broadcast=False)
+    return when
+
+# ===========================================================
+#                 Mode sharded (multi-proses)
+# ===========================================================
+def _shard_status_snapshot():
+    with state_lock:
+        s = dict(call_status)
+    s["queue_size"] = call_queue.qsize()
+    cur = s.get("in_progress") or {}
+    s["legs"] = [sess.to_dict() for sess in sip.calls.for_row(cur.get("row_id"))]
+    s["calls"] = sip.calls.snapshot_counts()
+    s["trunks"] = trunk_stats()
+    s["trunk_health"] = trunk_table.snapshot()
+    with state_lock:
+        s["bridge"] = dict(bridge_stats)
+        s["early_abandon"] = {k: dict(v) for k, v in early_abandon_stats.items()}
+        s["amd"] = {k: dict(v) for k, v in amd_stats.items()}
+    s["ring_timeout"] = ring_stats.snapshot()
+    s["best_time"] = best_time.snapshot()
+    s["windows"] = call_queue.buckets_snapshot()
+    s["cdr"] = cdr_writer.snapshot() if cdr_writer is not None else None
+    s["metrics"] = metrics.state()
+    return s
+
+def rerank_queue():
+    """Urutkan ulang antrian (thread sendiri: NumPy tidak menahan timer thread)."""
+    def run():
+        for zone in call_queue.bucket_names():
+            hour = None
+            if calling_windows is not None and zone is not None:
+                # zona yang tutup diurutkan untuk jam saat jendelanya buka
+                hour = calling_windows.local_hour(zone, calling_windows.opens_at(zone))
+            try:
+                n = best_time.rerank(call_queue, bucket=zone, hour=hour)
+            except Exception as e:
+                print(f"[BEST-TIME] rerank gagal: {e}")
+                return
+            if n > 1:
+                print(f"[BEST-TIME] {zone or '-'}: {n} row diurutkan ulang dalam {best_time.last_rerank_ms} ms")
+    threading.Thread(target=run, name="best-time-rerank", daemon=True).start()
+
+def _shard_main(idx, conn):
+    """Entry point proses shard: pj.Lib + worker sendiri, dikendalikan lewat pipe."""
+    global sip, call_queue, _shard_link, cdr_writer, pjsip_log
+    _shard_link = ShardLink(conn)
+    pjsip_log = new_pjsip_log(idx)
+    call_queue = new_dial_queue()
+    if CDR_DIR:
+        cdr_writer = CdrWriter(CDR_DIR, f"{NODE_ID}-shard{idx}", flush_sec=CDR_FLUSH_SEC)
+    sip = SipManager(sip_port=SHARD_SIP_PORT_BASE + idx)
+    if PJSUA_BACKEND != "sim":     # simulasi: trunk tidak di-probe (host tidak dihubungi sama sekali)
+        trunk_table.start_probing(TRUNK_PROBE_SEC, TRUNK_PROBE_TIMEOUT_SEC)
+    timers.call_every(PREFIX_ROUTES_RELOAD_SEC, prefix_router.reload)
+    if BEST_TIME_RERANK:
+        timers.call_every(BEST_TIME_RERANK_SEC, rerank_queue)
+    threading.Thread(target=call_flow_worker, daemon=True).start()
+    timers.call_every(SHARD_STATUS_SEC, lambda: _shard_link.send("status", _shard_status_snapshot()))
+    timers.call_every(SHARD_STATUS_SEC, _forward_spans)
+    print(f"[SHARD {idx}] dialer siap (sip port {SHARD_SIP_PORT_BASE + idx})")
+    while True:
+        try:
+            msg = _shard_link.recv()
+        except (EOFError, OSError):
+            break       # supervisor mati -> shard ikut berhenti
+        kind = msg[0]
+        if kind == "row":
+            call_queue.put(msg[1])
+        elif kind == "action":
+            apply_action(msg[1])
+        elif kind == "hangup_row":
+            sip.hangup_row(msg[1])
     try:
-        call.hangup()
+        sip.hangup_all()
     except Exception:
         pass
-    sip._track_call(call, False)
-    if answered and disc.is_set():
-        return {"answered": True, "detail": "disconnected"}
-    return {"answered": answered, "detail": "answered" if answered else "timeout"}
+    if cdr_writer is not None:
+        cdr_writer.close()
+    if pjsip_log is not None:
+        pjsip_log.flush()
+
+def _forward_spans():
+    spans = tracer.drain()
+    if spans:
+        _shard_link.send("trace", spans)
+
+def _on_shard_message(idx, msg):
+    kind = msg[0]
+    if kind == "event":
+        # broadcast dikerjakan di sini; span-nya ikut row yang dikerjakan shard
+        tracer.bind(msg[3] if len(msg) > 3 else None)
+        publish_event(msg[1], also_broadcast=msg[2])
+        tracer.bind(None)
+    elif kind == "status":
+        shard_status[idx] = msg[1]
+    elif kind == "retry":
+        schedule_retry(msg[1], CallOutcome(msg[2]))
+    elif kind == "requeue":
+        requeue_later(msg[1], msg[2], reason=msg[3])
+    elif kind == "done":
+        with shard_rows_lock:
+            shard_rows.get(idx, {}).pop(msg[1], None)
+        _release_row(msg[1])
+    elif kind == "trace":
+        tracer.ingest(msg[1])
+
+def _on_shard_exit(idx, exitcode):
+    """Shard mati: row yang dipegangnya (antri / sedang ditelepon) masuk antrian lagi."""
+    shard_status.pop(idx, None)
+    with shard_rows_lock:
+        rows = list(shard_rows.pop(idx, {}).values())
+    for row in rows:
+        enqueue_row(row)
+    publish_event({"type": "shard",
+                   "payload": {"shard": idx, "exitcode": exitcode, "requeued_rows": len(rows)}},
+                  also_broadcast=False)
+
+def _on_shard_spawn(idx, restarted):
+    """Shard hasil restart mulai dengan state awal: ulangi action call/pause yang berlaku."""
+    if not restarted:
+        return
+    with state_lock:
+        running, paused = call_status["running"], call_status["paused"]
+    if running:
+        shards.send(idx, "action", "call")
+        if paused:
+            shards.send(idx, "action", "pause")
+
+def shard_dispatcher():
+    """Teruskan row dari antrian supervisor ke shard; satu agent selalu ke shard yang sama."""
+    while True:
+        item = call_queue.get()
+        idx = shards.shard_for(item.get("_sip_user") or "")
+        with shard_rows_lock:
+            sent = shards.send(idx, "row", item)
+            if sent:
+                shard_rows.setdefault(idx, {})[item.get("_row_id")] = item
+        if not sent:
+            # shard sedang restart: coba lagi setelah shard baru siap
+            timers.call_later(RESPAWN_DELAY_SEC, enqueue_row, item)
+        call_queue.task_done()
+
+# ===========================================================
+#                 Mode cluster (multi-node)
+# ===========================================================
+def cluster_sync():
+    """
+    Loop node cluster: heartbeat (row yang dipegang + event + status) lalu lease row
+    baru jika worker kosong. Perintah dari koordinator ikut di respon heartbeat.
+    """
+    cmd_since = 0
+    capacity = CLUSTER_PREFETCH * max(1, DIALER_SHARDS)
+    while True:
+        events = []
+        while _cluster_outbox:
+            events.append(_cluster_outbox.popleft())
+        with _held_lock:
+            held = list(_held_rows)
+        try:
+            hb = _cluster_post("/cluster/heartbeat", {
+                "node": NODE_ID, "url": NODE_URL, "held": held,
+                "status": status_snapshot(), "events": events, "cmd_since": cmd_since,
+            })
+            for seq, cmd in hb.get("commands", []):
+                cmd_since = max(cmd_since, seq)
+                if "action" in cmd:
+                    dispatch_action(cmd["action"])
+                elif "hangup_row" in cmd:
+                    dispatch_hangup_row(cmd["hangup_row"])
+            want = capacity - len(held)
+            if want > 0 and run_event.is_set():
+                rows = _cluster_post("/cluster/lease", {"node": NODE_ID, "max": want}).get("rows", [])
+                for row in rows:
+                    if calling_windows is not None and not calling_windows.is_open(row_zone(row)):
+                        # jangan parkir row di DialQueue lokal: slot prefetch habis sampai zona buka.
+                        # Kembalikan ke koordinator, dijadwalkan lagi saat jendela zonanya buka.
+                        delay = min(max(0.0, calling_windows.opens_at(row_zone(row)) - time.time()), 86400.0)
+                        try:
+                            _cluster_post("/cluster/requeue", {"row": row, "delay": delay,
+                                                               "reason": "outside_window"})
+                            continue
+                        except Exception as e:
+                            # gagal dikembalikan: tetap dipegang (antrian lokal menunggu jendela buka)
+                            print(f"[CLUSTER] requeue row di luar jendela gagal: {e}")
+                    with _held_lock:
+                        _held_rows.add(row.get("_row_id"))
+                    enqueue_row(row)
+        except Exception as e:
+            # event dikembalikan supaya tidak hilang saat koordinator tidak terjangkau
+            _cluster_outbox.extendleft(reversed(events))
+            print(f"[CLUSTER] sync gagal: {e}")
+        time.sleep(CLUSTER_SYNC_SEC)
 
 # Inisialisasi flags & jalankan worker
 pause_event.set()
 stop_event.clear()
 run_event.clear()     # default: belum boleh jalan sampai klik "Call"
-worker_thread = threading.Thread(target=call_flow_worker, daemon=True)
-worker_thread.start()
+if is_shard_child():
+    pass              # proses shard: inisialisasi di _shard_main()
+elif DIALER_SHARDS > 0:
+    shards = ShardSupervisor(DIALER_SHARDS, target=_shard_main,
+                             on_message=_on_shard_message, on_exit=_on_shard_exit, on_spawn=_on_shard_spawn)
+    shards.start()
+    call_queue = DialQueue()    # supervisor hanya meneruskan; jendela zona dijaga antrian shard
+    threading.Thread(target=shard_dispatcher, name="shard-dispatcher", daemon=True).start()
+else:
+    pjsip_log = new_pjsip_log()
+    sip = SipManager()
+    if CDR_DIR:
+        cdr_writer = CdrWriter(CDR_DIR, NODE_ID, flush_sec=CDR_FLUSH_SEC)
+    if PJSUA_BACKEND != "sim":     # simulasi: trunk tidak di-probe (host tidak dihubungi sama sekali)
+        trunk_table.start_probing(TRUNK_PROBE_SEC, TRUNK_PROBE_TIMEOUT_SEC)
+    timers.call_every(PREFIX_ROUTES_RELOAD_SEC, prefix_router.reload)
+    if RING_STATS_FILE:
+        timers.call_every(RING_STATS_SAVE_SEC, lambda: threading.Thread(target=ring_stats.save, daemon=True).start())
+    if BEST_TIME_FILE:
+        timers.call_every(BEST_TIME_SAVE_SEC, lambda: threading.Thread(target=best_time.save, daemon=True).start())
+    if BEST_TIME_RERANK:
+        timers.call_every(BEST_TIME_RERANK_SEC, rerank_queue)
+    worker_thread = threading.Thread(target=call_flow_worker, daemon=True)
+    worker_thread.start()
+if not is_shard_child():
+    # tick scheduler retry ikut timer service (tidak perlu thread sendiri)
+    timers.call_every(retry_scheduler.wheel.tick_sec, retry_scheduler.poll)
+    if RETRY_STATE_FILE:
+        timers.call_every(RETRY_STATE_SAVE_SEC,
+                          lambda: threading.Thread(target=retry_scheduler.save, daemon=True).start())
+    if TRACE_FILE:
+        timers.call_every(TRACE_EXPORT_SEC, lambda: threading.Thread(target=tracer.export, daemon=True).start())
+    if CLUSTER_COORDINATOR:
+        threading.Thread(target=cluster_sync, name="cluster-sync", daemon=True).start()
+        print(f"[CLUSTER] node {NODE_ID} -> koordinator {CLUSTER_COORDINATOR}")
 
 # ===========================================================
 #                    API endpoints
@@ -501,21 +1682,49 @@ def push_data():
     # event dataset masuk (juga broadcast ke Windows)
     publish_event({"type": "dataset", "payload": payload})
 
+    # Normalisasi nomor (E.164) sebelum masuk antrian; row tanpa nomor valid ditolak
+    rows = [dict(row) for row in dataset if isinstance(row, dict)]
+    valid_rows, rejected_rows = normalize_rows(rows, PHONE_FIELDS)
+    invalid_numbers = sum(len(r.get("_invalid_numbers", ())) for r in valid_rows + rejected_rows)
+    # callback_at yang tidak bisa diparse: tolak, jangan langsung ditelepon di luar jam yang diminta
+    valid_rows, bad_callbacks = split_callbacks(valid_rows)
+    for r in bad_callbacks:
+        print(f"[PUSH] callback_at tidak valid {r['_invalid_callback_at']!r}: {r.get('nama_nasabah')} ditolak")
+    rejected_rows += bad_callbacks
+
     added = 0
-    for row in dataset:
-        row = dict(row)
+    scheduled = 0
+    for row in valid_rows:
+        row["_row_id"] = next(_row_seq)
         row["_sip_user"] = sip_user
         row["_sip_pass"] = sip_pass
-        call_queue.put(row)
+        # row dengan "callback_at": "HH:MM" -> masuk jadwal, bukan langsung antrian
+        if row.get("callback_at"):
+            retry_scheduler.schedule_callback(row, row["callback_at"])
+            scheduled += 1
+            continue
+        enqueue_row(row)
         added += 1
 
     with state_lock:
         call_status["queued"] += added
+        call_status["rejected"] += len(rejected_rows)
+
+    if rejected_rows:
+        publish_event({"type": "rejected",
+                       "payload": {"count": len(rejected_rows),
+                                   "rows": [{"nama_nasabah": r.get("nama_nasabah"),
+                                             "invalid": r.get("_invalid_numbers", {}),
+                                             "invalid_callback_at": r.get("_invalid_callback_at")}
+                                            for r in rejected_rows]}},
+                      also_broadcast=False)
 
-    return jsonify({"status": "ok", "enqueued": added, "queue_size": call_queue.qsize()}), 200
+    return jsonify({"status": "ok", "enqueued": added, "scheduled": scheduled, "rejected": len(rejected_rows),
+                    "invalid_numbers": invalid_numbers, "invalid_callback_at": len(bad_callbacks),
+                    "queue_size": call_queue.qsize()}), 200
 
-@app.route("/api/<action>", methods=["POST"])
-def handle_action(action):
+def apply_action(action):
+    """Terapkan action call/pause/start/stop ke proses ini. Return (msg, http_code)."""
     code = 200
     if action == "call":
         with state_lock:
@@ -553,6 +1762,7 @@ def handle_action(action):
         run_event.clear()
         stop_event.set()
         pause_event.set()
+        wake_all_waits()       # bangunkan leg / jeda yang sedang menunggu
 
         # Putuskan SEMUA panggilan aktif & kosongkan antrian di thread terpisah
         def _hard_stop():
@@ -562,20 +1772,22 @@ def handle_action(action):
             except Exception:
                 pass
             try:
-                sip.hangup_all()
+                if sip is not None:
+                    sip.hangup_all()
             except Exception:
                 pass
             drained = 0
-            try:
-                while True:
-                    call_queue.get_nowait()
-                    call_queue.task_done()
-                    drained += 1
-            except Exception:
-                pass
+            for row in call_queue.clear():     # termasuk row di zona yang sedang tutup
+                row_done(row)
+                drained += 1
+            unscheduled = 0
+            if _shard_link is None:
+                unscheduled = len(retry_scheduler)
+                retry_scheduler.clear()
             publish_event(
                 {"type": "action",
-                 "payload": {"action": "stop-drain", "message": f"Queue drained {drained} items"}},
+                 "payload": {"action": "stop-drain",
+                             "message": f"Queue drained {drained} items, {unscheduled} retry dibatalkan"}},
                  also_broadcast=False
             )
 
@@ -585,17 +1797,240 @@ def handle_action(action):
     else:
         msg = "Action tidak dikenal"
         code = 400
+    return msg, code
+
+def dispatch_action(action):
+    """apply_action() di proses ini + teruskan ke semua shard."""
+    msg, code = apply_action(action)
+    if shards is not None and code == 200:
+        shards.broadcast("action", action)
+    return msg, code
+
+def dispatch_hangup_row(row_id):
+    """Putuskan leg milik row; return (jumlah leg atau None jika di shard, pesan)."""
+    if shards is not None:
+        shards.broadcast("hangup_row", row_id)
+        return None, f"hangup row {row_id} dikirim ke {shards.n} shard"
+    n = sip.hangup_row(row_id)
+    return n, f"{n} leg diputus untuk row {row_id}"
 
+@app.route("/api/<action>", methods=["POST"])
+def handle_action(action):
+    msg, code = dispatch_action(action)
     print(f"[ACTION] {action.upper()} -> {msg}")
     publish_event({"type": "action", "payload": {"action": action, "message": msg}}, also_broadcast=False)
     return jsonify({"status": "ok" if code == 200 else "error", "action": action, "message": msg}), code
 
-@app.route("/api/log", methods=["GET"])
-def get_status():
+@app.route("/api/hangup/<int:row_id>", methods=["POST"])
+def hangup_row(row_id):
+    n, msg = dispatch_hangup_row(row_id)
+    print(f"[ACTION] HANGUP -> {msg}")
+    publish_event({"type": "action", "payload": {"action": "hangup", "row_id": row_id, "message": msg}},
+                  also_broadcast=False)
+    return jsonify({"status": "ok", "row_id": row_id, "hung_up": n}), 200
+
+def status_snapshot():
+    """Status dialer (dipakai /api/log dan heartbeat cluster)."""
     with state_lock:
         s = dict(call_status)
         s["queue_size"] = call_queue.qsize()
-    return jsonify(s), 200
+    if shards is not None:
+        # agregasi status semua shard
+        sts = [shard_status.get(i, {}) for i in range(shards.n)]
+        s["processed"] = sum(st.get("processed", 0) for st in sts)
+        s["queue_size"] += sum(st.get("queue_size", 0) for st in sts)
+        busy = [st for st in sts if st.get("in_progress")]
+        s["in_progress"] = busy[0]["in_progress"] if busy else None
+        s["active_sip_user"] = busy[0].get("active_sip_user") if busy else None
+        s["legs"] = [leg for st in busy for leg in st.get("legs", [])]
+        s["calls"] = {"active": sum(st.get("calls", {}).get("active", 0) for st in sts)}
+        bs = dict(bridge_stats, bridged=0, agent_legs=0, agent_idle_sec=0.0)
+        for st in sts:
+            for k in ("bridged", "agent_legs", "agent_idle_sec"):
+                bs[k] += st.get("bridge", {}).get(k, 0)
+        s["bridge"] = bridge_stats_snapshot(bs)
+        ea = {}
+        for st in sts:
+            for reason, v in st.get("early_abandon", {}).items():
+                agg = ea.setdefault(reason, {"count": 0, "saved_sec": 0.0})
+                agg["count"] += v["count"]
+                agg["saved_sec"] += v["saved_sec"]
+        s["early_abandon"] = early_abandon_snapshot(ea)
+        am = {}
+        for st in sts:
+            for label, v in st.get("amd", {}).items():
+                agg = am.setdefault(label, {"count": 0, "decided_sec": 0.0})
+                agg["count"] += v["count"]
+                agg["decided_sec"] += v["decided_sec"]
+        s["amd"] = amd_snapshot(am)
+        rt = [st.get("ring_timeout", {}) for st in sts]
+        s["ring_timeout"] = {k: round(sum(r.get(k) or 0 for r in rt), 1)
+                             for k in ("legs", "shortened", "timeouts_shortened", "saved_sec")}
+        bt = [st.get("best_time", {}) for st in sts]
+        s["best_time"] = {k: sum(b.get(k) or 0 for b in bt) for k in ("numbers", "attempts", "answers", "reranks")}
+        win = {}
+        for st in sts:
+            for w in st.get("windows", []):
+                agg = win.setdefault(w["bucket"], dict(w, size=0))
+                agg["size"] += w["size"]
+        s["windows"] = list(win.values())
+        cdrs = [st["cdr"] for st in sts if st.get("cdr")]
+        s["cdr"] = {k: sum(c[k] for c in cdrs) for k in ("pending", "written", "errors")} if cdrs else None
+        s["shards"] = [dict(info, in_progress=st.get("in_progress"), queue_size=st.get("queue_size", 0),
+                            trunks=st.get("trunks", []), trunk_health=st.get("trunk_health", []))
+                       for info, st in zip(shards.info(), sts)]
+    else:
+        cur = s.get("in_progress") or {}
+        s["legs"] = [sess.to_dict() for sess in sip.calls.for_row(cur.get("row_id"))]
+        s["calls"] = sip.calls.snapshot_counts()
+        s["trunks"] = trunk_stats()
+        s["trunk_health"] = trunk_table.snapshot()
+        with state_lock:
+            s["bridge"] = bridge_stats_snapshot()
+            s["early_abandon"] = early_abandon_snapshot(early_abandon_stats)
+            s["amd"] = amd_snapshot(amd_stats)
+        s["ring_timeout"] = ring_stats.snapshot()
+        s["best_time"] = best_time.snapshot()
+        s["windows"] = call_queue.buckets_snapshot()
+        s["cdr"] = cdr_writer.snapshot() if cdr_writer is not None else None
+    s["scheduled"] = len(retry_scheduler)
+    s["routes"] = prefix_router.snapshot()
+    s["phone_cache"] = phone_cache_info()
+    if CLUSTER_COORDINATOR:
+        s["node"] = NODE_ID
+        with _held_lock:
+            s["held_rows"] = len(_held_rows)
+    return s
+
+@app.route("/api/log", methods=["GET"])
+def get_status():
+    return jsonify(status_snapshot()), 200
+
+@app.route("/api/routes", methods=["GET"])
+def get_routes():
+    """Info tabel prefix; ?number=0812... menampilkan route yang dipakai nomor itu."""
+    prefix_router.reload()
+    out = prefix_router.snapshot()
+    number = flask_request.args.get("number")
+    if number:
+        e164 = normalize_number(number)
+        route = prefix_router.lookup(e164) if e164 else None
+        out["number"] = e164
+        out["route"] = route.to_dict() if route is not None else None
+    return jsonify(out), 200
+
+def _parse_time(value, default, end=False):
+    """epoch / "YYYY-MM-DD HH:MM" / "YYYY-MM-DD" (end=True -> akhir hari itu)."""
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return time.mktime(time.strptime(value, "%Y-%m-%d %H:%M"))
+    except ValueError:
+        pass
+    try:
+        return time.mktime(time.strptime(value, "%Y-%m-%d")) + (86400 if end else 0)
+    except ValueError:
+        raise ValueError(f"format waktu tidak dikenal: {value}")
+
+def _today_start(now):
+    lt = time.localtime(now)
+    return time.mktime((lt.tm_year, lt.tm_mon, lt.tm_mday, 0, 0, 0, 0, 0, -1))
+
+@app.route("/api/stats", methods=["GET"])
+@app.route("/api/stats/<by>", methods=["GET"])
+def get_stats(by=None):
+    """Agregat CDR: ?by=prefix|trunk|agent|hour&from=&to= (default hari ini)."""
+    if cdr_stats is None:
+        return jsonify({"status": "error", "message": "CDR mati (CDR_DIR kosong)"}), 404
+    now = time.time()
+    try:
+        t0 = _parse_time(flask_request.args.get("from"), _today_start(now))
+        t1 = _parse_time(flask_request.args.get("to"), now, end=True)
+        out = cdr_stats.query(t0, t1, by=by or flask_request.args.get("by", "none"), now=now)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify(out), 200
+
+@app.route("/export/cdr.csv", methods=["GET"])
+def export_cdr():
+    """
+    CSV CDR di-stream per potongan (memori konstan): ?from=&to= (default hari ini),
+    ?campaign=, ?agent=, ?gzip=1 -> file .csv.gz dikompres on-the-fly.
+    """
+    if cdr_stats is None:
+        return jsonify({"status": "error", "message": "CDR mati (CDR_DIR kosong)"}), 404
+    now = time.time()
+    args = flask_request.args
+    try:
+        t0 = _parse_time(args.get("from"), _today_start(now))
+        t1 = _parse_time(args.get("to"), now, end=True)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    filters = [(col, args[col].encode("utf-8")) for col in ("campaign", "agent") if args.get(col)]
+
+    def where(cols):
+        mask = cols[filters[0][0]] == filters[0][1]
+        for col, value in filters[1:]:
+            mask &= cols[col] == value
+        return mask
+
+    body = csv_chunks(cdr_stats.store, t0, t1, where=where if filters else None, chunk=CDR_EXPORT_CHUNK)
+    name = f"cdr-{time.strftime('%Y%m%d-%H%M', time.localtime(t0))}-{time.strftime('%Y%m%d-%H%M', time.localtime(t1))}"
+    if args.get("gzip") in ("1", "true"):
+        return Response(gzip_chunks(body), mimetype="application/gzip",
+                        headers={"Content-Disposition": f"attachment; filename={name}.csv.gz"})
+    return Response(body, mimetype="text/csv",
+                    headers={"Content-Disposition": f"attachment; filename={name}.csv"})
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Metrik format teks Prometheus; mode shard: dijumlah dari supervisor + semua shard."""
+    states = [metrics.state()]
+    if shards is not None:
+        states += [shard_status.get(i, {}).get("metrics") for i in range(shards.n)]
+    return Response(render_metrics(states), mimetype="text/plain; version=0.0.4")
+
+@app.route("/debug/trace/<int:row_id>", methods=["GET"])
+def debug_trace(row_id):
+    """Span satu row dari ring buffer: ?format=json (default) | text (waterfall) | chrome."""
+    spans = tracer.for_row(row_id)
+    fmt = flask_request.args.get("format", "json")
+    if fmt == "text":
+        return Response(f"row {row_id}\n" + waterfall(spans), mimetype="text/plain")
+    if fmt == "chrome":
+        return jsonify({"traceEvents": chrome_events(spans), "displayTimeUnit": "ms"}), 200
+    return jsonify({"row_id": row_id, "spans": timeline(spans), "tracer": tracer.snapshot()}), 200
+
+@app.route("/debug/pjsip-log", methods=["GET"])
+def debug_pjsip_log():
+    """Tail log PJSIP: ?n=200&module=sip_endpoint.c&level=3&since=<seq>&format=text."""
+    args = flask_request.args
+    try:
+        n = min(int(args.get("n", 200)), PJSIP_LOG_RING)
+        level = int(args["level"]) if args.get("level") else None
+        since = int(args.get("since", 0))
+    except ValueError:
+        return jsonify({"status": "error", "message": "n / level / since harus angka"}), 400
+    if shards is not None:
+        # mode shard: PJSIP jalan di proses shard -> baca ekor file log masing-masing
+        if not PJSIP_LOG_FILE:
+            return jsonify({"status": "error", "message": "mode shard butuh PJSIP_LOG_FILE"}), 404
+        out = {f"shard{i}": tail_file(pjsip_log_path(i), n) for i in range(shards.n)}
+        if args.get("format") == "text":
+            return Response("".join(f"==> {k} <==\n" + "\n".join(v) + "\n" for k, v in out.items()),
+                            mimetype="text/plain")
+        return jsonify({"shards": out}), 200
+    if pjsip_log is None:
+        return jsonify({"status": "error", "message": "log PJSIP belum aktif"}), 404
+    lines = pjsip_log.tail(n, module=args.get("module"), max_level=level, since=since)
+    if args.get("format") == "text":
+        return Response("\n".join(r["line"] for r in lines) + "\n", mimetype="text/plain")
+    return jsonify({"lines": lines, "next": lines[-1]["seq"] if lines else since,
+                    "log": pjsip_log.snapshot()}), 200
 
 @app.route("/events", methods=["GET"])
 def get_events():
@@ -618,7 +2053,13 @@ if __name__ == "__main__":
     try:
         app.run(host="0.0.0.0", port=PORT, debug=False, threaded=True)
     finally:
+        if shards is not None:
+            shards.close()
         try:
             sip.destroy()
         except Exception:
             pass
+        if cdr_writer is not None:
+            cdr_writer.close()
+        if pjsip_log is not None:
+            pjsip_log.flush()
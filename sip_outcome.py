@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Klasifikasi hasil panggilan berdasarkan SIP final code + reason.
+
+Worker memakai hasil klasifikasi untuk menentukan jeda berikutnya:
+  - gagal permanen (nomor invalid/ditolak) -> tanpa jeda, tidak diulang
+  - 503 (trunk penuh)                      -> backoff
+  - 486 (sibuk)                            -> row dijadwalkan ulang nanti
+"""
+from enum import Enum
+
+
+class CallOutcome(Enum):
+    ANSWERED = "answered"
+    NO_ANSWER = "no_answer"          # ring timeout / 408
+    BUSY = "busy"                    # 486, 600
+    UNAVAILABLE = "unavailable"      # 480 (HP mati / di luar jangkauan)
+    INVALID = "invalid"              # 404, 484, 410, 604
+    REJECTED = "rejected"            # 403, 603
+    CONGESTION = "congestion"        # 503 (trunk penuh)
+    CANCELLED = "cancelled"          # 487
+    MACHINE = "machine"              # terjawab mesin (voicemail / pengumuman), hasil AMD
+    ABORTED = "aborted"              # STOP dari operator
+    FAILED = "failed"                # lainnya
+
+
+_CODE_MAP = {
+    408: CallOutcome.NO_ANSWER,
+    486: CallOutcome.BUSY,
+    600: CallOutcome.BUSY,
+    480: CallOutcome.UNAVAILABLE,
+    404: CallOutcome.INVALID,
+    410: CallOutcome.INVALID,
+    484: CallOutcome.INVALID,
+    604: CallOutcome.INVALID,
+    403: CallOutcome.REJECTED,
+    603: CallOutcome.REJECTED,
+    503: CallOutcome.CONGESTION,
+    487: CallOutcome.CANCELLED,
+}
+
+# Sebagian trunk mengirim code generik, jadi reason ikut dicek
+_REASON_MAP = (
+    ("busy", CallOutcome.BUSY),
+    ("not found", CallOutcome.INVALID),
+    ("address incomplete", CallOutcome.INVALID),
+    ("temporarily unavailable", CallOutcome.UNAVAILABLE),
+    ("service unavailable", CallOutcome.CONGESTION),
+    ("request terminated", CallOutcome.CANCELLED),
+    ("decline", CallOutcome.REJECTED),
+)
+
+# Tidak ada gunanya mengulang nomor dengan outcome ini
+HARD_FAILURES = frozenset({CallOutcome.INVALID, CallOutcome.REJECTED})
+
+
+def classify(code=None, reason="", answered=False, timed_out=False, aborted=False):
+    """Return CallOutcome dari hasil satu leg."""
+    if aborted:
+        return CallOutcome.ABORTED
+    if answered:
+        return CallOutcome.ANSWERED
+    if timed_out:
+        return CallOutcome.NO_ANSWER
+    try:
+        code = int(code or 0)
+    except (TypeError, ValueError):
+        code = 0
+    if code in _CODE_MAP:
+        return _CODE_MAP[code]
+    r = (reason or "").lower()
+    for needle, outcome in _REASON_MAP:
+        if needle in r:
+            return outcome
+    if 500 <= code < 600:
+        return CallOutcome.CONGESTION
+    return CallOutcome.FAILED
+
+
+def is_hard_failure(outcome):
+    return outcome in HARD_FAILURES
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Timer service tunggal berbasis jam monotonic.
+
+Semua deadline (ring timeout per leg, jeda antar panggilan, tick scheduler)
+didaftarkan ke sini dan dijalankan oleh SATU thread, bukan satu loop polling
+per leg. time.monotonic() dipakai supaya lompatan jam (NTP) tidak memotong
+atau memperpanjang ring.
+
+Callback dijalankan di thread timer -> harus singkat (set event, hangup, dll).
+"""
+import heapq
+import itertools
+import threading
+import time
+
+
+class Timer:
+    __slots__ = ("deadline", "fn", "args", "interval", "cancelled")
+
+    def __init__(self, deadline, fn, args, interval=None):
+        self.deadline = deadline
+        self.fn = fn
+        self.args = args
+        self.interval = interval
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def remaining(self, now=None):
+        return max(0.0, self.deadline - (time.monotonic() if now is None else now))
+
+
+class TimerService:
+    def __init__(self, name="timer-service", on_thread_start=None, clock=time.monotonic):
+        self.name = name
+        self.clock = clock
+        self.on_thread_start = on_thread_start   # mis. register thread ke PJLIB
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def __len__(self):
+        with self._cond:
+            return sum(1 for _, _, t in self._heap if not t.cancelled)
+
+    # ---------------- API ----------------
+    def call_at(self, deadline, fn, *args):
+        """Jalankan fn(*args) saat clock() >= deadline."""
+        return self._push(Timer(deadline, fn, args))
+
+    def call_later(self, delay, fn, *args):
+        return self._push(Timer(self.clock() + max(0.0, delay), fn, args))
+
+    def call_every(self, interval, fn, *args):
+        """Jalankan fn(*args) berulang tiap `interval` detik (sampai cancel())."""
+        return self._push(Timer(self.clock() + interval, fn, args, interval=interval))
+
+    def sleep(self, delay, wake=None):
+        """
+        Tunggu `delay` detik tanpa polling. `wake` (threading.Event) bisa di-set
+        pihak lain untuk membangunkan lebih awal. Return True jika delay habis.
+        `wake` yang sudah di-set sebelum sleep() langsung membangunkan; setelah bangun
+        event di-clear lagi, jadi event yang sama bisa dipakai untuk sleep berikutnya
+        (pemanggil memeriksa sendiri alasan bangun, mis. stop_event).
+        """
+        ev = wake or threading.Event()
+        done = []
+        t = self.call_later(delay, lambda: (done.append(True), ev.set()))
+        ev.wait()
+        t.cancel()
+        ev.clear()
+        return bool(done)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    # ---------------- internal ----------------
+    def _push(self, timer):
+        with self._cond:
+            heapq.heappush(self._heap, (timer.deadline, next(self._seq), timer))
+            if self._thread is None:
+                # thread dibuat saat timer pertama (aman jika proses di-fork sebelum itu)
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            elif self._heap[0][2] is timer:
+                self._cond.notify()
+        return timer
+
+    def _run(self):
+        if self.on_thread_start:
+            try:
+                self.on_thread_start()
+            except Exception:
+                pass
+        while True:
+            with self._cond:
+                while not self._closed:
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    wait = self._heap[0][0] - self.clock()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                if self._closed:
+                    return
+                _, _, timer = heapq.heappop(self._heap)
+                if timer.interval is not None:
+                    timer.deadline = max(timer.deadline + timer.interval, self.clock())
+                    heapq.heappush(self._heap, (timer.deadline, next(self._seq), timer))
+            try:
+                timer.fn(*timer.args)
+            except Exception as e:
+                print(f"[TIMER] callback error: {e}")
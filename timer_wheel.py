@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Hierarchical timer wheel (gaya kernel Linux).
+
+- schedule()/cancel() O(1)
+- advance(now) mengembalikan item yang sudah jatuh tempo
+- level ke-L mencakup delta < slots^(L+1) tick; di luar itu masuk overflow
+
+Wheel tidak punya thread sendiri; pemanggil yang menentukan kapan advance().
+"""
+import threading
+
+
+class TimerHandle:
+    __slots__ = ("expire_tick", "when", "item", "cancelled")
+
+    def __init__(self, expire_tick, when, item):
+        self.expire_tick = expire_tick
+        self.when = when
+        self.item = item
+        self.cancelled = False
+
+
+class TimerWheel:
+    def __init__(self, tick_sec=1.0, slot_bits=6, levels=4, now=0.0):
+        self.tick_sec = float(tick_sec)
+        self.bits = slot_bits
+        self.slots = 1 << slot_bits
+        self.mask = self.slots - 1
+        self.levels = levels
+        self.wheels = [[[] for _ in range(self.slots)] for _ in range(levels)]
+        self.overflow = []
+        self.due = []                      # sudah jatuh tempo, menunggu advance()
+        self.current = int(now // self.tick_sec)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def _tick_of(self, when):
+        return int(-(-when // self.tick_sec))   # ceil: jangan pernah lebih awal
+
+    def _place(self, h):
+        delta = h.expire_tick - self.current
+        if delta <= 0:
+            self.due.append(h)
+            return
+        for level in range(self.levels):
+            if delta < (1 << (self.bits * (level + 1))):
+                idx = (h.expire_tick >> (self.bits * level)) & self.mask
+                self.wheels[level][idx].append(h)
+                return
+        self.overflow.append(h)
+
+    def schedule(self, when, item):
+        """Jadwalkan item pada waktu `when` (detik, skala sama dengan `now`)."""
+        h = TimerHandle(self._tick_of(when), when, item)
+        with self.lock:
+            self._place(h)
+            self.count += 1
+        return h
+
+    def cancel(self, handle):
+        with self.lock:
+            if not handle.cancelled:
+                handle.cancelled = True
+                self.count -= 1
+
+    def _cascade(self, level):
+        idx = (self.current >> (self.bits * level)) & self.mask
+        bucket = self.wheels[level][idx]
+        self.wheels[level][idx] = []
+        for h in bucket:
+            if not h.cancelled:
+                self._place(h)
+
+    def _step(self):
+        self.current += 1
+        # cascade level atas ketika level di bawahnya kembali ke slot 0
+        level = 1
+        while level < self.levels and (self.current & ((1 << (self.bits * level)) - 1)) == 0:
+            self._cascade(level)
+            level += 1
+        if level == self.levels and (self.current & ((1 << (self.bits * level)) - 1)) == 0 and self.overflow:
+            pending, self.overflow = self.overflow, []
+            for h in pending:
+                if not h.cancelled:
+                    self._place(h)
+        idx = self.current & self.mask
+        bucket = self.wheels[0][idx]
+        if bucket:
+            self.wheels[0][idx] = []
+            self.due.extend(bucket)
+
+    def advance(self, now):
+        """Majukan wheel sampai `now`; return list item yang jatuh tempo (urut waktu)."""
+        target = int(now // self.tick_sec)
+        with self.lock:
+            while self.current < target:
+                self._step()
+            fired = [h for h in self.due if not h.cancelled]
+            self.due = []
+            self.count -= len(fired)
+        fired.sort(key=lambda h: h.when)
+        return [h.item for h in fired]
+
+    def pending(self):
+        """Snapshot (when, item) semua timer aktif (untuk persist/debug)."""
+        with self.lock:
+            out = [(h.when, h.item) for h in self.due if not h.cancelled]
+            for wheel in self.wheels:
+                for bucket in wheel:
+                    out.extend((h.when, h.item) for h in bucket if not h.cancelled)
+            out.extend((h.when, h.item) for h in self.overflow if not h.cancelled)
+        out.sort(key=lambda x: x[0])
+        return out
+
+    def clear(self):
+        with self.lock:
+            self.wheels = [[[] for _ in range(self.slots)] for _ in range(self.levels)]
+            self.overflow = []
+            self.due = []
+            self.count = 0
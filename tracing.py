@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Tracing span per row: dequeue, register, leg agent / peer / EC, bridge, teardown,
+broadcast. Span selesai masuk ring buffer (deque, tanpa lock) dan bisa dilihat per
+row (/debug/trace/<row_id>) atau diekspor ke file format Chrome trace
+(chrome://tracing, Perfetto: JSON Array Format, satu event per baris).
+
+Span = dict biasa (bisa di-pickle) supaya proses shard dapat meneruskannya ke supervisor:
+  {"name", "row_id", "call_id", "start", "end", "thread", "args"}
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class Tracer:
+    def __init__(self, max_spans=20000, export_file=None, forward=False):
+        self.buf = deque(maxlen=max_spans)
+        self.export_file = export_file
+        self.forward = forward          # True di proses shard: span dikirim ke supervisor
+        self.pending = deque()          # span menunggu ekspor / diteruskan
+        self.open_rows = {}             # row_id -> epoch mulai (span "row")
+        self.local = threading.local()
+        self.recorded = 0
+        self.exported = 0
+        self._export_lock = threading.Lock()
+
+    # ---------------- row aktif per thread ----------------
+    def bind(self, row_id):
+        """Row yang sedang dikerjakan thread ini (default row_id span berikutnya)."""
+        self.local.row_id = row_id
+
+    def current_row(self):
+        return getattr(self.local, "row_id", None)
+
+    def begin_row(self, row_id, queued_at=None, **args):
+        now = time.time()
+        self.bind(row_id)
+        self.open_rows[row_id] = now
+        self.record("dequeue", queued_at if queued_at is not None else now, now, row_id=row_id, **args)
+
+    def end_row(self, row_id, **args):
+        start = self.open_rows.pop(row_id, None)
+        if self.current_row() == row_id:
+            self.bind(None)
+        if start is not None:
+            self.record("row", start, time.time(), row_id=row_id, **args)
+
+    # ---------------- span ----------------
+    def record(self, name, start, end, row_id=None, call_id=None, **args):
+        """Span yang sudah selesai (waktu epoch)."""
+        span = {
+            "name": name,
+            "row_id": self.current_row() if row_id is None else row_id,
+            "call_id": call_id,
+            "start": start,
+            "end": end,
+            "thread": threading.current_thread().name,
+            "args": args,
+        }
+        self._add(span)
+        return span
+
+    @contextmanager
+    def span(self, name, row_id=None, call_id=None, **args):
+        start = time.time()
+        try:
+            yield args
+        finally:
+            self.record(name, start, time.time(), row_id=row_id, call_id=call_id, **args)
+
+    def _add(self, span):
+        self.buf.append(span)
+        self.recorded += 1
+        if self.forward or self.export_file:
+            self.pending.append(span)
+
+    def ingest(self, spans):
+        """Span dari proses lain (shard)."""
+        for span in spans:
+            self._add(span)
+
+    def drain(self):
+        n = len(self.pending)
+        return [self.pending.popleft() for _ in range(n)]
+
+    # ---------------- baca ----------------
+    def for_row(self, row_id):
+        spans = [s for s in list(self.buf) if s["row_id"] == row_id]
+        spans.sort(key=lambda s: s["start"])
+        return spans
+
+    def export(self):
+        """
+        Tulis span pending ke export_file (dipanggil berkala dari timer). Return jumlah.
+        Kalau ekspor sebelumnya belum selesai (disk lambat) langsung return 0; span
+        tetap pending untuk putaran berikutnya, jadi thread ekspor tidak menumpuk.
+        """
+        if not self._export_lock.acquire(blocking=False):
+            return 0
+        try:
+            spans = self.drain()
+            if not spans or not self.export_file:
+                return 0
+            new = not os.path.exists(self.export_file) or os.path.getsize(self.export_file) == 0
+            with open(self.export_file, "a") as f:
+                if new:
+                    f.write("[\n")
+                for ev in chrome_events(spans):
+                    f.write(json.dumps(ev, default=str) + ",\n")
+            self.exported += len(spans)
+            return len(spans)
+        finally:
+            self._export_lock.release()
+
+    def snapshot(self):
+        return {"spans": len(self.buf), "recorded": self.recorded, "open_rows": len(self.open_rows),
+                "pending": len(self.pending), "exported": self.exported, "export_file": self.export_file}
+
+
+# ===========================================================
+#                       Format tampilan
+# ===========================================================
+def chrome_events(spans, pid=None):
+    """Span -> event Chrome trace ("X" complete event, µs). tid = row_id."""
+    pid = os.getpid() if pid is None else pid
+    out = []
+    for s in spans:
+        args = dict(s["args"])
+        if s["call_id"]:
+            args["call_id"] = s["call_id"]
+        args["thread"] = s["thread"]
+        out.append({"name": s["name"], "cat": "dialer", "ph": "X", "pid": pid,
+                    "tid": s["row_id"] if s["row_id"] is not None else 0,
+                    "ts": int(s["start"] * 1e6), "dur": max(0, int((s["end"] - s["start"]) * 1e6)),
+                    "args": args})
+    return out
+
+
+def timeline(spans):
+    """Span satu row -> baris relatif ke span pertama (ms)."""
+    if not spans:
+        return []
+    t0 = spans[0]["start"]
+    return [{"name": s["name"], "offset_ms": round((s["start"] - t0) * 1000, 1),
+             "duration_ms": round((s["end"] - s["start"]) * 1000, 1),
+             "at": time.strftime("%H:%M:%S", time.localtime(s["start"])) + f".{int(s['start'] * 1000) % 1000:03d}",
+             "call_id": s["call_id"], "thread": s["thread"], "args": s["args"]} for s in spans]
+
+
+def waterfall(spans, width=60):
+    """Teks waterfall sederhana untuk dibaca di terminal."""
+    rows = timeline(spans)
+    if not rows:
+        return "(tidak ada span)\n"
+    total = max(r["offset_ms"] + r["duration_ms"] for r in rows) or 1.0
+    lines = []
+    for r in rows:
+        a = int(r["offset_ms"] / total * width)
+        b = max(a + 1, int((r["offset_ms"] + r["duration_ms"]) / total * width))
+        bar = " " * a + "#" * (b - a)
+        lines.append(f"{r['name']:12s} {r['offset_ms']:>10.1f} {r['duration_ms']:>10.1f}  |{bar:<{width}}| "
+                     f"{r['call_id'] or ''}")
+    return f"{'span':12s} {'+ms':>10s} {'dur ms':>10s}\n" + "\n".join(lines) + "\n"
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Pembatas INVITE per trunk SIP:
+  - token bucket untuk calls-per-second (CPS)
+  - AIMD untuk jumlah leg bersamaan: naik pelan (+1 per "window" panggilan terjawab),
+    turun setengah saat trunk membalas 503/5xx atau 408
+
+acquire() dipanggil sebelum make_call, release(code, answered) saat leg selesai;
+release() tanpa code (STOP / make_call gagal) hanya melepas slot.
+aimd=False: batas concurrency tetap initial_conc (semaphore biasa, mis. pool operator).
+"""
+import threading
+import time
+
+
+class TrunkLimiter:
+    def __init__(self, name, cps=5.0, burst=5, min_conc=2, max_conc=30, initial_conc=10,
+                 decrease_factor=0.5, clock=time.monotonic, aimd=True):
+        self.name = name
+        self.cps = float(cps)
+        self.burst = float(burst)
+        self.min_conc = float(min_conc)
+        self.max_conc = float(max_conc)
+        self.conc_limit = float(initial_conc)
+        self.decrease_factor = decrease_factor
+        self.aimd = aimd
+        self.clock = clock
+        self.tokens = float(burst)
+        self.last_refill = clock()
+        self.in_flight = 0
+        self.cond = threading.Condition()
+        # statistik
+        self.acquired = 0
+        self.throttled = 0            # acquire yang harus menunggu
+        self.throttle_wait_sec = 0.0
+        self.max_wait_sec = 0.0
+        self.increases = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+
+    def _refill(self, now):
+        if now > self.last_refill:
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.cps)
+            self.last_refill = now
+
+    def acquire(self, stop_event=None, max_wait=None):
+        """
+        Tunggu token CPS + slot concurrency. Return detik menunggu,
+        atau None jika dibatalkan (stop_event) / melewati max_wait.
+        """
+        t0 = self.clock()
+        with self.cond:
+            while True:
+                now = self.clock()
+                self._refill(now)
+                if self.tokens >= 1.0 and self.in_flight < int(self.conc_limit):
+                    self.tokens -= 1.0
+                    self.in_flight += 1
+                    self.acquired += 1
+                    waited = now - t0
+                    if waited > 0.001:
+                        self.throttled += 1
+                        self.throttle_wait_sec += waited
+                        self.max_wait_sec = max(self.max_wait_sec, waited)
+                    return waited
+                if stop_event is not None and stop_event.is_set():
+                    return None
+                if max_wait is not None and now - t0 >= max_wait:
+                    return None
+                # token berikutnya, atau dibangunkan release(); cek stop tiap 0.5 s
+                wait = 0.5
+                if self.tokens < 1.0:
+                    wait = min(wait, (1.0 - self.tokens) / self.cps)
+                self.cond.wait(max(wait, 0.001))
+
+    def release(self, code=None, answered=False):
+        """
+        Leg selesai. code = SIP final code terakhir; None = percobaan dibatalkan sebelum
+        ada hasil (tidak mempengaruhi AIMD). Batas hanya naik untuk panggilan terjawab:
+        486/480/487 dst. netral.
+        """
+        aborted = code is None
+        try:
+            code = int(code or 0)
+        except (TypeError, ValueError):
+            code = 0
+        with self.cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            now = self.clock()
+            if not self.aimd or aborted:
+                self.cond.notify()
+                return
+            if code == 408 or 500 <= code < 600:
+                # multiplicative decrease, maks sekali per detik supaya burst 503 tidak langsung ke minimum
+                if now - self._last_decrease >= 1.0:
+                    self.conc_limit = max(self.min_conc, self.conc_limit * self.decrease_factor)
+                    self.decreases += 1
+                    self._last_decrease = now
+            elif answered and self.conc_limit < self.max_conc:
+                # additive increase: +1 setelah ~conc_limit panggilan terjawab
+                self.conc_limit = min(self.max_conc, self.conc_limit + 1.0 / self.conc_limit)
+                self.increases += 1
+            self.cond.notify()
+
+    def resize(self, max_conc):
+        """Ubah batas concurrency maksimum (hot reload); tanpa AIMD batasnya langsung max_conc."""
+        with self.cond:
+            self.max_conc = float(max_conc)
+            if self.aimd:
+                self.conc_limit = max(self.min_conc, min(self.conc_limit, self.max_conc))
+            else:
+                self.conc_limit = self.max_conc
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            self._refill(self.clock())
+            return {
+                "trunk": self.name,
+                "cps_limit": self.cps,
+                "tokens": round(self.tokens, 2),
+                "concurrency_limit": int(self.conc_limit),
+                "in_flight": self.in_flight,
+                "acquired": self.acquired,
+                "throttled": self.throttled,
+                "throttle_wait_sec": round(self.throttle_wait_sec, 3),
+                "max_wait_sec": round(self.max_wait_sec, 3),
+                "aimd_increases": self.increases,
+                "aimd_decreases": self.decreases,
+            }
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Tabel trunk SIP: health probe (SIP OPTIONS), failover dan routing berbobot.
+
+  - setiap trunk di-probe berkala dengan OPTIONS; RTT & success rate disimpan (EWMA)
+  - trunk dianggap down setelah beberapa probe gagal atau 5xx / gagal kirim berturut-turut
+    (408 tidak dihitung: banyak carrier memakainya untuk panggilan tak terjawab biasa)
+  - select() memilih trunk sehat secara acak berbobot:
+        skor = weight * connect_rate / (1 + rtt_ms / 100)
+
+Responder OPTIONS lokal untuk uji tanpa trunk asli:
+  python trunks.py --responder 5070              # selalu 200 OK
+  python trunks.py --responder 5071 --code 503   # trunk "penuh"
+  python trunks.py --probe 127.0.0.1:5070        # probe sekali
+"""
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+
+EWMA_ALPHA = 0.1
+DOWN_AFTER_PROBE_FAILS = 3
+DOWN_AFTER_CALL_FAILS = 5
+
+
+class Trunk:
+    def __init__(self, name, hostport, transport="udp", weight=1.0, enabled=True, domain=None):
+        self.name = name
+        self.hostport = hostport
+        self.transport = transport.lower()
+        self.weight = float(weight)
+        self.enabled = enabled
+        self.domain = domain
+        # health
+        self.healthy = True
+        self.rtt_ms = None             # EWMA RTT OPTIONS
+        self.probe_ok_rate = 1.0       # EWMA sukses probe
+        self.probe_fails = 0           # gagal berturut-turut
+        self.last_probe = None
+        self.last_probe_code = None
+        # hasil panggilan
+        self.connect_rate = 0.5        # EWMA leg terjawab
+        self.call_fails = 0            # 5xx / gagal kirim berturut-turut
+        self.attempts = 0
+        self.connects = 0
+
+    @property
+    def host(self):
+        return self.hostport.rsplit(":", 1)[0]
+
+    @property
+    def port(self):
+        parts = self.hostport.rsplit(":", 1)
+        return int(parts[1]) if len(parts) == 2 else 5060
+
+    def score(self):
+        rtt = self.rtt_ms if self.rtt_ms is not None else 100.0
+        return self.weight * (self.connect_rate + 0.05) / (1.0 + rtt / 100.0)
+
+    def to_dict(self):
+        return {
+            "name": self.name, "hostport": self.hostport, "transport": self.transport,
+            "weight": self.weight, "enabled": self.enabled, "healthy": self.healthy,
+            "rtt_ms": None if self.rtt_ms is None else round(self.rtt_ms, 1),
+            "probe_ok_rate": round(self.probe_ok_rate, 3), "probe_fails": self.probe_fails,
+            "last_probe": self.last_probe, "last_probe_code": self.last_probe_code,
+            "connect_rate": round(self.connect_rate, 3), "attempts": self.attempts,
+            "connects": self.connects, "score": round(self.score(), 4),
+        }
+
+
+class TrunkTable:
+    def __init__(self, entries):
+        self.lock = threading.Lock()
+        self.trunks = [Trunk(**e) for e in entries]
+        self._thread = None
+
+    def get(self, name):
+        for t in self.trunks:
+            if t.name == name:
+                return t
+        return None
+
+    def select(self, exclude=(), prefer=None):
+        """
+        Pilih trunk sehat (acak berbobot); trunk `prefer` (route prefix) dipakai jika sehat.
+        Jika semua down, pakai yang paling jarang gagal.
+        """
+        with self.lock:
+            cands = [t for t in self.trunks if t.enabled and t.name not in exclude]
+            healthy = [t for t in cands if t.healthy]
+            if prefer:
+                for t in healthy:
+                    if t.name == prefer:
+                        return t
+            if not healthy:
+                return min(cands, key=lambda t: (t.probe_fails, t.call_fails)) if cands else None
+            scores = [t.score() for t in healthy]
+            return random.choices(healthy, weights=scores, k=1)[0]
+
+    def record_result(self, trunk, code=0, answered=False, transport_error=False):
+        """
+        Catat hasil satu leg untuk connect rate & failover. Hanya 5xx dan transport_error
+        (INVITE tidak terkirim) yang menghitung ke DOWN; 408 netral (outcome per row).
+        """
+        try:
+            code = int(code or 0)
+        except (TypeError, ValueError):
+            code = 0
+        with self.lock:
+            trunk.attempts += 1
+            if answered:
+                trunk.connects += 1
+            trunk.connect_rate += EWMA_ALPHA * ((1.0 if answered else 0.0) - trunk.connect_rate)
+            if transport_error or 500 <= code < 600:
+                trunk.call_fails += 1
+                if trunk.call_fails >= DOWN_AFTER_CALL_FAILS and trunk.healthy:
+                    trunk.healthy = False
+                    print(f"[TRUNK] {trunk.name} DOWN ({trunk.call_fails}x {code or 'transport'})")
+            elif code != 408:
+                trunk.call_fails = 0
+
+    def _record_probe(self, trunk, rtt_ms, code):
+        with self.lock:
+            trunk.last_probe = time.time()
+            trunk.last_probe_code = code
+            ok = rtt_ms is not None and code is not None and code < 500
+            trunk.probe_ok_rate += EWMA_ALPHA * ((1.0 if ok else 0.0) - trunk.probe_ok_rate)
+            if ok:
+                trunk.rtt_ms = rtt_ms if trunk.rtt_ms is None else trunk.rtt_ms + EWMA_ALPHA * (rtt_ms - trunk.rtt_ms)
+                trunk.probe_fails = 0
+                if not trunk.healthy:
+                    trunk.healthy = True
+                    trunk.call_fails = 0
+                    print(f"[TRUNK] {trunk.name} UP (rtt {rtt_ms:.1f} ms)")
+            else:
+                trunk.probe_fails += 1
+                if trunk.probe_fails >= DOWN_AFTER_PROBE_FAILS and trunk.healthy:
+                    trunk.healthy = False
+                    print(f"[TRUNK] {trunk.name} DOWN (probe gagal {trunk.probe_fails}x, code={code})")
+
+    def probe_all(self, timeout=2.0):
+        for t in list(self.trunks):
+            if not t.enabled:
+                continue
+            rtt, code = sip_options_ping(t.host, t.port, t.transport, timeout=timeout)
+            self._record_probe(t, rtt, code)
+
+    def start_probing(self, interval=10.0, timeout=2.0):
+        """Thread probe sendiri (I/O jaringan tidak boleh menahan timer service)."""
+        if self._thread is not None:
+            return
+
+        def _loop():
+            while True:
+                try:
+                    self.probe_all(timeout=timeout)
+                except Exception as e:
+                    print(f"[TRUNK] probe error: {e}")
+                time.sleep(interval)
+
+        self._thread = threading.Thread(target=_loop, name="trunk-probe", daemon=True)
+        self._thread.start()
+
+    def snapshot(self):
+        with self.lock:
+            return [t.to_dict() for t in self.trunks]
+
+
+def load_trunks(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# ===========================================================
+#                 SIP OPTIONS (raw socket)
+# ===========================================================
+def _local_ip_for(host):
+    try:
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.connect((host, 9))
+        ip = s.getsockname()[0]
+        s.close()
+        return ip
+    except Exception:
+        return "127.0.0.1"
+
+
+def _build_options(host, port, transport, local_ip, local_port):
+    branch = "z9hG4bK" + uuid.uuid4().hex[:16]
+    tag = uuid.uuid4().hex[:8]
+    call_id = f"{uuid.uuid4().hex}@{local_ip}"
+    return (
+        f"OPTIONS sip:{host}:{port} SIP/2.0\r\n"
+        f"Via: SIP/2.0/{transport.upper()} {local_ip}:{local_port};branch={branch};rport\r\n"
+        f"Max-Forwards: 70\r\n"
+        f"From: <sip:probe@{local_ip}>;tag={tag}\r\n"
+        f"To: <sip:{host}:{port}>\r\n"
+        f"Call-ID: {call_id}\r\n"
+        f"CSeq: 1 OPTIONS\r\n"
+        f"Contact: <sip:probe@{local_ip}:{local_port}>\r\n"
+        f"Accept: application/sdp\r\n"
+        f"User-Agent: dialer-probe\r\n"
+        f"Content-Length: 0\r\n\r\n"
+    ).encode("ascii"), call_id
+
+
+def _parse_status(data):
+    try:
+        line = data.split(b"\r\n", 1)[0].decode("ascii", "replace")
+        parts = line.split(" ", 2)
+        if parts[0] == "SIP/2.0":
+            return int(parts[1])
+    except Exception:
+        pass
+    return None
+
+
+def sip_options_ping(host, port, transport="udp", timeout=2.0):
+    """Kirim OPTIONS; return (rtt_ms, status_code) atau (None, None) jika tidak ada jawaban."""
+    try:
+        addr = socket.getaddrinfo(host, port, socket.AF_INET)[0][4]
+    except Exception:
+        return None, None
+    local_ip = _local_ip_for(addr[0])
+    if transport == "tcp":
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(timeout)
+    try:
+        t0 = time.perf_counter()
+        if transport == "tcp":
+            sock.connect(addr)
+        else:
+            sock.bind(("0.0.0.0", 0))
+        msg, call_id = _build_options(host, port, transport, local_ip, sock.getsockname()[1])
+        if transport == "tcp":
+            sock.sendall(msg)
+        else:
+            sock.sendto(msg, addr)
+        deadline = t0 + timeout
+        while True:
+            sock.settimeout(max(0.01, deadline - time.perf_counter()))
+            data = sock.recv(65535)
+            code = _parse_status(data)
+            # abaikan 1xx, tunggu final response
+            if code is not None and code >= 200 and call_id.encode() in data:
+                return (time.perf_counter() - t0) * 1000.0, code
+    except (socket.timeout, OSError):
+        return None, None
+    finally:
+        sock.close()
+
+
+def run_options_responder(port, code=200, delay=0.0, host="0.0.0.0"):
+    """Stand-in SIP responder (UDP): balas setiap request dengan `code`."""
+    reasons = {200: "OK", 404: "Not Found", 486: "Busy Here", 503: "Service Unavailable"}
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((host, port))
+    print(f"[RESPONDER] UDP {host}:{port} -> {code}")
+    while True:
+        data, addr = sock.recvfrom(65535)
+        if not data or data.startswith(b"SIP/2.0"):
+            continue
+        headers = []
+        for line in data.decode("utf-8", "replace").split("\r\n")[1:]:
+            name = line.split(":", 1)[0].strip().lower()
+            if name in ("via", "from", "to", "call-id", "cseq"):
+                if name == "to" and ";tag=" not in line:
+                    line += ";tag=" + uuid.uuid4().hex[:8]
+                headers.append(line)
+        resp = (f"SIP/2.0 {code} {reasons.get(code, 'Response')}\r\n" + "\r\n".join(headers)
+                + "\r\nAllow: INVITE, ACK, CANCEL, BYE, OPTIONS\r\nContent-Length: 0\r\n\r\n")
+        if delay:
+            time.sleep(delay)
+        sock.sendto(resp.encode("utf-8"), addr)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="SIP OPTIONS probe / stand-in responder")
+    ap.add_argument("--responder", type=int, metavar="PORT")
+    ap.add_argument("--code", type=int, default=200)
+    ap.add_argument("--delay", type=float, default=0.0)
+    ap.add_argument("--probe", metavar="HOST:PORT")
+    ap.add_argument("--transport", default="udp")
+    args = ap.parse_args()
+    if args.responder:
+        run_options_responder(args.responder, code=args.code, delay=args.delay)
+    elif args.probe:
+        t = Trunk("probe", args.probe, transport=args.transport)
+        print(sip_options_ping(t.host, t.port, t.transport))
+    else:
+        ap.print_help()